@@ -0,0 +1,48 @@
+# benchmarks/contact_memory.py
+"""Membandingkan memori kontak dict 8 kunci (format lama) dengan Contact ber-__slots__.
+
+Jalankan dari root repo:  python benchmarks/contact_memory.py --count 1000000
+"""
+
+import os
+import sys
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from contact import Contact, CONTACT_KEYS
+
+def _rows(count):
+    for i in range(count):
+        yield f"Kontak {i}", f"0812{i:08d}"
+
+def build_dicts(count):
+    contacts = []
+    for name, phone in _rows(count):
+        contact = {key: '' for key in CONTACT_KEYS}
+        contact['Name'], contact['Phone'] = name, phone
+        contacts.append(contact)
+    return contacts
+
+def build_contacts(count):
+    return [Contact(name, phone) for name, phone in _rows(count)]
+
+def measure(builder, count):
+    tracemalloc.start()
+    contacts = builder(count)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del contacts
+    return current, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args()
+    results = {name: measure(builder, args.count) for name, builder in (('dict', build_dicts), ('Contact', build_contacts))}
+    base = results['dict'][0]
+    for name, (current, peak) in results.items():
+        print(f"{name:>8}: {current / 2**20:8.1f} MiB ({current / args.count:6.1f} B/kontak, puncak {peak / 2**20:.1f} MiB, {current / base:.0%} dari dict)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/corpus.py
+"""Generator korpus kontak sintetis yang deterministik (seed tetap) untuk benchmark.
+
+Jenis korpus:
+  csv  - CSV terstruktur dengan header Indonesia (nama,telepon,email,alamat)
+  raw  - dump teks bebas berisi nomor dalam berbagai format
+  vcf  - vCard 3.0 semua field (sebagian 2.1 quoted-printable & baris terlipat)
+Sekitar 5% nomor sengaja diulang dalam format lain agar deduplikasi ikut teruji.
+
+Jalankan dari root repo:  python benchmarks/corpus.py --size 1m --kind vcf --out /tmp/korpus
+"""
+
+import os
+import random
+import argparse
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+KINDS = ('csv', 'raw', 'vcf')
+DEFAULT_SEED = 20240501
+DUPLICATE_RATIO = 0.05
+
+FIRST_NAMES = ('Budi', 'Siti', 'Agus', 'Dewi', 'Rizky', 'Putri', 'Ahmad', 'Nur', 'Andi', 'Sri', 'Joko', 'Ayu', 'Fajar',
+               'Rina', 'Eko', 'Wulan', 'Hendra', 'Intan', 'Bayu', 'Lestari', 'Dimas', 'Maya', 'Yusuf', 'Fitri')
+LAST_NAMES = ('Santoso', 'Wijaya', 'Saputra', 'Hidayat', 'Pratama', 'Lestari', 'Nugroho', 'Kurniawan', 'Siregar',
+              'Nasution', 'Simanjuntak', 'Wahyudi', 'Setiawan', 'Rahmawati', 'Susanto', 'Halim', '')
+CITIES = ('Jakarta', 'Surabaya', 'Bandung', 'Medan', 'Semarang', 'Makassar', 'Palembang', 'Denpasar', 'Yogyakarta')
+STREETS = ('Jl. Merdeka', 'Jl. Sudirman', 'Jl. Diponegoro', 'Jl. Gatot Subroto', 'Gg. Melati', 'Jl. Ahmad Yani')
+COMPANIES = ('PT Maju Jaya', 'CV Sumber Rezeki', 'PT Nusantara Digital', 'Koperasi Sejahtera', 'Toko Berkah', '')
+TITLES = ('Manajer', 'Staf Admin', 'Sales', 'Pemilik', 'Guru', 'Programmer', '')
+PREFIXES = ('811', '812', '813', '821', '822', '852', '853', '857', '878', '895', '896')
+NOISE = ('hubungi', 'wa', 'cp', 'admin', 'order', 'info lebih lanjut', 'call', 'sms ke', 'reseller', '-', '|')
+
+class ContactGenerator:
+    """Menghasilkan record kontak deterministik; `phone_format` mengacak penulisan nomor yang sama."""
+
+    def __init__(self, seed=DEFAULT_SEED):
+        self.rnd = random.Random(seed)
+        self.recent = []
+
+    def digits(self):
+        """Digit nasional (tanpa 0/62); sebagian diambil ulang dari nomor sebelumnya sebagai duplikat."""
+        if self.recent and self.rnd.random() < DUPLICATE_RATIO: return self.rnd.choice(self.recent)
+        number = self.rnd.choice(PREFIXES) + str(self.rnd.randrange(10 ** 6, 10 ** 8))
+        if len(self.recent) < 4096: self.recent.append(number)
+        else: self.recent[self.rnd.randrange(4096)] = number
+        return number
+
+    def phone_format(self, digits):
+        style = self.rnd.randrange(5)
+        if style == 0: return '0' + digits
+        if style == 1: return '+62' + digits
+        if style == 2: return f"0{digits[:3]}-{digits[3:7]}-{digits[7:]}"
+        if style == 3: return f"+62 {digits[:3]} {digits[3:7]} {digits[7:]}"
+        return '62' + digits
+
+    def record(self):
+        rnd = self.rnd
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        name = f"{first} {last}".strip()
+        return {
+            'name': name, 'phone': self.phone_format(self.digits()),
+            'email': f"{first.lower()}.{(last or 'id').lower()}{rnd.randrange(1000)}@contoh.co.id",
+            'address': f"{rnd.choice(STREETS)} No. {rnd.randrange(1, 300)}, {rnd.choice(CITIES)}",
+            'organization': rnd.choice(COMPANIES), 'job_title': rnd.choice(TITLES),
+            'birthday': f"19{rnd.randrange(60, 100)}-{rnd.randrange(1, 13):02d}-{rnd.randrange(1, 29):02d}",
+            'notes': rnd.choice(('', 'Pelanggan lama', 'Reseller area timur', 'Bertemu di pameran; follow up bulan depan')),
+        }
+
+def write_csv(path, count, seed=DEFAULT_SEED):
+    gen = ContactGenerator(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('nama,telepon,email,alamat\n')
+        for _ in range(count):
+            r = gen.record()
+            f.write(f"{r['name']},{r['phone']},{r['email']},\"{r['address']}\"\n")
+
+def write_raw(path, count, seed=DEFAULT_SEED):
+    gen, rnd = ContactGenerator(seed), random.Random(seed + 1)
+    with open(path, 'w', encoding='utf-8') as f:
+        written = 0
+        while written < count:
+            per_line = min(rnd.randrange(1, 4), count - written)
+            words = [rnd.choice(NOISE) for _ in range(rnd.randrange(0, 4))]
+            words += [gen.phone_format(gen.digits()) for _ in range(per_line)]
+            rnd.shuffle(words)
+            f.write(' '.join(words) + '\n')
+            written += per_line
+
+def write_vcf(path, count, seed=DEFAULT_SEED):
+    gen, rnd = ContactGenerator(seed), random.Random(seed + 2)
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(count):
+            r = gen.record()
+            given, _, family = r['name'].partition(' ')
+            if rnd.random() < 0.1:
+                # vCard 2.1 dengan catatan quoted-printable & soft line break.
+                note = r['notes'].replace(' ', '=20')
+                f.write(f"BEGIN:VCARD\r\nVERSION:2.1\r\nN:{given};{family};;;\r\nFN:{r['name']}\r\nTEL;CELL;PREF:{r['phone']}\r\n"
+                        f"NOTE;ENCODING=QUOTED-PRINTABLE:{note[:20]}=\r\n{note[20:]}\r\nEND:VCARD\r\n")
+                continue
+            address = r['address'].replace(',', '\\,')
+            f.write(f"BEGIN:VCARD\nVERSION:3.0\nN:{family};{given};;;\nFN:{r['name']}\nTEL;TYPE=CELL:{r['phone']}\n"
+                    f"TEL;TYPE=HOME:{gen.phone_format(gen.digits())}\nEMAIL;TYPE=INTERNET:{r['email']}\n"
+                    f"ADR;TYPE=HOME:;;{address}\nORG:{r['organization']}\nTITLE:{r['job_title']}\nBDAY:{r['birthday']}\n"
+                    f"NOTE:{r['notes']}\n  (lanjutan baris terlipat)\nEND:VCARD\n")
+
+WRITERS = {'csv': write_csv, 'raw': write_raw, 'vcf': write_vcf}
+EXTENSIONS = {'csv': 'txt', 'raw': 'txt', 'vcf': 'vcf'}
+
+def corpus_path(out_dir, kind, size, seed=DEFAULT_SEED) -> str:
+    """Membuat korpus sekali lalu memakainya ulang (nama file memuat jenis, ukuran, dan seed)."""
+    path = os.path.join(out_dir, f"{kind}_{size}_{seed}.{EXTENSIONS[kind]}")
+    if not os.path.exists(path):
+        os.makedirs(out_dir, exist_ok=True)
+        tmp_path = path + '.tmp'
+        WRITERS[kind](tmp_path, SIZES[size], seed)
+        os.replace(tmp_path, path)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=SIZES, default='10k')
+    parser.add_argument('--kind', choices=KINDS, nargs='+', default=list(KINDS))
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.corpus'))
+    args = parser.parse_args()
+    for kind in args.kind:
+        path = corpus_path(args.out, kind, args.size, args.seed)
+        print(f"{kind}: {path} ({os.path.getsize(path) / 2**20:.1f} MiB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/currency_check.py
+"""Pemeriksaan ExchangeRateClient melawan tiruan exchangerate-api lokal (FakeBotAPI, tanpa jaringan).
+
+Yang diperiksa:
+  - single-flight: N pencarian bersamaan untuk pasangan (atau tabel) yang sama -> tepat 1 permintaan ke server,
+    pasangan berbeda tetap terpisah, dan setelah selesai permintaan berikutnya mengambil ulang;
+  - pembatalan satu pemanggil tidak membatalkan permintaan bersama milik pemanggil lain;
+  - timeout: server yang lebih lambat dari EXCHANGERATE_TIMEOUT -> httpx.TimeoutException dalam batas waktu,
+    semua pemanggil bersamaan menerima error yang sama dari 1 permintaan, dan error dicatat di metrik;
+  - kode mata uang tak dikenal -> ExchangeRateError.
+Exit 1 jika ada pemeriksaan yang gagal.
+
+Jalankan dari root repo:  python benchmarks/currency_check.py --callers 100
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')
+
+import config
+import metrics
+from currency import ExchangeRateClient, ExchangeRateError
+from fake_bot_api import FakeBotAPI
+
+async def run_checks(callers, latency, timeout) -> list:
+    failures = []
+    def expect(name, ok, detail=''):
+        print(f"{'OK   ' if ok else 'GAGAL'} {name}{f': {detail}' if detail else ''}")
+        if not ok: failures.append(name)
+
+    api = FakeBotAPI(rates_latency=latency).start()
+    client = ExchangeRateClient('cek', base_url=api.rates_url, timeout=timeout * 10, max_connections=callers)
+    try:
+        rates = await asyncio.gather(*(client.get_rate('usd', 'IDR') for _ in range(callers)))
+        expect(f"{callers} get_rate bersamaan -> 1 permintaan", len(api.rate_requests) == 1, f"{len(api.rate_requests)} permintaan")
+        expect("semua pemanggil menerima kurs yang sama", set(rates) == {api.rates['IDR']}, str(set(rates)))
+
+        api.rate_requests.clear()
+        await asyncio.gather(*(client.get_rate(*pair) for _ in range(callers) for pair in (('USD', 'EUR'), ('EUR', 'USD'))))
+        expect("dua pasangan berbeda -> 2 permintaan", len(api.rate_requests) == 2, f"{len(api.rate_requests)} permintaan")
+
+        api.rate_requests.clear()
+        tables = await asyncio.gather(*(client.get_latest('usd') for _ in range(callers)))
+        expect(f"{callers} get_latest bersamaan -> 1 permintaan", len(api.rate_requests) == 1 and all(t is tables[0] for t in tables),
+               f"{len(api.rate_requests)} permintaan")
+
+        api.rate_requests.clear()
+        await client.get_rate('USD', 'IDR')
+        expect("permintaan setelah selesai mengambil ulang", len(api.rate_requests) == 1 and not client._inflight)
+
+        api.rate_requests.clear()
+        first, second = asyncio.ensure_future(client.get_rate('USD', 'SGD')), asyncio.ensure_future(client.get_rate('USD', 'SGD'))
+        await asyncio.sleep(latency / 2)
+        first.cancel()
+        try: rate = await second
+        except Exception as e: expect("pemanggil lain selamat saat satu dibatalkan", False, repr(e))
+        else: expect("pemanggil lain selamat saat satu dibatalkan", rate == api.rates['SGD'] and len(api.rate_requests) == 1)
+
+        try: await client.get_rate('USD', 'XXX'); expect("kode tak dikenal -> ExchangeRateError", False, "tidak ada error")
+        except ExchangeRateError as e: expect("kode tak dikenal -> ExchangeRateError", str(e) == 'unsupported-code', str(e))
+    finally:
+        await client.aclose()
+
+    # Server lebih lambat dari batas waktu klien.
+    slow = ExchangeRateClient('cek', base_url=api.rates_url, timeout=timeout, max_connections=callers)
+    api.rates_latency, errors_before = timeout * 5, metrics.registry.counters.get(('xrx_currency_upstream_errors_total', (('endpoint', 'pair'),)), 0)
+    api.rate_requests.clear()
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(slow.get_rate('USD', 'JPY') for _ in range(callers)), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        expect("timeout dilempar ke semua pemanggil", all(isinstance(r, httpx.TimeoutException) for r in results),
+               f"{sum(isinstance(r, httpx.TimeoutException) for r in results)}/{callers}")
+        expect("timeout dalam batas waktu", elapsed < timeout * 3, f"{elapsed:.2f}s (batas {timeout}s)")
+        expect("timeout bersamaan -> 1 permintaan", len(api.rate_requests) == 1, f"{len(api.rate_requests)} permintaan")
+        errors = metrics.registry.counters.get(('xrx_currency_upstream_errors_total', (('endpoint', 'pair'),)), 0) - errors_before
+        expect("timeout dicatat di metrik", errors == 1 or not config.METRICS_ENABLED, f"{errors} error")
+        expect("pencarian gagal tidak tertahan di inflight", not slow._inflight)
+    finally:
+        await slow.aclose()
+        api.stop()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--callers', type=int, default=100, help="jumlah pencarian bersamaan per pemeriksaan")
+    parser.add_argument('--latency', type=float, default=0.2, help="tunda balasan server tiruan (detik)")
+    parser.add_argument('--timeout', type=float, default=0.3, help="batas waktu klien untuk pemeriksaan timeout (detik)")
+    args = parser.parse_args()
+    failures = asyncio.run(run_checks(args.callers, args.latency, args.timeout))
+    print(f"{len(failures)} pemeriksaan gagal" if failures else "Semua pemeriksaan lolos")
+    if failures: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+# benchmarks/fake_bot_api.py
+"""Bot API tiruan lokal untuk menguji throughput & urutan pesan keluar tanpa jaringan.
+
+Melayani `POST /bot<token>/<metode>` (JSON, urlencoded, atau multipart) dan mencatat setiap panggilan.
+Batas flood Telegram ditiru: melebihi laju per chat atau global dibalas 429 + `retry_after`.
+Untuk uji ujung-ke-ujung juga tersedia `getUpdates` (long polling dari antrean yang diisi `push_update`),
+`getFile` + unduhan `GET /file/bot<token>/<path>` untuk file yang didaftarkan lewat `add_file`, dan
+tiruan exchangerate-api di `GET /rates/<kunci>/latest/<BASE>` dan `/rates/<kunci>/pair/<DARI>/<KE>` (arahkan
+EXCHANGERATE_API_URL ke `rates_url`; setiap permintaan dicatat di `rate_requests`, `rates_latency` menunda balasan).
+
+Dipakai dari kode:  api = FakeBotAPI(chat_rate=1, global_rate=30); api.start(); ...; api.stop()
+atau mandiri:       python benchmarks/fake_bot_api.py --port 8081
+"""
+
+import time
+import json
+import email
+import argparse
+import itertools
+import threading
+from email import policy
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'XRX Fake', 'username': 'xrx_fake_bot'}
+
+def parse_body(content_type, body) -> tuple[dict, dict]:
+    """Mengembalikan (parameter, {nama_field: {'filename', 'size'}}) dari badan permintaan Bot API."""
+    if not body: return {}, {}
+    if content_type.startswith('application/json'): return json.loads(body), {}
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        return {key: values[-1] for key, values in parse_qs(body.decode()).items()}, {}
+    params, files = {}, {}
+    message = email.message_from_bytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body, policy=policy.HTTP)
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if part.get_filename(): files[name] = {'filename': part.get_filename(), 'size': len(part.get_payload(decode=True) or b'')}
+        else: params[name] = part.get_content().strip()
+    return params, files
+
+class FakeBotAPI:
+    """Server Bot API tiruan dalam thread latar belakang; `calls` berisi riwayat panggilan yang diterima."""
+
+    def __init__(self, host='127.0.0.1', port=0, chat_rate=None, chat_burst=3, group_rate=None, global_rate=None, latency=0.0, rates=None, rates_latency=0.0):
+        self.chat_rate, self.chat_burst, self.group_rate, self.global_rate, self.latency = chat_rate, chat_burst, group_rate, global_rate, latency
+        self.rates = rates or {'USD': 1.0, 'IDR': 16250.0, 'EUR': 0.92, 'SGD': 1.34, 'JPY': 151.3, 'MYR': 4.7}
+        self.rates_latency, self.rate_requests = rates_latency, []
+        self.calls, self.rejected = [], 0
+        # Dipanggil (dari thread server) untuk setiap panggilan yang diterima; dipakai driver uji beban.
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+        self._chat_tokens, self._global_window = {}, []
+        self._updates, self._update_ids, self._updates_ready = [], itertools.count(1), threading.Condition()
+        self._files = {}
+        self.methods = {
+            'getMe': lambda params, files: BOT_USER,
+            'getUpdates': self._get_updates,
+            'getFile': self._get_file,
+            'sendMessage': self._message,
+            'sendDocument': self._message,
+            'editMessageText': self._message,
+            'answerCallbackQuery': lambda params, files: True,
+            'deleteWebhook': lambda params, files: True,
+        }
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    @property
+    def file_url(self) -> str:
+        return self.base_url.replace('/bot', '/file/bot')
+
+    @property
+    def rates_url(self) -> str:
+        return self.base_url.replace('/bot', '/rates')
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._updates_ready: self._updates_ready.notify_all()
+        self._server.shutdown(); self._server.server_close()
+
+    def push_update(self, update) -> int:
+        """Mengantrekan satu update (dict tanpa update_id) untuk getUpdates; mengembalikan update_id-nya."""
+        with self._updates_ready:
+            update_id = update['update_id'] = next(self._update_ids)
+            self._updates.append(update)
+            self._updates_ready.notify_all()
+        return update_id
+
+    def add_file(self, data, file_name, mime_type='text/plain') -> dict:
+        """Mendaftarkan isi file yang bisa diunduh bot; mengembalikan objek Document untuk dimasukkan ke update."""
+        file_id = f"file{len(self._files) + 1}"
+        self._files[file_id] = data
+        return {'file_id': file_id, 'file_unique_id': f"u{file_id}", 'file_name': file_name, 'mime_type': mime_type, 'file_size': len(data)}
+
+    def calls_for(self, chat_id, method=None) -> list:
+        return [call for call in self.calls if call['chat_id'] == chat_id and (method is None or call['method'] == method)]
+
+    def _message(self, params, files):
+        chat_id = int(params.get('chat_id', 0))
+        message = {'message_id': int(params.get('message_id') or next(self._message_ids)), 'date': int(time.time()),
+                   'chat': {'id': chat_id, 'type': 'group' if chat_id < 0 else 'private'}}
+        if 'text' in params: message['text'] = params['text']
+        if files: message['document'] = {'file_id': f"doc{message['message_id']}", 'file_unique_id': f"u{message['message_id']}", 'file_size': sum(f['size'] for f in files.values())}
+        return message
+
+    def _get_updates(self, params, files):
+        offset, limit = int(params.get('offset') or 0), int(params.get('limit') or 100)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        with self._updates_ready:
+            # Update dengan id di bawah offset sudah dikonfirmasi bot dan tidak dikirim ulang.
+            self._updates = [update for update in self._updates if update['update_id'] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._updates_ready.wait(deadline - time.monotonic())
+            return self._updates[:limit]
+
+    def _get_file(self, params, files):
+        file_id = params['file_id']
+        return {'file_id': file_id, 'file_unique_id': f"u{file_id}", 'file_size': len(self._files[file_id]), 'file_path': f"documents/{file_id}"}
+
+    def _rates(self, path) -> tuple[int, dict]:
+        with self._lock: self.rate_requests.append(path)
+        if self.rates_latency: time.sleep(self.rates_latency)
+        # /rates/<kunci>/latest/<BASE> atau /rates/<kunci>/pair/<DARI>/<KE>
+        endpoint, *codes = path.rstrip('/').split('/')[3:]
+        codes = [code.upper() for code in codes]
+        if endpoint not in ('latest', 'pair') or len(codes) != (1 if endpoint == 'latest' else 2):
+            return 404, {'result': 'error', 'error-type': 'unsupported-endpoint'}
+        if any(code not in self.rates for code in codes): return 200, {'result': 'error', 'error-type': 'unsupported-code'}
+        if endpoint == 'pair':
+            return 200, {'result': 'success', 'base_code': codes[0], 'target_code': codes[1], 'conversion_rate': self.rates[codes[1]] / self.rates[codes[0]]}
+        base = codes[0]
+        return 200, {'result': 'success', 'base_code': base, 'conversion_rates': {code: rate / self.rates[base] for code, rate in self.rates.items()}}
+
+    def _flood_wait(self, chat_id, now) -> float:
+        """Mengembalikan detik yang harus ditunggu jika permintaan ini melanggar batas (0 jika boleh)."""
+        if self.global_rate:
+            self._global_window = [t for t in self._global_window if now - t < 1.0]
+            if len(self._global_window) >= self.global_rate: return 1.0
+        is_group = chat_id is not None and chat_id < 0
+        rate, burst = (self.group_rate, 1) if is_group else (self.chat_rate, self.chat_burst)
+        if rate and chat_id is not None:
+            tokens, updated = self._chat_tokens.get(chat_id, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            # Toleransi kecil untuk jitter jam antara klien dan server.
+            if tokens < 0.9: return (1 - tokens) / rate
+            self._chat_tokens[chat_id] = (tokens - 1, now)
+        return 0.0
+
+    def handle(self, method, params, files) -> tuple[int, dict]:
+        chat_id = int(params['chat_id']) if params.get('chat_id') not in (None, '') else None
+        with self._lock:
+            now = time.monotonic()
+            if method.startswith('send'):
+                wait = self._flood_wait(chat_id, now)
+                if wait:
+                    self.rejected += 1
+                    return 429, {'ok': False, 'error_code': 429, 'description': f"Too Many Requests: retry after {int(wait) + 1}", 'parameters': {'retry_after': int(wait) + 1}}
+                self._global_window.append(now)
+            call = {'method': method, 'chat_id': chat_id, 'params': params, 'files': files, 'time': now}
+            self.calls.append(call)
+        for listener in self.listeners: listener(call)
+        handler = self.methods.get(method)
+        if handler is None: return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}
+        if self.latency: time.sleep(self.latency)
+        return 200, {'ok': True, 'result': handler(params, files)}
+
+    def _handler_class(self):
+        api = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/file/'):
+                    data = api._files.get(self.path.rsplit('/', 1)[-1])
+                    if data is None: return self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/octet-stream')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    return self.wfile.write(data)
+                if self.path.startswith('/rates/'): return self._reply(*api._rates(self.path))
+                self.do_POST()
+            def do_POST(self):
+                method = self.path.rstrip('/').rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                params, files = parse_body(self.headers.get('Content-Type', ''), body)
+                status, payload = api.handle(method, params, files)
+                self._reply(status, payload)
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            def handle_one_request(self):
+                # Long poll getUpdates yang diputus klien saat berhenti bukan kesalahan.
+                try: super().handle_one_request()
+                except (BrokenPipeError, ConnectionResetError): self.close_connection = True
+            def log_message(self, *args): pass
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--chat-rate', type=float, default=1.0)
+    parser.add_argument('--global-rate', type=float, default=30.0)
+    args = parser.parse_args()
+    api = FakeBotAPI(port=args.port, chat_rate=args.chat_rate, global_rate=args.global_rate)
+    print(f"Bot API tiruan di {api.base_url}<token>/<metode>")
+    try: api._server.serve_forever()
+    except KeyboardInterrupt: api.stop()
+
+if __name__ == '__main__':
+    main()
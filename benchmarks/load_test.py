@@ -0,0 +1,310 @@
+# benchmarks/load_test.py
+"""Uji beban ujung-ke-ujung: bot lengkap (handler, persistence, job, FloodLimiter) melawan Bot API tiruan.
+
+Bot berjalan persis seperti produksi (long polling `getUpdates`, atau dengan --webhook update di-POST ke
+WebhookServer lokal), tetapi semua permintaan keluar diarahkan ke FakeBotAPI lokal. Driver memutar ribuan pengguna simulasi melalui alur konversi, gabung file, /calc, /kurs,
+dan balasan grup; setiap langkah menyuntikkan update lalu menunggu balasan terakhir handler tersebut.
+
+Laporan: latensi p50/p99/maks per langkah (update masuk -> balasan diterima API), lag event loop
+(selisih tidur terjadwal vs aktual), throughput update & alur, jumlah 429, dan langkah yang gagal/timeout.
+
+Jalankan dari root repo:
+  python benchmarks/load_test.py --users 500 --active 100
+  python benchmarks/load_test.py --users 200 --mix convert=1 --contacts 2000 --output hasil.json
+  python benchmarks/load_test.py --no-limiter --no-flood      # tanpa batas flood, murni biaya handler
+  python benchmarks/load_test.py --webhook                     # update lewat ingress webhook
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import itertools
+import httpx
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault('TELEGRAM_TOKEN', '1:fake')
+os.environ.setdefault('EXCHANGERATE_API_KEY', 'bench')
+
+from telegram.ext import Application
+
+import config
+import currency
+import database
+import jobs
+import metrics
+import workers
+import workspace
+from corpus import write_csv, write_raw
+from fake_bot_api import FakeBotAPI, BOT_USER
+from flood_limiter import FloodLimiter
+from handlers import register_handlers
+from sqlite_persistence import SQLitePersistence
+from update_processor import ChatOrderedUpdateProcessor
+from webhook_server import WebhookServer
+
+REPLY_METHODS = ('sendMessage', 'sendDocument', 'editMessageText')
+DEFAULT_MIX = 'convert=3,merge=1,calc=3,kurs=2,group=1'
+
+def percentile(values, fraction) -> float:
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class LoadDriver:
+    """Menyuntikkan update ke FakeBotAPI dan mencocokkan balasan bot per chat untuk mengukur latensi."""
+
+    def __init__(self, api, loop, step_timeout=60.0, webhook=None):
+        self.api, self.loop, self.step_timeout = api, loop, step_timeout
+        # (httpx.AsyncClient, url, secret) untuk mengirim update lewat webhook alih-alih getUpdates.
+        self.webhook = webhook
+        self.rejected_503 = 0
+        self._update_ids = itertools.count(1)
+        self.inboxes = defaultdict(asyncio.Queue)
+        self.latencies = defaultdict(list)
+        self.failures = defaultdict(int)
+        self.updates_sent = 0
+        self._message_ids = itertools.count(1)
+        api.listeners.append(self._on_call)
+
+    def _on_call(self, call):
+        # Dipanggil dari thread server: teruskan ke antrean chat di event loop driver.
+        if call['method'] in REPLY_METHODS and call['chat_id'] is not None:
+            self.loop.call_soon_threadsafe(self.inboxes[call['chat_id']].put_nowait, call)
+
+    def _message(self, user_id, chat_id, **fields) -> dict:
+        chat = {'id': chat_id, 'type': 'supergroup' if chat_id < 0 else 'private'}
+        if chat_id < 0: chat['title'] = f"Grup {-chat_id}"
+        return {'message_id': next(self._message_ids), 'date': int(time.time()), 'chat': chat,
+                'from': {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"}, **fields}
+
+    def text(self, user_id, text, chat_id=None) -> dict:
+        fields = {'text': text}
+        if text.startswith('/'): fields['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'message': self._message(user_id, chat_id or user_id, **fields)}
+
+    def document(self, user_id, data, file_name) -> dict:
+        return {'message': self._message(user_id, user_id, document=self.api.add_file(data, file_name))}
+
+    def callback(self, user_id, data) -> dict:
+        message = self._message(user_id, user_id, text='menu')
+        message['from'] = BOT_USER
+        return {'callback_query': {'id': str(next(self._message_ids)), 'from': message['chat'] | {'is_bot': False, 'first_name': f"User{user_id}"},
+                                   'chat_instance': str(user_id), 'data': data, 'message': message}}
+
+    async def expect(self, name, chat_id, since, method, contains=None):
+        """Menunggu panggilan `method` ke chat ini (berisi `contains`) yang diterima setelah `since`."""
+        inbox, deadline = self.inboxes[chat_id], self.loop.time() + self.step_timeout
+        while True:
+            try: call = await asyncio.wait_for(inbox.get(), deadline - self.loop.time())
+            except asyncio.TimeoutError:
+                self.failures[name] += 1
+                raise
+            if call['time'] >= since and call['method'] == method and (contains is None or contains in call['params'].get('text', '')):
+                self.latencies[name].append(call['time'] - since)
+                return call
+
+    async def deliver(self, update):
+        if self.webhook is None: self.api.push_update(update); return
+        client, url, secret = self.webhook
+        update['update_id'] = next(self._update_ids)
+        # 503 = backpressure ingress: kirim ulang seperti Telegram.
+        while (await client.post(url, json=update, headers={'X-Telegram-Bot-Api-Secret-Token': secret})).status_code == 503:
+            self.rejected_503 += 1
+            await asyncio.sleep(0.5)
+
+    async def step(self, name, update, method, contains=None, chat_id=None):
+        """Mengirim satu update lalu menunggu balasan penanda akhir handler; mengembalikan waktu kirim."""
+        chat_id = chat_id or (update.get('message') or update['callback_query']['message'])['chat']['id']
+        since = time.monotonic()
+        await self.deliver(update)
+        self.updates_sent += 1
+        await self.expect(name, chat_id, since, method, contains)
+        return since
+
+class SimulatedUser:
+    """Satu pengguna yang menjalankan satu alur; file unggahan dibuat deterministik dari user_id."""
+
+    def __init__(self, driver, user_id, contacts, corpus_dir):
+        self.driver, self.user_id, self.contacts, self.corpus_dir = driver, user_id, contacts, corpus_dir
+
+    def _file(self, writer, name) -> bytes:
+        path = os.path.join(self.corpus_dir, f"{self.user_id}_{name}")
+        writer(path, self.contacts, seed=self.user_id)
+        with open(path, 'rb') as f: data = f.read()
+        os.remove(path)
+        return data
+
+    async def convert(self):
+        d, uid = self.driver, self.user_id
+        await d.step('start', d.text(uid, '/start'), 'sendMessage', 'XRX BOT')
+        await d.step('convert.menu', d.callback(uid, 'start_convert'), 'editMessageText', 'Kirim file')
+        await d.step('convert.upload', d.document(uid, self._file(write_csv, 'kontak.txt'), 'kontak.txt'), 'sendMessage', 'Ingin membagi')
+        await d.step('convert.split', d.text(uid, '/skip'), 'sendMessage', 'Pilih format')
+        await d.step('convert.format', d.callback(uid, 'export_vcf'), 'editMessageText', 'Masukkan nama')
+        since = await d.step('convert.filename', d.text(uid, 'hasil'), 'sendMessage', 'Memproses')
+        await d.expect('convert.job', uid, since, 'sendDocument')
+
+    async def merge(self):
+        d, uid = self.driver, self.user_id
+        await d.step('start', d.text(uid, '/start'), 'sendMessage', 'XRX BOT')
+        await d.step('merge.menu', d.callback(uid, 'start_merge'), 'editMessageText', 'file pertama')
+        await d.step('merge.upload', d.document(uid, self._file(write_csv, 'a.txt'), 'a.txt'), 'sendMessage', 'file kedua')
+        await d.step('merge.upload', d.document(uid, self._file(write_raw, 'b.txt'), 'b.txt'), 'sendMessage', 'Kirim file berikutnya')
+        await d.step('merge.done', d.callback(uid, 'merge_done'), 'editMessageText', 'duplikat')
+        since = time.monotonic()
+        await d.step('merge.dedup', d.callback(uid, 'dedup_yes'), 'editMessageText')
+        await d.expect('merge.job', uid, since, 'sendMessage', 'Pilih format output')
+        await d.step('merge.format', d.callback(uid, 'export_vcf'), 'editMessageText', 'Masukkan nama')
+        since = await d.step('merge.filename', d.text(uid, 'gabungan'), 'sendMessage', 'Sedang membuat')
+        await d.expect('merge.export_job', uid, since, 'sendDocument')
+
+    async def calc(self):
+        d, uid = self.driver, self.user_id
+        await d.step('calc', d.text(uid, f"/calc ({uid % 97} + 3) * 2 / 4"), 'sendMessage', 'Hasil')
+
+    async def kurs(self):
+        d, uid = self.driver, self.user_id
+        await d.step('kurs', d.text(uid, f"/kurs {uid % 500 + 1} USD IDR"), 'sendMessage', 'IDR')
+
+    async def group(self):
+        d, uid = self.driver, self.user_id
+        await d.step('settings', d.text(uid, '/settings'), 'sendMessage', 'Pengaturan')
+        await d.step('group.reply', d.text(uid, f"{uid % 89} * 12 + 7", chat_id=-uid), 'sendMessage', 'Hasilnya')
+
+async def probe_loop_lag(samples, interval=0.05):
+    """Mencatat keterlambatan bangun `asyncio.sleep` sebagai ukuran lag event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+def build_application(api, limiter, sequential):
+    builder = (Application.builder().token(config.TELEGRAM_TOKEN).base_url(api.base_url).base_file_url(api.file_url)
+               .persistence(SQLitePersistence(filepath=config.PERSISTENCE_FILE)).concurrent_updates(False if sequential else ChatOrderedUpdateProcessor())
+               .connection_pool_size(256).pool_timeout(30))
+    if limiter: builder = builder.rate_limiter(limiter)
+    application = builder.build()
+    register_handlers(application)
+    return application
+
+async def run(args) -> dict:
+    mix = {name: float(weight) for name, weight in (item.split('=') for item in args.mix.split(','))}
+    flood = {} if args.no_flood else dict(chat_rate=1.0, group_rate=20 / 60, global_rate=30.0)
+    api = FakeBotAPI(latency=args.api_latency, **flood).start()
+    # Klien & cache kurs dibuat malas dari config, jadi cukup diarahkan ke API tiruan sebelum dipakai.
+    config.EXCHANGERATE_API_URL, config.EXCHANGERATE_SNAPSHOT_FILE = api.rates_url, ''
+    limiter = None if args.no_limiter else FloodLimiter()
+    database.setup_database()
+    application = build_application(api, limiter, args.sequential)
+
+    loop = asyncio.get_running_loop()
+    http = httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=args.active))
+    webhook = WebhookServer(application, listen='127.0.0.1', port=0, secret_token='load-test', max_pending=args.webhook_pending) if args.webhook else None
+    driver, lag_samples = LoadDriver(api, loop, args.step_timeout), []
+    rnd = random.Random(args.seed)
+    flows = rnd.choices(list(mix), weights=list(mix.values()), k=args.users)
+    completed, active = defaultdict(int), asyncio.Semaphore(args.active)
+
+    async def simulate(user_id, flow):
+        async with active:
+            try:
+                await getattr(SimulatedUser(driver, user_id, args.contacts, os.getcwd()), flow)()
+                completed[flow] += 1
+            except asyncio.TimeoutError: pass
+
+    async with application:
+        await application.start()
+        if webhook:
+            await webhook.start()
+            host, port = webhook.address
+            driver.webhook = (http, f"http://{host}:{port}{webhook.path}", 'load-test')
+        else: await application.updater.start_polling(poll_interval=0, timeout=1)
+        await metrics.start()
+        lag_task = asyncio.create_task(probe_loop_lag(lag_samples))
+        started = time.monotonic()
+        await asyncio.gather(*(simulate(index + 1000, flow) for index, flow in enumerate(flows)))
+        elapsed = time.monotonic() - started
+        lag_task.cancel()
+        if webhook: await webhook.drain(timeout=30)
+        else: await application.updater.stop()
+        await application.stop()
+    await http.aclose()
+    stats_text = metrics.summary()
+    await metrics.shutdown()
+    await jobs.shutdown()
+    await workspace.shutdown()
+    workers.shutdown()
+    await currency.shutdown()
+    database.close_database()
+    api.stop()
+
+    return {
+        'meta': {'users': args.users, 'active': args.active, 'mix': mix, 'contacts': args.contacts, 'limiter': limiter is not None,
+                 'flood': not args.no_flood, 'sequential': args.sequential, 'webhook': args.webhook, 'seed': args.seed},
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput': {'updates_per_sec': round(driver.updates_sent / elapsed, 1), 'flows_per_sec': round(sum(completed.values()) / elapsed, 2)},
+        'flows': {flow: {'started': flows.count(flow), 'completed': completed[flow]} for flow in mix},
+        'steps': {name: {'count': len(values), 'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                         'p99_ms': round(percentile(values, 0.99) * 1000, 1), 'max_ms': round(max(values) * 1000, 1)}
+                  for name, values in sorted(driver.latencies.items())},
+        'failures': dict(driver.failures),
+        'loop_lag_ms': {'p50': round(percentile(lag_samples, 0.50) * 1000, 2), 'p99': round(percentile(lag_samples, 0.99) * 1000, 2),
+                        'max': round(max(lag_samples, default=0.0) * 1000, 2)},
+        'api': {'rejected_429': api.rejected, 'calls': len(api.calls), 'webhook_503': driver.rejected_503},
+        'limiter': dict(limiter.stats) if limiter else None,
+        **({'metrics': stats_text} if args.stats else {}),
+    }
+
+def print_report(report):
+    meta, throughput = report['meta'], report['throughput']
+    print(f"{meta['users']} pengguna ({meta['active']} aktif bersamaan) selesai dalam {report['elapsed_seconds']} dtk: "
+          f"{throughput['updates_per_sec']} update/dtk, {throughput['flows_per_sec']} alur/dtk")
+    for flow, counts in report['flows'].items(): print(f"  alur {flow:<8} {counts['completed']}/{counts['started']} selesai")
+    print(f"{'langkah':<20} {'n':>6} {'p50 ms':>9} {'p99 ms':>9} {'maks ms':>9}")
+    for name, stats in report['steps'].items():
+        print(f"{name:<20} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+    lag = report['loop_lag_ms']
+    print(f"lag event loop: p50 {lag['p50']} ms, p99 {lag['p99']} ms, maks {lag['max']} ms")
+    print(f"429 dari API: {report['api']['rejected_429']}, 503 dari webhook: {report['api']['webhook_503']}, langkah gagal/timeout: {report['failures'] or 0}")
+    if 'metrics' in report: print(f"\nMetrik bot (/stats):\n{report['metrics']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--active', type=int, default=100, help="jumlah pengguna yang menjalankan alur bersamaan")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="bobot alur, mis. convert=3,merge=1,calc=3,kurs=2,group=1")
+    parser.add_argument('--contacts', type=int, default=200, help="jumlah kontak per file unggahan")
+    parser.add_argument('--sequential', action='store_true', help="proses update satu per satu (tanpa ChatOrderedUpdateProcessor)")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="latensi tiruan per panggilan Bot API (detik)")
+    parser.add_argument('--step-timeout', type=float, default=120.0)
+    parser.add_argument('--no-limiter', action='store_true', help="tanpa FloodLimiter")
+    parser.add_argument('--no-flood', action='store_true', help="API tiruan tidak membalas 429")
+    parser.add_argument('--webhook', action='store_true', help="kirim update lewat WebhookServer lokal (HTTP POST)")
+    parser.add_argument('--webhook-pending', type=int, default=1024, help="batas update tertunda webhook (uji backpressure)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--stats', action='store_true', help="sertakan ringkasan metrik bot (seperti /stats)")
+    parser.add_argument('--output', help="tulis hasil JSON ke file ini ('-' untuk stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # Database, persistence, workspace, dan parse cache memakai path relatif: jalankan di direktori sementara.
+    with tempfile.TemporaryDirectory(prefix='xrx_load_') as work_dir:
+        os.chdir(work_dir)
+        report = asyncio.run(run(args))
+    print_report(report)
+    if args.output == '-': json.dump(report, sys.stdout, indent=2); print()
+    elif args.output:
+        with open(os.path.join(os.path.dirname(BENCH_DIR), args.output) if not os.path.isabs(args.output) else args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
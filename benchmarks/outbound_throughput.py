@@ -0,0 +1,61 @@
+# benchmarks/outbound_throughput.py
+"""Mengukur throughput, jumlah 429, dan urutan pesan keluar melalui FloodLimiter terhadap Bot API tiruan.
+
+Tiap chat menerima satu pesan status lalu `--docs` dokumen berurutan (meniru ekspor yang dipecah).
+Jalankan dari root repo:  python benchmarks/outbound_throughput.py --chats 20 --docs 5 [--no-limiter]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_TOKEN', '1:fake')
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+
+from fake_bot_api import FakeBotAPI
+from flood_limiter import FloodLimiter
+
+async def deliver(bot, chat_id, docs, lost):
+    try:
+        await bot.send_message(chat_id, "⏳ Memproses file...")
+        for index in range(docs):
+            await bot.send_document(chat_id, document=b'BEGIN:VCARD\nEND:VCARD\n', filename=f"kontak_{index + 1}.vcf")
+    except RetryAfter:
+        lost.append(chat_id)
+
+async def run(args):
+    api = FakeBotAPI(chat_rate=args.chat_rate, global_rate=args.global_rate).start()
+    limiter = None if args.no_limiter else FloodLimiter(global_rate=args.global_rate, chat_rate=args.chat_rate, max_retries=args.retries)
+    bot = ExtBot('1:fake', base_url=api.base_url, rate_limiter=limiter)
+    lost = []
+    async with bot:
+        started = time.monotonic()
+        await asyncio.gather(*(deliver(bot, chat_id, args.docs, lost) for chat_id in range(1, args.chats + 1)))
+        elapsed = time.monotonic() - started
+    api.stop()
+
+    sent = sum(1 for call in api.calls if call['method'].startswith('send'))
+    out_of_order = 0
+    for chat_id in range(1, args.chats + 1):
+        names = [call['files']['document']['filename'] for call in api.calls_for(chat_id, 'sendDocument')]
+        out_of_order += names != [f"kontak_{index + 1}.vcf" for index in range(args.docs)]
+    print(f"terkirim: {sent} pesan dalam {elapsed:.2f} dtk ({sent / elapsed:.1f}/dtk)")
+    print(f"429 diterima: {api.rejected}, chat gagal: {len(lost)}, chat tidak lengkap/tidak urut: {out_of_order}")
+    if limiter: print(f"retry: {limiter.stats['retries']}, total tunggu di bucket: {limiter.stats['wait_seconds']:.1f} dtk")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--docs', type=int, default=5)
+    parser.add_argument('--chat-rate', type=float, default=1.0)
+    parser.add_argument('--global-rate', type=float, default=30.0)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--no-limiter', action='store_true', help="kirim langsung tanpa FloodLimiter sebagai pembanding")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == '__main__':
+    main()
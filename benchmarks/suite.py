@@ -0,0 +1,183 @@
+# benchmarks/suite.py
+"""Benchmark semua jalur inti (parsing, penulisan, merge, konversi) pada korpus sintetis deterministik.
+
+Tiap tahap berjalan di subprocess terpisah sehingga puncak RSS tidak tercampur antar tahap. Laporan per
+tahap: kontak/detik, puncak RSS, selisih blok alokasi (sys.getallocatedblocks) dan, dengan --trace-alloc,
+puncak alokasi tracemalloc (pada lintasan terpisah karena tracemalloc memperlambat).
+
+Jalankan dari root repo:
+  python benchmarks/suite.py --size 10k                       # laporan tabel
+  python benchmarks/suite.py --size 1m --output hasil.json    # + JSON
+  python benchmarks/suite.py --size 10k --compare             # bandingkan dengan benchmarks/baseline.json (exit 1 jika regresi)
+  python benchmarks/suite.py --size 10k --update-baseline
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import tracemalloc
+import multiprocessing
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault('TELEGRAM_TOKEN', 'benchmark')
+
+import formats
+from corpus import SIZES, DEFAULT_SEED, corpus_path
+from core_logic import parse_txt_file_smartly, write_contact_files
+from core_functions import parse_txt_file, parse_vcf_file, merge_contacts, write_csv_file
+
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+# Tahap yang lebih singkat dari ini terlalu berisik untuk dibandingkan kecepatannya (pakai korpus lebih besar).
+MIN_COMPARE_SECONDS = 0.05
+
+def _discard(result):
+    parts, count = result
+    for part in parts: part.discard()
+    return count
+
+def _halves(path):
+    contacts = parse_txt_file(path)
+    middle = len(contacts) // 2
+    return [contacts[:middle], contacts[middle:]]
+
+def _merge(halves, work_dir):
+    merge_contacts(halves, deduplicate=True)
+    return sum(len(half) for half in halves)
+
+# nama -> (jenis korpus, setup(path) -> data tak terukur, run(data, work_dir) -> jumlah kontak diproses)
+STAGES = {
+    'parse_txt_smart_csv': ('csv', lambda path: path, lambda path, work_dir: len(parse_txt_file_smartly(path)['contacts'])),
+    'parse_txt_smart_raw': ('raw', lambda path: path, lambda path, work_dir: len(parse_txt_file_smartly(path)['contacts'])),
+    'parse_txt_file': ('csv', lambda path: path, lambda path, work_dir: len(parse_txt_file(path))),
+    'parse_vcf_file': ('vcf', lambda path: path, lambda path, work_dir: len(parse_vcf_file(path))),
+    'merge_contacts': ('csv', _halves, _merge),
+    'write_contact_files': ('raw', lambda path: parse_txt_file_smartly(path)['contacts'],
+                            lambda contacts, work_dir: write_contact_files(contacts, work_dir, contacts_per_file=100_000, base_name='Kontak')[1]),
+    'write_csv_google': ('vcf', parse_vcf_file, lambda contacts, work_dir: write_csv_file(contacts, os.path.join(work_dir, 'kontak.csv'), 'google')),
+    'convert_vcf_to_csv': ('vcf', lambda path: path, lambda path, work_dir: _discard(formats.convert(path, 'csv', 'kontak', spool_dir=work_dir))),
+    'merge_files_external': ('csv', lambda path: [path, path.replace('csv_', 'raw_')],
+                             lambda paths, work_dir: formats.merge_files(paths, os.path.join(work_dir, 'merged.bin'), work_dir=work_dir)['input']),
+}
+
+def _rss_mb() -> float:
+    """RSS saat ini (Linux: /proc/self/statm); platform lain memakai puncak ru_maxrss."""
+    try:
+        with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError): return _peak_rss_mb()
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+def _run_stage(name, path, repeat, trace_alloc, queue):
+    _, setup, run = STAGES[name]
+    work_dir = tempfile.mkdtemp(prefix='bench_')
+    try:
+        data = setup(path)
+        gc.collect()
+        rss_before, blocks_before = _rss_mb(), sys.getallocatedblocks()
+        best, count = float('inf'), 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = run(data, work_dir)
+            best = min(best, time.perf_counter() - started)
+        result = {
+            'contacts': count, 'seconds': round(best, 4), 'contacts_per_sec': round(count / best, 1) if best else 0.0,
+            'rss_before_mb': round(rss_before, 1), 'peak_rss_mb': round(_peak_rss_mb(), 1),
+            'alloc_blocks_delta': sys.getallocatedblocks() - blocks_before,
+        }
+        if trace_alloc:
+            tracemalloc.start()
+            run(data, work_dir)
+            result['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+        queue.put(result)
+    except BaseException as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def run_suite(size, stages, corpus_dir, repeat=1, trace_alloc=False, seed=DEFAULT_SEED) -> dict:
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for name in stages:
+        kind = STAGES[name][0]
+        path = corpus_path(corpus_dir, kind, size, seed)
+        if name == 'merge_files_external': corpus_path(corpus_dir, 'raw', size, seed)
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_stage, args=(name, path, repeat, trace_alloc, queue))
+        process.start()
+        results[name] = queue.get()
+        process.join()
+        print(_format_row(name, results[name]), file=sys.stderr)
+    return {
+        'meta': {'size': size, 'seed': seed, 'repeat': repeat, 'python': platform.python_version(),
+                 'platform': platform.platform(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'stages': results,
+    }
+
+def _format_row(name, result) -> str:
+    if 'error' in result: return f"{name:<22} GAGAL: {result['error']}"
+    row = (f"{name:<22} {result['contacts']:>10} kontak {result['seconds']:>9.3f} dtk {result['contacts_per_sec']:>12,.0f}/dtk "
+           f"RSS puncak {result['peak_rss_mb']:>8.1f} MiB  blok {result['alloc_blocks_delta']:>+9}")
+    if 'traced_peak_mb' in result: row += f"  tracemalloc {result['traced_peak_mb']:.1f} MiB"
+    return row
+
+def compare(report, baseline, speed_tolerance, rss_tolerance) -> list:
+    """Mengembalikan daftar regresi terhadap baseline untuk ukuran korpus yang sama."""
+    regressions = []
+    reference = baseline.get(report['meta']['size'], {})
+    for name, result in report['stages'].items():
+        base = reference.get(name)
+        if not base or 'error' in result: continue
+        comparable = result['seconds'] >= MIN_COMPARE_SECONDS
+        if comparable and result['contacts_per_sec'] < base['contacts_per_sec'] * (1 - speed_tolerance):
+            regressions.append(f"{name}: {result['contacts_per_sec']:,.0f}/dtk < baseline {base['contacts_per_sec']:,.0f}/dtk")
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + rss_tolerance):
+            regressions.append(f"{name}: RSS {result['peak_rss_mb']:.1f} MiB > baseline {base['peak_rss_mb']:.1f} MiB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=SIZES, default='10k')
+    parser.add_argument('--stage', choices=STAGES, nargs='+', default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3, help="ambil waktu terbaik dari N lintasan")
+    parser.add_argument('--trace-alloc', action='store_true')
+    parser.add_argument('--corpus-dir', default=os.path.join(BENCH_DIR, '.corpus'))
+    parser.add_argument('--output', help="tulis hasil JSON ke file ini ('-' untuk stdout)")
+    parser.add_argument('--compare', action='store_true', help="bandingkan dengan baseline; exit 1 jika regresi")
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--speed-tolerance', type=float, default=0.15)
+    parser.add_argument('--rss-tolerance', type=float, default=0.20)
+    args = parser.parse_args()
+
+    report = run_suite(args.size, args.stage, args.corpus_dir, args.repeat, args.trace_alloc)
+    if args.output == '-': json.dump(report, sys.stdout, indent=2); print()
+    elif args.output:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f: baseline = json.load(f)
+    if args.update_baseline:
+        baseline[args.size] = {name: {'contacts_per_sec': result['contacts_per_sec'], 'peak_rss_mb': result['peak_rss_mb']}
+                               for name, result in report['stages'].items() if 'error' not in result}
+        with open(BASELINE_PATH, 'w') as f: json.dump(baseline, f, indent=2, sort_keys=True); f.write('\n')
+        print(f"Baseline {args.size} diperbarui: {BASELINE_PATH}", file=sys.stderr)
+    if args.compare:
+        regressions = compare(report, baseline, args.speed_tolerance, args.rss_tolerance)
+        for line in regressions: print(f"REGRESI {line}", file=sys.stderr)
+        if regressions: sys.exit(1)
+        print("Tidak ada regresi terhadap baseline.", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
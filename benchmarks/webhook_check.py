@@ -0,0 +1,115 @@
+# benchmarks/webhook_check.py
+"""Pemeriksaan WebhookServer lewat HTTP sungguhan: POST update JSON ke localhost dan cocokkan status balasan.
+
+Bot dijalankan dengan Bot API tiruan (FakeBotAPI) dan satu handler yang menahan update sampai dilepas,
+sehingga backpressure bisa diamati. Yang diperiksa:
+  - rute & metode: 404 untuk path lain, 405 untuk GET, /healthz 200;
+  - secret token: hilang atau salah -> 403;
+  - badan rusak: JSON tidak valid, JSON bukan objek, dan objek dengan field bertipe salah -> 400
+    (server tetap hidup dan koneksi berikutnya dilayani);
+  - badan di atas batas -> 413;
+  - backpressure: update ke-(max_pending + 1) dibalas 503 + Retry-After, lalu 200 lagi setelah antrean kosong.
+Exit 1 jika ada pemeriksaan yang gagal.
+
+Jalankan dari root repo:  python benchmarks/webhook_check.py
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault('TELEGRAM_TOKEN', '1:fake')
+
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from fake_bot_api import FakeBotAPI
+from webhook_server import WebhookServer
+
+SECRET = 'webhook-check'
+
+MALFORMED = {
+    'json rusak': b'{bad',
+    'null': b'null',
+    'array': b'[]',
+    'string': b'"x"',
+    'message bukan objek': b'{"update_id": 1, "message": 5}',
+    'message tanpa field wajib': b'{"update_id": 1, "message": {}}',
+    'update_id bukan angka': b'{"update_id": "x", "message": {"message_id": 1}}',
+}
+
+def make_update(update_id) -> bytes:
+    return json.dumps({'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': 0, 'text': 'halo',
+        'chat': {'id': 7, 'type': 'private'}, 'from': {'id': 7, 'is_bot': False, 'first_name': 'Uji'}}}).encode()
+
+async def run_checks(max_pending) -> list:
+    api = FakeBotAPI().start()
+    application = Application.builder().token('1:fake').base_url(api.base_url).build()
+    release, handled = asyncio.Event(), []
+    async def hold(update, context):
+        await release.wait()
+        handled.append(update.update_id)
+    application.add_handler(TypeHandler(Update, hold))
+
+    failures = []
+    async def expect(name, request, status, header=None):
+        # Server yang memutus koneksi tanpa balasan (exception lolos dari handler) juga dihitung gagal.
+        try: response = await request
+        except httpx.HTTPError as e: ok, got = False, type(e).__name__
+        else: ok, got = response.status_code == status and (header is None or header in response.headers), response.status_code
+        print(f"{'OK   ' if ok else 'GAGAL'} {name}: {got} (harus {status})")
+        if not ok: failures.append(name)
+
+    server = WebhookServer(application, listen='127.0.0.1', port=0, path='/wh', secret_token=SECRET,
+                           max_pending=max_pending, max_body_bytes=4096)
+    try:
+        async with application:
+            await application.start()
+            try:
+                await server.start()
+                host, port = server.address
+                base, headers = f"http://{host}:{port}", {'X-Telegram-Bot-Api-Secret-Token': SECRET}
+                async with httpx.AsyncClient(base_url=base, timeout=10) as http:
+                    await expect('healthz', http.get('/healthz'), 200)
+                    await expect('path lain', http.post('/lain', content=make_update(1), headers=headers), 404)
+                    await expect('GET', http.get('/wh', headers=headers), 405)
+                    await expect('tanpa secret', http.post('/wh', content=make_update(1)), 403)
+                    await expect('secret salah', http.post('/wh', content=make_update(1), headers={'X-Telegram-Bot-Api-Secret-Token': 'x'}), 403)
+                    for name, body in MALFORMED.items(): await expect(name, http.post('/wh', content=body, headers=headers), 400)
+                    await expect('badan terlalu besar', http.post('/wh', content=b' ' * 5000, headers=headers), 413)
+                    await expect('healthz setelah badan rusak', http.get('/healthz'), 200)
+
+                    for update_id in range(1, max_pending + 1):
+                        await expect(f'update {update_id} diterima', http.post('/wh', content=make_update(update_id), headers=headers), 200)
+                    await expect('backpressure', http.post('/wh', content=make_update(max_pending + 1), headers=headers), 503, 'retry-after')
+                    release.set()
+                    for _ in range(100):
+                        if not server.pending: break
+                        await asyncio.sleep(0.05)
+                    await expect('diterima lagi setelah antrean kosong', http.post('/wh', content=make_update(max_pending + 2), headers=headers), 200)
+                    if not await server.drain(timeout=10): failures.append('drain')
+                if sorted(handled) != list(range(1, max_pending + 1)) + [max_pending + 2]:
+                    print(f"GAGAL update yang diproses: {sorted(handled)}")
+                    failures.append('update diproses')
+            finally: await application.stop()
+    finally: api.stop()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-pending', type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    failures = asyncio.run(run_checks(args.max_pending))
+    print(f"{len(failures)} pemeriksaan gagal" if failures else "Semua pemeriksaan lolos")
+    if failures: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
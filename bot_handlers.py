@@ -1,13 +1,18 @@
 # bot_handlers.py
 
 import os
+import jobs
+import metrics
+import workspace
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from utils import get_greeting, cleanup
-from core_functions import (
-    parse_txt_file, parse_vcf_file, merge_contacts, 
-    write_vcf_file, write_csv_file
-)
+from utils import get_greeting, cleanup, flow_workspace
+from config import MERGE_MAX_FILES, WORKSPACE_OUTPUT_BYTES_PER_CONTACT
+import formats
+from external_merge import ContactStream
+from jobs import JobCancelled
+from workspace import WorkspaceQuotaError
+from workers import run_blocking
 
 # Definisi State
 (
@@ -24,7 +29,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     greeting = get_greeting()
     keyboard = [
         [InlineKeyboardButton("🔄 Konversi File Tunggal", callback_data='start_convert')],
-        [InlineKeyboardButton("➕ Gabungkan Dua File", callback_data='start_merge')],
+        [InlineKeyboardButton("➕ Gabungkan Beberapa File", callback_data='start_merge')],
         [InlineKeyboardButton("📖 Panduan & Info", callback_data='show_guide')],
         [InlineKeyboardButton("🔒 Kebijakan Privasi", callback_data='show_privacy')],
     ]
@@ -43,8 +48,8 @@ async def show_guide(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "1️⃣ **Konversi File Tunggal**\n"
             "   - Ubah `TXT/CSV` ke `VCF` atau sebaliknya.\n"
             "   - Opsi ekspor ke format CSV standar atau Google.\n\n"
-            "2️⃣ **Gabungkan Dua File**\n"
-            "   - Unggah dua file (TXT/VCF), bot akan menggabungkannya.\n"
+            "2️⃣ **Gabungkan Beberapa File**\n"
+            "   - Unggah dua file atau lebih (TXT/VCF), bot akan menggabungkannya.\n"
             "   - Opsi untuk menghapus kontak duplikat secara otomatis.\n\n"
             "Format kolom yang didukung: `Name, Phone, Email, Address, Organization, Job Title, Birthday, Notes`")
     keyboard = [[InlineKeyboardButton("⬅️ Kembali", callback_data='back_to_main')]]
@@ -82,101 +87,164 @@ async def get_first_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menerima file pertama dan memprosesnya."""
     chat_id = update.effective_chat.id
     context.user_data['chat_id'] = chat_id
-    user_dir = str(chat_id); os.makedirs(user_dir, exist_ok=True)
     
+    if context.user_data.get('mode') == 'merge':
+        return await receive_merge_file(update, context)
+
     doc = update.message.document
-    file_path = os.path.join(user_dir, "file1" + os.path.splitext(doc.file_name)[1])
-    file = await doc.get_file(); await file.download_to_drive(file_path)
-    
+    if not formats.is_supported(doc.file_name):
+        await update.message.reply_text(f"Format file tidak didukung. Harap kirim {', '.join(formats.readable_extensions())}.")
+        return AWAIT_FIRST_FILE
     try:
-        if file_path.endswith(('.txt', '.csv')):
-            contacts = parse_txt_file(file_path)
-            context.user_data['file1_type'] = 'txt'
-        elif file_path.endswith('.vcf'):
-            contacts = parse_vcf_file(file_path)
-            context.user_data['file1_type'] = 'vcf'
-        else:
-            await update.message.reply_text("Format file tidak didukung. Harap kirim .txt, .csv, atau .vcf.")
-            return AWAIT_FIRST_FILE
-        
-        context.user_data['contacts1'] = contacts
-        await update.message.reply_text(f"✅ File pertama diterima dan berisi {len(contacts)} kontak.")
-        
-        if context.user_data.get('mode') == 'merge':
-            await update.message.reply_text("Sekarang, silakan kirim **file kedua**.")
-            return AWAIT_SECOND_FILE
-        else: # Mode Konversi
-            return await show_export_options(update, context, file_path)
+        reservation = workspace.get_manager().reserve(doc.file_size)
+    except WorkspaceQuotaError as e:
+        await update.message.reply_text(str(e))
+        return AWAIT_FIRST_FILE
+    # Workspace unik per alur: alur lain dari chat yang sama (atau job yang masih berjalan) tidak tertimpa.
+    file_path = os.path.join(flow_workspace(context), "file1" + formats.upload_suffix(doc.file_name))
+    with reservation:
+        file = await doc.get_file(); await file.download_to_drive(file_path)
+    user_id, size_bytes = update.effective_user.id, os.path.getsize(file_path)
+    source_format = formats.detect_format(file_path)
+
+    try:
+        # Hanya dihitung di sini; konversi nanti membaca ulang file secara streaming tanpa daftar perantara.
+        count, preview = await run_blocking(formats.summarize_file, file_path, source_format, user_id=user_id, size_bytes=size_bytes)
+        metrics.inc('xrx_contacts_total', count, op='parse')
+        context.user_data.update(source_path=file_path, source_format=source_format, final_count=count, preview_contact=preview)
+        await update.message.reply_text(f"✅ File pertama diterima dan berisi {count} kontak.")
+        return await show_export_options(update, context, file_path)
 
     except Exception as e:
         await update.message.reply_text(f"Gagal memproses file. Pastikan formatnya benar. Error: {e}")
+        cleanup(context)
         return ConversationHandler.END
 
-async def get_second_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Menerima file kedua (hanya untuk mode merge)."""
-    user_dir = str(context.user_data['chat_id'])
+async def receive_merge_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Menerima satu file untuk mode merge (file ke-1 sampai ke-N).
+
+    File hanya dihitung isinya lalu disimpan di disk; parsing penuh dilakukan secara streaming
+    saat penggabungan sehingga memori tidak bergantung pada jumlah atau ukuran file.
+    """
+    merge_files = context.user_data.setdefault('merge_files', [])
+    state = AWAIT_FIRST_FILE if not merge_files else AWAIT_SECOND_FILE
+    if len(merge_files) >= MERGE_MAX_FILES:
+        await update.message.reply_text(f"Maksimal {MERGE_MAX_FILES} file. Tekan Selesai untuk menggabungkan.")
+        return state
+
     doc = update.message.document
-    file_path = os.path.join(user_dir, "file2" + os.path.splitext(doc.file_name)[1])
-    file = await doc.get_file(); await file.download_to_drive(file_path)
+    extension = formats.upload_suffix(doc.file_name)
+    if not formats.is_supported(doc.file_name):
+        await update.message.reply_text(f"Format file tidak didukung. Harap kirim {', '.join(formats.readable_extensions())}.")
+        return state
+    try:
+        reservation = workspace.get_manager().reserve(doc.file_size)
+    except WorkspaceQuotaError as e:
+        await update.message.reply_text(str(e))
+        return state
+    file_path = os.path.join(flow_workspace(context), f"file{len(merge_files) + 1}{extension}")
+    with reservation:
+        file = await doc.get_file(); await file.download_to_drive(file_path)
 
     try:
-        if file_path.endswith(('.txt', '.csv')):
-            contacts = parse_txt_file(file_path)
-        elif file_path.endswith('.vcf'):
-            contacts = parse_vcf_file(file_path)
-        else:
-            await update.message.reply_text("Format file kedua tidak didukung.")
-            return AWAIT_SECOND_FILE
-            
-        context.user_data['contacts2'] = contacts
-        await update.message.reply_text(f"✅ File kedua diterima dan berisi {len(contacts)} kontak.")
-        
-        keyboard = [
-            [InlineKeyboardButton("Ya, Hapus Duplikat", callback_data='dedup_yes')],
-            [InlineKeyboardButton("Tidak, Gabungkan Semua", callback_data='dedup_no')],
-        ]
-        await update.message.reply_text("Apakah Anda ingin menghapus kontak duplikat (berdasarkan nomor telepon) saat menggabungkan?",
+        count = await run_blocking(formats.count_contacts, file_path, user_id=update.effective_user.id, size_bytes=os.path.getsize(file_path))
+    except Exception as e:
+        await update.message.reply_text(f"Gagal memproses file ke-{len(merge_files) + 1}. Error: {e}")
+        return state
+
+    metrics.inc('xrx_contacts_total', count, op='parse')
+    merge_files.append(file_path)
+    context.user_data['merge_input_count'] = context.user_data.get('merge_input_count', 0) + count
+    await update.message.reply_text(f"✅ File ke-{len(merge_files)} diterima dan berisi {count} kontak.")
+    if len(merge_files) == 1:
+        await update.message.reply_text("Sekarang, silakan kirim **file kedua**.", parse_mode='Markdown')
+    else:
+        keyboard = [[InlineKeyboardButton(f"✅ Selesai, Gabungkan {len(merge_files)} File", callback_data='merge_done')]]
+        await update.message.reply_text("Kirim file berikutnya, atau tekan tombol di bawah untuk mulai menggabungkan.",
                                       reply_markup=InlineKeyboardMarkup(keyboard))
-        return AWAIT_MERGE_OPTIONS
+    return AWAIT_SECOND_FILE
 
-    except Exception as e:
-        await update.message.reply_text(f"Gagal memproses file kedua. Error: {e}")
-        return ConversationHandler.END
+async def get_second_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Menerima file kedua dan seterusnya (hanya untuk mode merge)."""
+    return await receive_merge_file(update, context)
+
+async def finish_merge_files(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Dipanggil dari tombol 'merge_done' di state AWAIT_SECOND_FILE: menanyakan opsi deduplikasi."""
+    query = update.callback_query
+    await query.answer()
+    keyboard = [
+        [InlineKeyboardButton("Ya, Hapus Duplikat", callback_data='dedup_yes')],
+        [InlineKeyboardButton("Ya, Termasuk yang Mirip (Fuzzy)", callback_data='dedup_fuzzy')],
+        [InlineKeyboardButton("Tidak, Gabungkan Semua", callback_data='dedup_no')],
+    ]
+    await query.edit_message_text("Apakah Anda ingin menghapus kontak duplikat (berdasarkan nomor telepon) saat menggabungkan?\n"
+                                  "Mode fuzzy juga menggabungkan kontak dengan nama mirip dan nomor beda satu digit.",
+                                  reply_markup=InlineKeyboardMarkup(keyboard))
+    return AWAIT_MERGE_OPTIONS
 
 async def handle_merge_options(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Menangani opsi deduplikasi dan memulai proses merge."""
+    """Menangani opsi deduplikasi, menjalankan merge sebagai job, lalu menunggu hasilnya.
+
+    Didaftarkan dengan block=False: percakapan berstatus tertunda selama job berjalan (tombol Batalkan
+    tetap diproses), lalu lanjut ke pilihan ekspor jika berhasil atau berakhir jika gagal/dibatalkan.
+    """
     query = update.callback_query
     await query.answer()
     
-    deduplicate = (query.data == 'dedup_yes')
-    
-    contacts1 = context.user_data.get('contacts1', [])
-    contacts2 = context.user_data.get('contacts2', [])
-    
-    final_contacts = merge_contacts([contacts1, contacts2], deduplicate=deduplicate)
-    context.user_data['final_contacts'] = final_contacts
-    
-    total_awal = len(contacts1) + len(contacts2)
-    total_akhir = len(final_contacts)
-    
-    await query.edit_message_text(f"Proses penggabungan selesai.\nTotal Kontak Awal: {total_awal}\nTotal Kontak Akhir: {total_akhir}")
+    deduplicate = query.data in ('dedup_yes', 'dedup_fuzzy')
+    fuzzy = (query.data == 'dedup_fuzzy')
+    user_dir = context.user_data['workspace']
+    merge_files = context.user_data.get('merge_files', [])
+    output_path = os.path.join(user_dir, "merged.bin")
     
+    user_id = update.effective_user.id
+    # Ukuran yang sama untuk submit() dan run_blocking: JobControl lintas proses hanya jika pool-nya process pool.
+    size_bytes, item_count = sum(os.path.getsize(path) for path in merge_files), context.user_data.get('merge_input_count', 0)
+
+    async def process(job):
+        try:
+            # Partisi sementara + merged.bin belum ada di disk saat kuota diperiksa: pesan ruangnya dulu.
+            with workspace.get_manager().reserve(size_bytes + item_count * WORKSPACE_OUTPUT_BYTES_PER_CONTACT):
+                stats = await run_blocking(
+                    formats.merge_files, merge_files, output_path, deduplicate=deduplicate, work_dir=user_dir, fuzzy=fuzzy,
+                    control=job.control, total_hint=item_count, user_id=user_id, size_bytes=size_bytes, item_count=item_count
+                )
+        except JobCancelled:
+            raise
+        except Exception as e:
+            await query.message.reply_text(f"Gagal menggabungkan file. Error: {e}")
+            raise
+        metrics.inc('xrx_contacts_total', stats['input'], op='merge')
+        context.user_data['final_contacts_path'] = output_path
+        context.user_data['final_count'] = stats['output']
+        context.user_data['preview_contact'] = stats['preview']
+        return stats
+
+    # Pesan tombol opsi dipakai ulang sebagai pesan status.
+    job = await jobs.get_manager().submit('merge', context.user_data['chat_id'], user_id, process, query.message, label="Menggabungkan file",
+                                          size_bytes=size_bytes, item_count=item_count)
+    await job.finished.wait()
+    if job.status != 'done':
+        cleanup(context, user_dir)
+        return ConversationHandler.END
+    # Pilihan ekspor dikirim di sini (bukan dari job) agar tombolnya baru muncul setelah state percakapan siap menerimanya.
+    stats = job.result
+    await query.message.reply_text(f"Proses penggabungan {len(merge_files)} file selesai.\nTotal Kontak Awal: {stats['input']}\nTotal Kontak Akhir: {stats['output']}\nDuplikat Digabung: {stats.get('collapsed', 0) + stats.get('fuzzy_collapsed', 0)}")
     return await show_export_options(update, context)
 
 async def show_export_options(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path=None):
     """Menampilkan pilihan format ekspor (VCF atau CSV)."""
-    # Jika dari alur konversi file tunggal, final_contacts belum ada
-    if 'final_contacts' not in context.user_data:
-        context.user_data['final_contacts'] = context.user_data['contacts1']
+    # Pratinjau dicatat saat file dihitung (konversi) atau saat penggabungan (merge).
+    preview_contact = context.user_data.get('preview_contact') or {}
 
     # Beri pratinjau
-    preview_contact = context.user_data['final_contacts'][0] if context.user_data['final_contacts'] else {}
     preview_text = (f"Nama: {preview_contact.get('Name', 'N/A')}\n"
                     f"Telepon: {preview_contact.get('Phone', 'N/A')}")
     
     keyboard = [
         [InlineKeyboardButton("Export ke VCF (vCard)", callback_data='export_vcf')],
         [InlineKeyboardButton("Export ke CSV (Excel)", callback_data='export_csv')],
+        [InlineKeyboardButton("Export ke JSON Lines", callback_data='export_jsonl')],
     ]
     await (update.callback_query or update).message.reply_text(
         f"**Pratinjau Kontak Pertama:**\n`{preview_text}`\n\nPilih format output yang Anda inginkan:",
@@ -190,22 +258,27 @@ async def handle_export_choice(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
     
-    if query.data == 'export_vcf':
-        context.user_data['export_format'] = 'vcf'
-        await query.edit_message_text("Masukkan nama untuk file `.vcf` Anda (tanpa ekstensi).")
+    if query.data in ('export_vcf', 'export_jsonl'):
+        fmt = formats.get_format(query.data.removeprefix('export_'))
+        context.user_data['export_format'] = fmt.name
+        await query.edit_message_text(f"Masukkan nama untuk file `.{fmt.extension}` Anda (tanpa ekstensi).")
         return AWAIT_FILENAME
     elif query.data == 'export_csv':
         keyboard = [
             [InlineKeyboardButton("Format Standar", callback_data='csv_standard')],
             [InlineKeyboardButton("Format Google CSV", callback_data='csv_google')],
+            [InlineKeyboardButton("Format Outlook CSV", callback_data='csv_outlook')],
         ]
         await query.edit_message_text("Pilih jenis format CSV:", reply_markup=InlineKeyboardMarkup(keyboard))
         return AWAIT_VCF_EXPORT_OPTIONS # Tetap di state ini untuk menerima pilihan CSV
 
+# Tombol jenis CSV -> nama format di registry formats.
+CSV_EXPORT_CHOICES = {'csv_standard': 'csv', 'csv_google': 'google_csv', 'csv_outlook': 'outlook_csv'}
+
 async def handle_csv_format_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    context.user_data['export_format'] = query.data # 'csv_standard' or 'csv_google'
+    context.user_data['export_format'] = CSV_EXPORT_CHOICES[query.data]
     await query.edit_message_text("Masukkan nama untuk file `.csv` Anda (tanpa ekstensi).")
     return AWAIT_FILENAME
 
@@ -213,35 +286,52 @@ async def get_filename_and_process(update: Update, context: ContextTypes.DEFAULT
     """Menerima nama file akhir dan menjalankan proses penulisan file."""
     filename = update.message.text.strip()
     chat_id = context.user_data['chat_id']
-    user_dir = str(chat_id)
-    contacts = context.user_data['final_contacts']
+    user_dir = context.user_data['workspace']
+    total = context.user_data['final_count']
     export_format = context.user_data['export_format']
     
-    await update.message.reply_text("⏳ Sedang membuat file hasil...")
-    
-    try:
-        if export_format == 'vcf':
-            output_path = os.path.join(user_dir, f"{filename}.vcf")
-            count = write_vcf_file(contacts, output_path)
-        else: # CSV
-            csv_type = 'google' if export_format == 'csv_google' else 'standard'
-            output_path = os.path.join(user_dir, f"{filename}.csv")
-            count = write_csv_file(contacts, output_path, format_type=csv_type)
-        
-        await context.bot.send_document(
-            chat_id=chat_id,
-            document=open(output_path, 'rb'),
-            caption=f"✅ Berhasil! File Anda dengan {count} kontak telah dibuat."
-        )
-    except Exception as e:
-        await update.message.reply_text(f"Gagal membuat file. Error: {e}")
-    finally:
-        cleanup(context)
-        
+    user_id = update.effective_user.id
+    status = await update.message.reply_text("⏳ Sedang membuat file hasil...")
+
+    async def process(job):
+        try:
+            render_kwargs = dict(spool_dir=user_dir, control=job.control, total=total, user_id=user_id, item_count=total)
+            with workspace.get_manager().reserve(total * WORKSPACE_OUTPUT_BYTES_PER_CONTACT):
+                if 'final_contacts_path' in context.user_data:
+                    contacts = ContactStream(context.user_data['final_contacts_path'], total)
+                    parts, count = await run_blocking(formats.render, contacts, export_format, filename, **render_kwargs)
+                else:
+                    # Konversi file tunggal: pembaca -> penulis dalam satu lintasan streaming.
+                    parts, count = await run_blocking(formats.convert, context.user_data['source_path'], export_format, filename,
+                                                      source_format=context.user_data['source_format'], **render_kwargs)
+
+            metrics.inc('xrx_contacts_total', count, op='write', format=export_format)
+            job.control.check()
+            if not parts:
+                await context.bot.send_message(chat_id, "Gagal, tidak ada kontak valid.")
+                return
+            part = parts[0]
+            with part.open() as doc_file:
+                await context.bot.send_document(
+                    chat_id=chat_id,
+                    document=doc_file,
+                    filename=part.filename,
+                    caption=f"✅ Berhasil! File Anda dengan {count} kontak telah dibuat."
+                )
+        except JobCancelled:
+            raise
+        except Exception as e:
+            await context.bot.send_message(chat_id, f"Gagal membuat file. Error: {e}")
+        finally:
+            cleanup(context, user_dir)
+
+    await jobs.get_manager().submit('export', chat_id, user_id, process, status, label="Membuat file hasil", item_count=total,
+                                    on_cancel=lambda job: cleanup(context, user_dir))
     return ConversationHandler.END
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Membatalkan semua operasi."""
+    """Membatalkan semua operasi, termasuk pekerjaan latar belakang milik chat ini."""
+    jobs.get_manager().cancel(chat_id=update.effective_chat.id)
     await (update.callback_query or update).message.reply_text("Operasi dibatalkan.")
     cleanup(context)
     await start(update, context)
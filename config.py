@@ -7,9 +7,136 @@ load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 EXCHANGERATE_API_KEY = os.getenv("EXCHANGERATE_API_KEY")
+# Dapat diarahkan ke server tiruan lokal saat pengujian.
+EXCHANGERATE_API_URL = os.getenv("EXCHANGERATE_API_URL", "https://v6.exchangerate-api.com/v6")
+EXCHANGERATE_TIMEOUT = float(os.getenv("EXCHANGERATE_TIMEOUT", 5.0))
+EXCHANGERATE_MAX_CONNECTIONS = int(os.getenv("EXCHANGERATE_MAX_CONNECTIONS", 10))
+# Tabel kurs diambil sekali per mata uang dasar lalu disimpan selama TTL (detik).
+EXCHANGERATE_BASE_CURRENCY = os.getenv("EXCHANGERATE_BASE_CURRENCY", "USD")
+EXCHANGERATE_CACHE_TTL = int(os.getenv("EXCHANGERATE_CACHE_TTL", 3600))
+# Tabel yang lebih tua dari ini (detik) tidak lagi dipakai; /kurs gagal dengan jelas sampai pembaruan berhasil.
+EXCHANGERATE_MAX_STALE = int(os.getenv("EXCHANGERATE_MAX_STALE", 24 * 3600))
+# Setelah pembaruan gagal, tunggu selama ini (detik) sebelum mencoba lagi.
+EXCHANGERATE_REFRESH_BACKOFF = int(os.getenv("EXCHANGERATE_REFRESH_BACKOFF", 300))
+# Kosongkan untuk menonaktifkan snapshot di disk.
+EXCHANGERATE_SNAPSHOT_FILE = os.getenv("EXCHANGERATE_SNAPSHOT_FILE", "xrx_rates.json")
 
 if not TELEGRAM_TOKEN:
     raise ValueError("TELEGRAM_TOKEN tidak ditemukan! Pastikan file .env sudah benar.")
 
 DATABASE_FILE = "xrx_bot.db"
-PERSISTENCE_FILE = "xrx_bot_persistence"
\ No newline at end of file
+PERSISTENCE_FILE = "xrx_bot_persistence.db"
+# List di user/chat/bot data dengan item sebanyak ini atau lebih disimpan sebagai blob terpisah.
+PERSISTENCE_BLOB_MIN_ITEMS = int(os.getenv("PERSISTENCE_BLOB_MIN_ITEMS", 1000))
+
+# --- Eksekusi Pekerjaan Berat (parsing & pembuatan file) ---
+# Input di atas batas ini dijalankan di process pool, sisanya di thread pool.
+WORKER_PROCESS_MIN_BYTES = int(os.getenv("WORKER_PROCESS_MIN_BYTES", 8 * 1024 * 1024))
+WORKER_PROCESS_MIN_ITEMS = int(os.getenv("WORKER_PROCESS_MIN_ITEMS", 200_000))
+WORKER_MAX_PROCESSES = int(os.getenv("WORKER_MAX_PROCESSES", os.cpu_count() or 2))
+WORKER_MAX_THREADS = int(os.getenv("WORKER_MAX_THREADS", 4))
+# Jumlah maksimum pekerjaan berat yang berjalan bersamaan untuk satu pengguna.
+WORKER_MAX_JOBS_PER_USER = int(os.getenv("WORKER_MAX_JOBS_PER_USER", 1))
+
+# Jumlah pengguna yang pengaturannya disimpan di memori (cache LRU).
+SETTINGS_CACHE_SIZE = int(os.getenv("SETTINGS_CACHE_SIZE", 10_000))
+
+# --- Kalkulator (/calc dan balasan grup) ---
+CALC_MAX_LENGTH = int(os.getenv("CALC_MAX_LENGTH", 200))
+CALC_MAX_MAGNITUDE = float(os.getenv("CALC_MAX_MAGNITUDE", 1e100))
+CALC_MAX_EXPONENT = int(os.getenv("CALC_MAX_EXPONENT", 1000))
+CALC_TIMEOUT = float(os.getenv("CALC_TIMEOUT", 0.5))
+CALC_CACHE_SIZE = int(os.getenv("CALC_CACHE_SIZE", 1024))
+
+# --- File Hasil Ekspor ---
+# File hasil dibuat di memori dan baru di-spool ke disk jika melebihi batas ini.
+OUTPUT_SPOOL_THRESHOLD_BYTES = int(os.getenv("OUTPUT_SPOOL_THRESHOLD_BYTES", 20 * 1024 * 1024))
+# Hasil split dengan jumlah file sebanyak ini atau lebih dikirim sebagai satu ZIP (0 = nonaktif).
+OUTPUT_ZIP_MIN_PARTS = int(os.getenv("OUTPUT_ZIP_MIN_PARTS", 3))
+
+# --- Cache Hasil Parsing (unggahan ulang file yang sama) ---
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", "parse_cache")
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+PARSE_CACHE_TTL = int(os.getenv("PARSE_CACHE_TTL", 24 * 3600))
+
+# --- Penggabungan Banyak File (merge eksternal) ---
+MERGE_PARTITION_FANOUT = int(os.getenv("MERGE_PARTITION_FANOUT", 32))
+# Partisi yang lebih besar dari ini dipecah lagi agar memori tetap terbatas.
+MERGE_PARTITION_MAX_BYTES = int(os.getenv("MERGE_PARTITION_MAX_BYTES", 64 * 1024 * 1024))
+MERGE_MAX_FILES = int(os.getenv("MERGE_MAX_FILES", 20))
+
+# Kode negara default untuk nomor tanpa awalan internasional (Indonesia).
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "62")
+
+# --- Deduplikasi Fuzzy (opsional saat merge) ---
+FUZZY_PHONE_MAX_EDITS = int(os.getenv("FUZZY_PHONE_MAX_EDITS", 1))
+FUZZY_NAME_MIN_SIMILARITY = float(os.getenv("FUZZY_NAME_MIN_SIMILARITY", 0.85))
+# Blok kandidat yang lebih besar dari ini dilewati agar jumlah perbandingan tetap hampir linear.
+FUZZY_MAX_BLOCK_SIZE = int(os.getenv("FUZZY_MAX_BLOCK_SIZE", 64))
+
+# --- Pekerjaan Latar Belakang (konversi & merge) ---
+JOB_MAX_CONCURRENT = int(os.getenv("JOB_MAX_CONCURRENT", 4))
+# Jeda (detik) antar pembaruan persentase di pesan status.
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", 3.0))
+
+# --- Penjadwal Pesan Keluar (batas flood Telegram) ---
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", 30))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", 1))
+OUTBOUND_CHAT_BURST = int(os.getenv("OUTBOUND_CHAT_BURST", 3))
+# Grup dibatasi sekitar 20 pesan per menit.
+OUTBOUND_GROUP_RATE = float(os.getenv("OUTBOUND_GROUP_RATE", 20 / 60))
+OUTBOUND_MAX_CONCURRENCY = int(os.getenv("OUTBOUND_MAX_CONCURRENCY", 16))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", 3))
+
+# --- Unggahan Terkompresi (.gz/.zip) & File Besar ---
+# File TXT biasa berisi nomor saja yang sebesar ini atau lebih dipindai lewat mmap (0 = nonaktif).
+MMAP_SCAN_MIN_BYTES = int(os.getenv("MMAP_SCAN_MIN_BYTES", 16 * 1024 * 1024))
+ARCHIVE_MAX_MEMBERS = int(os.getenv("ARCHIVE_MAX_MEMBERS", 50))
+# Batas total ukuran hasil dekompresi per unggahan (melindungi dari zip bomb).
+ARCHIVE_MAX_UNCOMPRESSED_BYTES = int(os.getenv("ARCHIVE_MAX_UNCOMPRESSED_BYTES", 2 * 1024 * 1024 * 1024))
+
+# --- Workspace Sementara (unggahan & file hasil) ---
+# Kosong = ./workspaces, atau /dev/shm/xrx_workspaces jika WORKSPACE_USE_TMPFS=1.
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", "")
+WORKSPACE_USE_TMPFS = os.getenv("WORKSPACE_USE_TMPFS", "0") == "1"
+WORKSPACE_MAX_BYTES = int(os.getenv("WORKSPACE_MAX_BYTES", 4 * 1024 * 1024 * 1024))
+# Perkiraan ukuran hasil per kontak yang dipesan dari kuota sebelum merge/ekspor ditulis ke workspace.
+WORKSPACE_OUTPUT_BYTES_PER_CONTACT = int(os.getenv("WORKSPACE_OUTPUT_BYTES_PER_CONTACT", 256))
+# Workspace yang tidak disentuh selama ini (detik) dihapus oleh janitor.
+WORKSPACE_TTL = int(os.getenv("WORKSPACE_TTL", 6 * 3600))
+WORKSPACE_JANITOR_INTERVAL = int(os.getenv("WORKSPACE_JANITOR_INTERVAL", 600))
+
+# --- Pemrosesan Update Bersamaan (urutan per pengguna tetap terjaga) ---
+UPDATE_MAX_CONCURRENT = int(os.getenv("UPDATE_MAX_CONCURRENT", 32))
+# Unggahan file memakai paling banyak sekian slot agar tombol & perintah ringan tetap dilayani.
+UPDATE_MAX_CONCURRENT_FILES = int(os.getenv("UPDATE_MAX_CONCURRENT_FILES", 8))
+# Batas update yang sudah diterima tapi belum selesai (menunggu giliran + berjalan).
+UPDATE_MAX_PENDING = int(os.getenv("UPDATE_MAX_PENDING", 4096))
+
+# --- Mode Jalan: "polling" (default) atau "webhook" ---
+RUN_MODE = os.getenv("RUN_MODE", "polling").lower()
+if RUN_MODE not in ("polling", "webhook"):
+    raise ValueError(f"RUN_MODE tidak dikenal: {RUN_MODE} (pilih polling atau webhook).")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8443))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# URL publik yang didaftarkan lewat setWebhook saat start (kosong = tidak mendaftar, mis. banyak instance di belakang load balancer).
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+# Update diterima tapi belum selesai; di atas batas ini permintaan dibalas 503 agar dikirim ulang.
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", 1024))
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BODY_BYTES", 1024 * 1024))
+WEBHOOK_IDLE_TIMEOUT = float(os.getenv("WEBHOOK_IDLE_TIMEOUT", 60))
+# Batas waktu menunggu update & job yang sedang berjalan saat bot dihentikan.
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 120))
+
+# --- Metrik & /stats ---
+# Nonaktif = pencatatan menjadi no-op (gauge tetap dihitung saat /stats dibaca).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Endpoint teks Prometheus lokal (0 = nonaktif).
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", 0.5))
+# User ID Telegram pemilik bot; hanya dia yang bisa memakai /stats (0 = /stats nonaktif).
+OWNER_ID = int(os.getenv("OWNER_ID", 0))
@@ -0,0 +1,60 @@
+# contact.py
+
+# Nama field kontak (sama dengan header CSV standar) dan atribut slot yang menyimpannya.
+CONTACT_KEYS = ('Name', 'Phone', 'Email', 'Address', 'Organization', 'Job Title', 'Birthday', 'Notes')
+CONTACT_ATTRS = ('name', 'phone', 'email', 'address', 'organization', 'job_title', 'birthday', 'notes')
+_KEY_TO_ATTR = dict(zip(CONTACT_KEYS, CONTACT_ATTRS))
+
+class Contact:
+    """Satu kontak dengan `__slots__` (tanpa dict per objek).
+
+    Mendukung akses gaya dict dengan kunci header CSV (`contact['Phone']`, `contact.get('Name')`)
+    agar handler yang sudah ada tetap berfungsi; kode inti sebaiknya memakai atribut langsung.
+    """
+    __slots__ = CONTACT_ATTRS
+
+    def __init__(self, name='', phone='', email='', address='', organization='', job_title='', birthday='', notes=''):
+        self.name, self.phone, self.email, self.address = name, phone, email, address
+        self.organization, self.job_title, self.birthday, self.notes = organization, job_title, birthday, notes
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """Membuat Contact dari dict berkunci header CSV; kunci lain diabaikan."""
+        contact = cls()
+        for key, value in mapping.items():
+            attr = _KEY_TO_ATTR.get(key)
+            if attr is not None: setattr(contact, attr, value or '')
+        return contact
+
+    def __getitem__(self, key):
+        try: return getattr(self, _KEY_TO_ATTR[key])
+        except KeyError: raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try: setattr(self, _KEY_TO_ATTR[key], value)
+        except KeyError: raise KeyError(key) from None
+
+    def __contains__(self, key): return key in _KEY_TO_ATTR
+    def __iter__(self): return iter(CONTACT_KEYS)
+    def __len__(self): return len(CONTACT_KEYS)
+
+    def get(self, key, default=None):
+        attr = _KEY_TO_ATTR.get(key)
+        return getattr(self, attr) if attr is not None else default
+
+    def keys(self): return CONTACT_KEYS
+    def values(self): return tuple(getattr(self, attr) for attr in CONTACT_ATTRS)
+    def items(self): return tuple(zip(CONTACT_KEYS, self.values()))
+    def to_dict(self): return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, Contact): return self.values() == other.values()
+        return NotImplemented
+
+    def __repr__(self):
+        fields = ', '.join(f"{attr}={getattr(self, attr)!r}" for attr in CONTACT_ATTRS if getattr(self, attr))
+        return f"Contact({fields})"
+
+    def __reduce__(self):
+        # Pickle ringkas: hanya tuple nilai, tanpa nama atribut.
+        return (Contact, self.values())
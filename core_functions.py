@@ -2,133 +2,271 @@
 
 import os
 import csv
+import quopri
+import itertools
+
+from contact import Contact, CONTACT_KEYS
+from external_merge import external_merge, write_contact_stream
+from phone_normalizer import PhoneNormalizer
+from fuzzy_dedup import fuzzy_deduplicate
+from core_logic import open_text, track_progress
 
 # --- Definisi Field Kontak ---
 # Ini memungkinkan kita untuk mudah menambahkan field baru di masa depan
 CONTACT_FIELDS = ['FN', 'TEL;TYPE=CELL', 'EMAIL', 'ADR', 'ORG', 'TITLE', 'BDAY', 'NOTE']
-CSV_HEADERS = ['Name', 'Phone', 'Email', 'Address', 'Organization', 'Job Title', 'Birthday', 'Notes']
+CSV_HEADERS = list(CONTACT_KEYS)
+
+# --- Pembaca vCard (2.1 / 3.0 / 4.0) ---
+
+def _unescape(value):
+    """Membuka escape teks vCard 3.0/4.0 seperti \\n, \\, dan \\;."""
+    if '\\' not in value: return value
+    out, chars = [], iter(value)
+    for c in chars:
+        if c == '\\':
+            nxt = next(chars, '')
+            out.append('\n' if nxt in ('n', 'N') else nxt)
+        else: out.append(c)
+    return ''.join(out)
+
+def _split_components(value):
+    """Memecah nilai terstruktur (N, ADR, ORG) pada ';' yang tidak di-escape."""
+    parts, current, chars = [], [], iter(value)
+    for c in chars:
+        if c == '\\': current.append(c + next(chars, ''))
+        elif c == ';': parts.append(_unescape(''.join(current))); current = []
+        else: current.append(c)
+    parts.append(_unescape(''.join(current)))
+    return parts
+
+def _parse_params(raw_params):
+    """'TYPE=CELL,VOICE;PREF;ENCODING=QUOTED-PRINTABLE' -> {'TYPE': {'CELL', 'VOICE', 'PREF'}, 'ENCODING': {...}}"""
+    params = {}
+    for param in raw_params:
+        key, sep, value = param.partition('=')
+        if not sep: key, value = 'TYPE', key  # Gaya 2.1: parameter tanpa nama adalah TYPE.
+        values = params.setdefault(key.strip().upper(), set())
+        values.update(v.strip().strip('"').upper() for v in value.split(','))
+    return params
+
+def _iter_logical_lines(f):
+    """Menggabungkan baris terlipat (diawali spasi/tab) dan soft line break quoted-printable."""
+    pending, pending_qp = None, False
+    for raw in f:
+        line = raw.rstrip('\r\n')
+        if pending is not None:
+            if line[:1] in (' ', '\t') and not pending_qp: pending += line[1:]; continue
+            if pending_qp and pending.endswith('='): pending = pending[:-1] + line.lstrip(' \t'); continue
+            yield pending
+        pending = line
+        pending_qp = 'QUOTED-PRINTABLE' in line.partition(':')[0].upper()
+    if pending: yield pending
+
+def _decode_value(value, params):
+    if 'QUOTED-PRINTABLE' in params.get('ENCODING', ()):
+        charset = next(iter(params.get('CHARSET', ())), 'UTF-8')
+        try: return quopri.decodestring(value.encode('utf-8')).decode(charset, errors='replace')
+        except LookupError: return quopri.decodestring(value.encode('utf-8')).decode('utf-8', errors='replace')
+    return value
+
+def _phone_rank(params):
+    types = params.get('TYPE', set()) | ({'PREF'} if 'PREF' in params else set())
+    return 2 if 'PREF' in types else 1 if 'CELL' in types else 0
+
+def _set_name(contact, value, params, state): contact.name = _unescape(value).strip()
+def _set_structured_name(contact, value, params, state):
+    family, given, additional, prefix, suffix = (_split_components(value) + [''] * 5)[:5]
+    state['n'] = ' '.join(p.strip() for p in (prefix, given, additional, family, suffix) if p.strip())
+def _set_phone(contact, value, params, state):
+    value = _unescape(value).strip()
+    if value.lower().startswith('tel:'): value = value[4:]
+    rank = _phone_rank(params)
+    if value and (not contact.phone or rank > state.get('tel_rank', 0)): contact.phone, state['tel_rank'] = value, rank
+def _set_email(contact, value, params, state):
+    if not contact.email: contact.email = _unescape(value).strip()
+def _set_address(contact, value, params, state): contact.address = ' '.join(p.strip() for p in _split_components(value) if p.strip())
+def _set_organization(contact, value, params, state): contact.organization = ', '.join(p.strip() for p in _split_components(value) if p.strip())
+def _set_title(contact, value, params, state): contact.job_title = _unescape(value).strip()
+def _set_birthday(contact, value, params, state): contact.birthday = value.strip()
+def _set_notes(contact, value, params, state): contact.notes = _unescape(value)
+
+# Nama properti vCard -> penangan; dicari sekali per baris.
+VCF_PROPERTY_HANDLERS = {
+    'FN': _set_name, 'N': _set_structured_name, 'TEL': _set_phone, 'EMAIL': _set_email, 'ADR': _set_address,
+    'ORG': _set_organization, 'TITLE': _set_title, 'BDAY': _set_birthday, 'NOTE': _set_notes,
+}
+
+def iter_vcf_contacts(source):
+    """Membaca VCF (path atau objek file teks) secara streaming dan menghasilkan Contact satu per satu."""
+    with open_text(source) as f:
+        contact, state = None, {}
+        for line in _iter_logical_lines(f):
+            head, sep, value = line.partition(':')
+            if not sep: continue
+            raw_params = head.split(';')
+            # Buang prefiks grup ("item1.TEL").
+            name = raw_params[0].rpartition('.')[2].strip().upper()
+            if name == 'BEGIN' and value.strip().upper() == 'VCARD':
+                contact, state = Contact(), {}
+            elif name == 'END' and value.strip().upper() == 'VCARD':
+                if contact is not None:
+                    if not contact.name and state.get('n'): contact.name = state['n']
+                    if contact.name or contact.phone: yield contact
+                contact = None
+            elif contact is not None:
+                handler = VCF_PROPERTY_HANDLERS.get(name)
+                if handler is not None:
+                    params = _parse_params(raw_params[1:]) if len(raw_params) > 1 else {}
+                    handler(contact, _decode_value(value, params), params, state)
 
 def parse_vcf_file(file_path):
-    """Membaca file VCF dan mengubahnya menjadi daftar dictionary kontak."""
-    contacts = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        current_contact = {}
-        for line in f:
-            line = line.strip()
-            if line.upper() == 'BEGIN:VCARD':
-                current_contact = {key: '' for key in CSV_HEADERS}
-            elif line.upper() == 'END:VCARD':
-                if current_contact.get('Name') or current_contact.get('Phone'):
-                    contacts.append(current_contact)
-            else:
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    field, value = parts
-                    # Mencocokkan field VCF dengan header CSV kita
-                    if field.upper().startswith('FN'): current_contact['Name'] = value
-                    elif field.upper().startswith('TEL'): current_contact['Phone'] = value
-                    elif field.upper().startswith('EMAIL'): current_contact['Email'] = value
-                    elif field.upper().startswith('ADR'): current_contact['Address'] = value.replace(';', ' ').strip()
-                    elif field.upper().startswith('ORG'): current_contact['Organization'] = value
-                    elif field.upper().startswith('TITLE'): current_contact['Job Title'] = value
-                    elif field.upper().startswith('BDAY'): current_contact['Birthday'] = value
-                    elif field.upper().startswith('NOTE'): current_contact['Notes'] = value
-    return contacts
+    """Membaca file VCF dan mengubahnya menjadi daftar Contact."""
+    return list(iter_vcf_contacts(file_path))
 
-def parse_txt_file(file_path, has_header=True):
-    """Membaca file TXT/CSV dan mengubahnya menjadi daftar dictionary kontak."""
-    contacts = []
-    with open(file_path, 'r', encoding='utf-8') as f:
+# Header CSV yang dinormalisasi (huruf kecil, tanpa spasi/tanda baca) -> kunci Contact.
+# Mencakup CSV standar, ekspor Google & Outlook, serta header berbahasa Indonesia.
+CSV_HEADER_ALIASES = {
+    'name': 'Name', 'nama': 'Name', 'fullname': 'Name', 'namalengkap': 'Name', 'displayname': 'Name',
+    'phone': 'Phone', 'telepon': 'Phone', 'nomortelepon': 'Phone', 'nomorhp': 'Phone', 'nohp': 'Phone', 'hp': 'Phone',
+    'mobile': 'Phone', 'mobilephone': 'Phone', 'phone1value': 'Phone', 'primaryphone': 'Phone', 'homephone': 'Phone',
+    'businessphone': 'Phone', 'whatsapp': 'Phone',
+    'email': 'Email', 'emailaddress': 'Email', 'email1value': 'Email',
+    'address': 'Address', 'alamat': 'Address', 'address1formatted': 'Address', 'homestreet': 'Address',
+    'organization': 'Organization', 'company': 'Organization', 'organization1name': 'Organization', 'perusahaan': 'Organization',
+    'jobtitle': 'Job Title', 'organization1title': 'Job Title', 'jabatan': 'Job Title',
+    'birthday': 'Birthday', 'tanggallahir': 'Birthday',
+    'notes': 'Notes', 'note': 'Notes', 'catatan': 'Notes',
+}
+# Kolom potongan nama (Google/Outlook) yang digabung jika tidak ada kolom nama lengkap, berurutan.
+CSV_NAME_PART_HEADERS = ('firstname', 'givenname', 'middlename', 'additionalname', 'lastname', 'familyname')
+
+def _normalize_header(header):
+    return ''.join(c for c in header.lower() if c.isalnum())
+
+def map_csv_header(header):
+    """Mengembalikan ([(indeks, kunci Contact)], [indeks potongan nama]) untuk baris header CSV.
+
+    Jika beberapa kolom memetakan ke kunci yang sama, kolom pertama yang berisi nilai dipakai.
+    """
+    normalized = [_normalize_header(h) for h in header]
+    columns = [(i, CSV_HEADER_ALIASES[h]) for i, h in enumerate(normalized) if h in CSV_HEADER_ALIASES]
+    name_parts = []
+    if not any(key == 'Name' for _, key in columns):
+        name_parts = sorted((i for i, h in enumerate(normalized) if h in CSV_NAME_PART_HEADERS), key=lambda i: CSV_NAME_PART_HEADERS.index(normalized[i]))
+    return columns, name_parts
+
+def iter_csv_contacts(source, has_header=True):
+    """Membaca TXT/CSV (path atau objek file teks) secara streaming dan menghasilkan Contact satu per satu.
+
+    Header dipetakan lewat CSV_HEADER_ALIASES sehingga CSV standar, Google, dan Outlook terbaca sama.
+    """
+    with open_text(source, encoding='utf-8-sig', newline='') as f:
         reader = csv.reader(f)
         if has_header:
             try:
                 header = next(reader)
             except StopIteration:
-                return [] # File kosong
+                return # File kosong
         else:
             # Jika tidak ada header, asumsikan urutannya standar
             header = CSV_HEADERS
         
+        # Indeks kolom -> atribut Contact; kolom yang tidak dikenal diabaikan.
+        columns, name_parts = map_csv_header(header)
         for row in reader:
-            contact = {key: '' for key in CSV_HEADERS}
-            for i, value in enumerate(row):
-                if i < len(header):
-                    contact[header[i]] = value
-            if contact.get('Name') or contact.get('Phone'):
-                contacts.append(contact)
-    return contacts
-
-def deduplicate_contacts(contacts):
-    """Menghapus kontak duplikat berdasarkan nomor telepon."""
+            contact = Contact()
+            for i, key in columns:
+                if i < len(row) and row[i] and not contact[key]:
+                    contact[key] = row[i].strip()
+            if name_parts: contact.name = ' '.join(row[i].strip() for i in name_parts if i < len(row) and row[i].strip())
+            if contact.name or contact.phone:
+                yield contact
+
+def parse_txt_file(file_path, has_header=True):
+    """Membaca file TXT/CSV dan mengubahnya menjadi daftar Contact."""
+    return list(iter_csv_contacts(file_path, has_header))
+
+def deduplicate_contacts(contacts, stats=None):
+    """Menghapus kontak duplikat berdasarkan nomor telepon kanonik (lihat PhoneNormalizer).
+
+    Jika `stats` (dict) diberikan, diisi dengan statistik normalisasi termasuk 'collapsed'.
+    """
+    # Dipakai dua kali (kunci lalu zip), jadi iterator/generator diwujudkan sekali di sini.
+    contacts = contacts if isinstance(contacts, list) else list(contacts)
+    normalizer = PhoneNormalizer()
+    keys = normalizer.keys([contact.phone for contact in contacts])
     unique_contacts = {}
-    for contact in contacts:
-        phone = contact.get('Phone')
-        if phone:
+    for key, contact in zip(keys, contacts):
+        if key:
             # Jika nomor belum ada, tambahkan. Ini akan mengabaikan duplikat berikutnya.
-            if phone not in unique_contacts:
-                unique_contacts[phone] = contact
+            if key not in unique_contacts:
+                unique_contacts[key] = contact
+            else:
+                normalizer.stats['collapsed'] += 1
+    if stats is not None: stats.update(normalizer.stats)
     return list(unique_contacts.values())
 
-def merge_contacts(list_of_contacts, deduplicate=True):
-    """Menggabungkan beberapa daftar kontak menjadi satu."""
+def merge_contacts(list_of_contacts, deduplicate=True, stats=None, fuzzy=False):
+    """Menggabungkan beberapa daftar kontak menjadi satu.
+
+    Dengan `fuzzy`, hasil deduplikasi persis diteruskan ke fuzzy_deduplicate untuk
+    menggabungkan kontak yang hampir sama.
+    """
     merged = []
     for contact_list in list_of_contacts:
         merged.extend(contact_list)
     
     if deduplicate:
-        return deduplicate_contacts(merged)
+        merged = deduplicate_contacts(merged, stats)
+        if fuzzy:
+            fuzzy_stats = {}
+            merged = fuzzy_deduplicate(merged, stats=fuzzy_stats)
+            if stats is not None: stats['fuzzy_collapsed'] = fuzzy_stats['collapsed']
     return merged
 
-def write_vcf_file(contacts, output_path):
-    """Menulis daftar dictionary kontak ke dalam format file VCF."""
-    with open(output_path, 'w', encoding='utf-8') as f:
+def merge_contact_files(sources, output_path, deduplicate=True, work_dir=None, fuzzy=False, control=None, total_hint=None):
+    """Menggabungkan N sumber kontak (iterator, mis. dari formats.iter_contacts) ke file aliran `output_path`
+    lewat merge eksternal berbasis disk.
+
+    Mengembalikan statistik {'input', 'output', 'collapsed', 'preview'} dengan `preview` = kontak pertama hasil gabungan.
+    Mode `fuzzy` memuat hasil deduplikasi persis ke memori untuk tahap fuzzy_deduplicate.
+    Progres dilaporkan ke `control` berdasarkan jumlah kontak masukan yang sudah dibaca (dari `total_hint`).
+    """
+    stats, preview = {}, []
+    def remember_first(contacts):
         for contact in contacts:
-            f.write('BEGIN:VCARD\n')
-            f.write('VERSION:3.0\n')
-            if contact.get('Name'): f.write(f"FN:{contact['Name']}\n")
-            if contact.get('Phone'): f.write(f"TEL;TYPE=CELL:{contact['Phone']}\n")
-            if contact.get('Email'): f.write(f"EMAIL:{contact['Email']}\n")
-            if contact.get('Address'): f.write(f"ADR;TYPE=HOME:;;{contact['Address']}\n")
-            if contact.get('Organization'): f.write(f"ORG:{contact['Organization']}\n")
-            if contact.get('Job Title'): f.write(f"TITLE:{contact['Job Title']}\n")
-            if contact.get('Birthday'): f.write(f"BDAY:{contact['Birthday']}\n")
-            if contact.get('Notes'): f.write(f"NOTE:{contact['Notes']}\n")
-            f.write('END:VCARD\n\n')
-    return len(contacts)
+            if not preview: preview.append(contact)
+            yield contact
+    if control is not None:
+        sources = [track_progress(itertools.chain.from_iterable(sources), control, total_hint)]
+    merged = external_merge(sources, deduplicate, work_dir=work_dir, stats=stats)
+    if deduplicate and fuzzy:
+        fuzzy_stats = {}
+        merged = fuzzy_deduplicate(list(merged), stats=fuzzy_stats)
+        stats['fuzzy_collapsed'] = fuzzy_stats['collapsed']
+        stats['output'] = len(merged)
+    write_contact_stream(remember_first(merged), output_path)
+    stats['preview'] = preview[0] if preview else None
+    return stats
+
+# --- Penulis lama (kompatibilitas) ---
+# Penulisan kini lewat registry formats (formats.render); fungsi di bawah hanya menyimpan hasilnya ke path.
+
+# format_type lama -> nama format di registry.
+CSV_FORMAT_TYPES = {'standard': 'csv', 'google': 'google_csv', 'outlook': 'outlook_csv'}
+
+def _save_rendered(contacts, format_name, output_path):
+    import formats  # formats mengimpor modul ini
+    stem = os.path.splitext(os.path.basename(output_path))[0]
+    parts, count = formats.render(contacts, format_name, stem, spool_dir=os.path.dirname(output_path) or None)
+    if parts: parts[0].save(output_path)
+    else: open(output_path, 'w').close()
+    return count
+
+def write_vcf_file(contacts, output_path):
+    """Menulis Contact (daftar atau iterator) ke dalam format file VCF."""
+    return _save_rendered(contacts, 'vcf', output_path)
 
 def write_csv_file(contacts, output_path, format_type='standard'):
-    """Menulis daftar dictionary kontak ke dalam file CSV dengan format tertentu."""
-    # Format Google CSV memerlukan header spesifik
-    google_headers = [
-        'Name', 'Given Name', 'Additional Name', 'Family Name', 'Yomi Name', 'Given Name Yomi', 
-        'Additional Name Yomi', 'Family Name Yomi', 'Name Prefix', 'Name Suffix', 'Initials', 
-        'Nickname', 'Short Name', 'Maiden Name', 'Birthday', 'Gender', 'Location', 'Billing Information', 
-        'Directory Server', 'Mileage', 'Occupation', 'Hobby', 'Sensitivity', 'Priority', 'Subject', 
-        'Notes', 'Language', 'Photo', 'Group Membership', 'E-mail 1 - Type', 'E-mail 1 - Value', 
-        'Phone 1 - Type', 'Phone 1 - Value', 'Address 1 - Type', 'Address 1 - Formatted'
-    ]
-    
-    headers = google_headers if format_type == 'google' else CSV_HEADERS
-    
-    with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=headers, extrasaction='ignore')
-        writer.writeheader()
-        
-        for contact in contacts:
-            if format_type == 'google':
-                google_contact = {
-                    'Name': contact.get('Name'),
-                    'Birthday': contact.get('Birthday'),
-                    'Notes': contact.get('Notes'),
-                    'E-mail 1 - Type': '* Other',
-                    'E-mail 1 - Value': contact.get('Email'),
-                    'Phone 1 - Type': 'Mobile',
-                    'Phone 1 - Value': contact.get('Phone'),
-                    'Address 1 - Type': 'Home',
-                    'Address 1 - Formatted': contact.get('Address')
-                }
-                writer.writerow(google_contact)
-            else: # Format standar
-                writer.writerow(contact)
-                
-    return len(contacts)
\ No newline at end of file
+    """Menulis Contact (daftar atau iterator) ke dalam file CSV dengan format tertentu ('standard', 'google', 'outlook')."""
+    return _save_rendered(contacts, CSV_FORMAT_TYPES.get(format_type, 'csv'), output_path)
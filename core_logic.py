@@ -1,62 +1,138 @@
 # core_logic.py
+import os
 import re
 import csv
+import mmap
 import logging
+import contextlib
+
+import config
+from contact import Contact
+from phone_normalizer import PhoneNormalizer
 
 logger = logging.getLogger(__name__)
 
+# Nomor telepon tidak boleh melintasi baris, jadi spasi yang diizinkan hanya spasi/tab.
+PHONE_PATTERN = re.compile(r'\+?\d[\d \t-]{7,}')
+# Pola yang sama untuk pemindaian byte (mmap) tanpa decode ke str.
+PHONE_PATTERN_BYTES = re.compile(rb'\+?\d[\d \t-]{7,}')
+PHONE_STRIP_PATTERN = re.compile(r'[\s-]')
+# Karakter yang bisa menjadi bagian dari nomor; dipakai untuk menahan ekor potongan.
+PHONE_CHARS = frozenset('+0123456789 \t-')
+SCAN_CHUNK_SIZE = 1 << 20
+MAX_CARRY_SIZE = 4096
+# Seberapa sering (per jumlah kontak) progres dilaporkan & pembatalan diperiksa.
+PROGRESS_EVERY = 2000
+
+def track_progress(items, control=None, total=None, every=PROGRESS_EVERY):
+    """Meneruskan `items` sambil memanggil `control.update(n, total)` tiap `every` item (lihat jobs.JobControl)."""
+    if control is None:
+        yield from items
+        return
+    count = 0
+    for item in items:
+        count += 1
+        if count % every == 0: control.update(count, total)
+        yield item
+    control.update(count, total)
+
+def open_text(source, encoding='utf-8', errors='replace', newline=None):
+    """Membuka path sebagai file teks; objek file (mis. anggota arsip yang didekompresi) dipakai apa adanya."""
+    if isinstance(source, (str, os.PathLike)): return open(source, 'r', encoding=encoding, errors=errors, newline=newline)
+    return contextlib.nullcontext(source)
+
+def _find_header_index(header_map: dict, *names):
+    for name in names:
+        if header_map.get(name) is not None: return header_map[name]
+    return None
+
+def _split_carry(buf: str) -> int:
+    """Mengembalikan posisi awal ekor `buf` yang mungkin masih tersambung ke potongan berikutnya."""
+    pos = len(buf)
+    while pos > 0 and buf[pos - 1] in PHONE_CHARS: pos -= 1
+    return pos if len(buf) - pos <= MAX_CARRY_SIZE else len(buf)
+
+def iter_raw_numbers(f, chunk_size: int = SCAN_CHUNK_SIZE):
+    """Memindai file teks per baris/potongan dan menghasilkan nomor mentah tanpa membaca seluruh isi file."""
+    carry = ''
+    while True:
+        piece = f.readline(chunk_size)
+        if not piece:
+            if carry: yield from (m.group() for m in PHONE_PATTERN.finditer(carry))
+            return
+        buf = carry + piece
+        cut = len(buf) if piece.endswith('\n') else _split_carry(buf)
+        yield from (m.group() for m in PHONE_PATTERN.finditer(buf, 0, cut))
+        carry = buf[cut:]
+
+def iter_raw_numbers_mmap(file_path: str):
+    """Memindai file besar lewat mmap dengan regex byte; hanya nomor yang cocok yang di-decode ke str."""
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for m in PHONE_PATTERN_BYTES.finditer(mapped): yield m.group().decode('ascii')
+
+def iter_txt_contacts(source, stats: dict = None):
+    """Generator kontak unik dari file TXT (terstruktur atau hanya nomor); memori sebanding jumlah nomor unik.
+
+    `source` berupa path atau objek file teks yang bisa di-seek. Duplikat dikenali dari kunci kanonik
+    PhoneNormalizer; jumlahnya dicatat di stats['collapsed']. Baris pertama untuk satu nomor yang
+    dipertahankan (namanya dipakai), sama seperti deduplicate_contacts dan pembaca format lain; versi
+    lama yang memuat semua baris ke dict memakai nama dari baris terakhir. File biasa yang hanya berisi
+    nomor dan berukuran >= MMAP_SCAN_MIN_BYTES dipindai dengan iter_raw_numbers_mmap.
+    """
+    stats = stats if stats is not None else {}
+    # Diakumulasi agar beberapa anggota arsip bisa berbagi satu dict stats.
+    for key, default in (('invalid_lines', 0), ('was_structured', False), ('collapsed', 0)): stats.setdefault(key, default)
+    seen, phone_key = set(), PhoneNormalizer().key
+    with open_text(source, errors='ignore') as f:
+        first_lines = [next(f, '').strip() for _ in range(5)]
+        was_structured = any(',' in line and any(c.isalpha() for c in line) for line in first_lines)
+        f.seek(0)
+        if was_structured:
+            reader = csv.reader(f)
+            try:
+                header_line = next(reader)
+                header_map = {h.lower().strip().replace(' ', ''): i for i, h in enumerate(header_line)}
+                name_col, phone_col = _find_header_index(header_map, 'nama', 'name'), _find_header_index(header_map, 'telepon', 'phone', 'nomorhp')
+                if name_col is None or phone_col is None: was_structured = False
+            except StopIteration: was_structured = False
+            if was_structured:
+                stats['was_structured'] = True
+                for row in reader:
+                    try:
+                        name, phone = row[name_col].strip(), row[phone_col].strip()
+                        if not (name and phone): stats['invalid_lines'] += 1; continue
+                    except IndexError: stats['invalid_lines'] += 1; continue
+                    phone = PHONE_STRIP_PATTERN.sub('', phone)
+                    key = phone_key(phone)
+                    if not key: continue
+                    if key in seen: stats['collapsed'] += 1
+                    else: seen.add(key); yield Contact(name, phone)
+                return
+            f.seek(0)
+        use_mmap = isinstance(source, (str, os.PathLike)) and config.MMAP_SCAN_MIN_BYTES and os.path.getsize(source) >= config.MMAP_SCAN_MIN_BYTES
+        for num in (iter_raw_numbers_mmap(source) if use_mmap else iter_raw_numbers(f)):
+            phone = PHONE_STRIP_PATTERN.sub('', num)
+            key = phone_key(phone)
+            if not key: continue
+            if key in seen: stats['collapsed'] += 1
+            else: seen.add(key); yield Contact(phone=phone)
+
 def parse_txt_file_smartly(file_path: str) -> dict:
-    contacts, invalid_lines, was_structured = [], 0, False
+    stats = {}
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            first_lines = [next(f, '').strip() for _ in range(5)]
-            if any(',' in line and any(c.isalpha() for c in line) for line in first_lines): was_structured = True
-            f.seek(0)
-            if was_structured:
-                reader = csv.reader(f)
-                try:
-                    header_line = next(reader)
-                    header_map = {h.lower().strip().replace(' ', ''): i for i, h in enumerate(header_line)}
-                    name_col, phone_col = header_map.get('nama') or header_map.get('name'), header_map.get('telepon') or header_map.get('phone') or header_map.get('nomorhp')
-                    if name_col is None or phone_col is None: was_structured = False
-                except StopIteration: was_structured = False
-                if was_structured:
-                    for row in reader:
-                        try:
-                            name, phone = row[name_col].strip(), row[phone_col].strip()
-                            if name and phone: contacts.append({'Name': name, 'Phone': re.sub(r'[\s-]', '', phone)})
-                            else: invalid_lines += 1
-                        except IndexError: invalid_lines += 1
-            if not was_structured:
-                f.seek(0); content = f.read()
-                found_numbers = re.findall(r'\+?\d[\d\s-]{7,}', content)
-                for num in found_numbers: contacts.append({'Name': '', 'Phone': re.sub(r'[\s-]', '', num)})
-        unique_contacts = {contact['Phone']: contact for contact in contacts if contact['Phone']}
-        return {'contacts': list(unique_contacts.values()), 'invalid_lines': invalid_lines, 'was_structured': was_structured and bool(unique_contacts)}
+        contacts = list(iter_txt_contacts(file_path, stats))
+        return {'contacts': contacts, 'invalid_lines': stats['invalid_lines'], 'was_structured': stats['was_structured'] and bool(contacts), 'collapsed': stats['collapsed']}
     except Exception as e:
         logger.error(f"Gagal mem-parsing file {file_path}: {e}")
-        return {'contacts': [], 'invalid_lines': 0, 'was_structured': False}
-
-def write_contact_files(contacts: list, output_dir: str, **kwargs) -> tuple[list, int]:
-    contacts_per_file, custom_filename, export_format, base_name = kwargs.get('contacts_per_file'), kwargs.get('custom_filename', 'kontak'), kwargs.get('export_format', 'vcf'), kwargs.get('base_name', '')
-    output_files, contact_index, file_index, out_file = [], 0, 1, None
-    total_contacts = len(contacts)
-    for contact in contacts:
-        if contacts_per_file and contact_index % contacts_per_file == 0:
-            if out_file: out_file.close()
-            start_num, end_num = (file_index - 1) * contacts_per_file + 1, min(file_index * contacts_per_file, total_contacts)
-            fname = f"{custom_filename}_{start_num}-{end_num}.{export_format}"
-            output_path = os.path.join(output_dir, fname); output_files.append(output_path)
-            out_file = open(output_path, 'w', encoding='utf-8')
-            if export_format == 'csv': out_file.write("Name,Phone\n")
-            file_index += 1
-        elif not out_file:
-            output_path = os.path.join(output_dir, f"{custom_filename}.{export_format}"); output_files.append(output_path)
-            out_file = open(output_path, 'w', encoding='utf-8')
-            if export_format == 'csv': out_file.write("Name,Phone\n")
-        contact_name, phone_number = contact.get('Name') or f"{base_name} {contact_index + 1}", contact.get('Phone', '')
-        if export_format == 'vcf': out_file.write(f'BEGIN:VCARD\nVERSION:3.0\nFN:{contact_name}\nTEL;TYPE=CELL:{phone_number}\nEND:VCARD\n\n')
-        else: out_file.write(f'"{contact_name}","{phone_number}"\n')
-        contact_index += 1
-    if out_file: out_file.close()
-    return output_files, total_contacts
\ No newline at end of file
+        return {'contacts': [], 'invalid_lines': 0, 'was_structured': False, 'collapsed': 0}
+
+def write_contact_files(contacts, output_dir: str, **kwargs) -> tuple[list, int]:
+    """Kompatibilitas: formats.render lalu menyimpan setiap part ke `output_dir`; mengembalikan (daftar path, jumlah).
+
+    Kwargs lama tetap diterima: `export_format` (nama format di registry, bawaan 'vcf'), `custom_filename`,
+    `contacts_per_file`, `base_name`, dan `control`.
+    """
+    import formats  # formats mengimpor modul ini
+    parts, count = formats.render(contacts, kwargs.get('export_format', 'vcf'), kwargs.get('custom_filename', 'kontak'), spool_dir=output_dir,
+                                  contacts_per_file=kwargs.get('contacts_per_file'), base_name=kwargs.get('base_name', ''), control=kwargs.get('control'))
+    return [part.save(os.path.join(output_dir, part.filename)) for part in parts], count
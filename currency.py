@@ -0,0 +1,202 @@
+# currency.py
+
+import os
+import json
+import time
+import asyncio
+import logging
+import httpx
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class ExchangeRateError(Exception):
+    """Layanan nilai tukar menjawab, tetapi dengan status gagal (mis. kode mata uang tidak dikenal)."""
+
+class ExchangeRateClient:
+    """Klien async untuk exchangerate-api dengan koneksi keep-alive bersama dan penggabungan permintaan.
+
+    Permintaan bersamaan untuk pasangan mata uang yang sama hanya menghasilkan satu panggilan ke
+    server; jumlah dikalikan secara lokal dari kurs yang didapat.
+    """
+
+    def __init__(self, api_key, base_url=None, timeout=None, max_connections=None):
+        self.api_key = api_key
+        self.base_url = (base_url or config.EXCHANGERATE_API_URL).rstrip('/')
+        self.timeout = timeout if timeout is not None else config.EXCHANGERATE_TIMEOUT
+        self.max_connections = max_connections or config.EXCHANGERATE_MAX_CONNECTIONS
+        self._client = None
+        self._inflight = {}
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 3.0)),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def _fetch_json(self, path):
+        endpoint = path.split('/')[1]
+        try:
+            with metrics.timer('xrx_currency_upstream_seconds', endpoint=endpoint):
+                response = await self._get_client().get(f"/{self.api_key}{path}")
+            try: data = response.json()
+            except ValueError: response.raise_for_status(); raise
+            if data.get('result') != 'success': raise ExchangeRateError(data.get('error-type', 'unknown'))
+        except Exception:
+            metrics.inc('xrx_currency_upstream_errors_total', endpoint=endpoint)
+            raise
+        return data
+
+    async def _single_flight(self, key, factory):
+        """Menjalankan `factory` sekali untuk setiap `key`; pemanggil bersamaan menunggu hasil yang sama."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: pembatalan satu pemanggil tidak membatalkan permintaan milik pemanggil lain.
+        return await asyncio.shield(task)
+
+    async def get_rate(self, from_currency, to_currency) -> float:
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        data = await self._single_flight(('pair', from_currency, to_currency), lambda: self._fetch_json(f"/pair/{from_currency}/{to_currency}"))
+        return data['conversion_rate']
+
+    async def convert(self, amount, from_currency, to_currency) -> tuple[float, float]:
+        """Mengembalikan (hasil konversi, kurs 1 unit)."""
+        rate = await self.get_rate(from_currency, to_currency)
+        return amount * rate, rate
+
+    async def get_latest(self, base_currency) -> dict:
+        """Mengambil seluruh tabel kurs untuk satu mata uang dasar."""
+        base_currency = base_currency.upper()
+        data = await self._single_flight(('latest', base_currency), lambda: self._fetch_json(f"/latest/{base_currency}"))
+        return data['conversion_rates']
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class RateTableCache:
+    """Cache tabel kurs satu mata uang dasar; semua pasangan dihitung lokal lewat kurs silang.
+
+    Setelah TTL lewat, data lama tetap dipakai sementara tabel baru diambil di latar belakang; setelah
+    `max_stale` data lama tidak dipakai lagi (ExchangeRateError 'rates-outdated' jika pembaruan gagal).
+    Pembaruan yang gagal tidak diulang sebelum `refresh_backoff` detik berlalu.
+    Tabel terakhir disimpan ke `snapshot_path` (jika diisi) agar restart tidak mulai dari kosong.
+    """
+
+    def __init__(self, client, base_currency=None, ttl=None, snapshot_path=None, max_stale=None, refresh_backoff=None):
+        self.client = client
+        self.base_currency = (base_currency or config.EXCHANGERATE_BASE_CURRENCY).upper()
+        self.ttl = ttl if ttl is not None else config.EXCHANGERATE_CACHE_TTL
+        self.max_stale = max_stale if max_stale is not None else config.EXCHANGERATE_MAX_STALE
+        self.refresh_backoff = refresh_backoff if refresh_backoff is not None else config.EXCHANGERATE_REFRESH_BACKOFF
+        self.snapshot_path = snapshot_path
+        self._rates, self._fetched_at = None, 0.0
+        self._failed_at = None
+        self._refresh_task = None
+        self._load_snapshot()
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path): return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f: snapshot = json.load(f)
+            if snapshot.get('base') == self.base_currency:
+                self._rates, self._fetched_at = snapshot['rates'], float(snapshot['fetched_at'])
+        except (OSError, ValueError, KeyError) as e: logger.warning(f"Snapshot kurs {self.snapshot_path} diabaikan: {e}")
+
+    def _save_snapshot(self):
+        if not self.snapshot_path: return
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f: json.dump({'base': self.base_currency, 'fetched_at': self._fetched_at, 'rates': self._rates}, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e: logger.warning(f"Gagal menyimpan snapshot kurs: {e}")
+
+    async def refresh(self):
+        try: rates = await self.client.get_latest(self.base_currency)
+        except Exception:
+            self._failed_at = time.time()
+            raise
+        self._rates, self._fetched_at, self._failed_at = {code: float(value) for code, value in rates.items()}, time.time(), None
+        self._save_snapshot()
+        logger.info(f"Tabel kurs {self.base_currency} diperbarui ({len(self._rates)} mata uang).")
+
+    async def _refresh_in_background(self):
+        try: await self.refresh()
+        except Exception as e: logger.warning(f"Pembaruan kurs di latar belakang gagal, memakai data lama: {e}")
+
+    @property
+    def age(self) -> float:
+        return time.time() - self._fetched_at
+
+    @property
+    def is_stale(self) -> bool:
+        return self.age >= self.ttl
+
+    @property
+    def backing_off(self) -> bool:
+        return self._failed_at is not None and time.time() - self._failed_at < self.refresh_backoff
+
+    async def get_table(self) -> dict:
+        if self._rates is None or self.age >= self.max_stale:
+            # Tidak ada data yang layak dipakai: perbarui sekarang, tetapi jangan membanjiri server yang sedang gagal.
+            metrics.inc('xrx_currency_cache_total', result='miss')
+            if self._rates is not None and self.backing_off: raise ExchangeRateError('rates-outdated')
+            try: await self.refresh()
+            except Exception as e:
+                if self._rates is None: raise
+                logger.warning(f"Tabel kurs berumur {self.age / 3600:.1f} jam dan pembaruan gagal: {e}")
+                raise ExchangeRateError('rates-outdated') from e
+        elif self.is_stale:
+            metrics.inc('xrx_currency_cache_total', result='stale')
+            refreshing = self._refresh_task is not None and not self._refresh_task.done()
+            if not refreshing and not self.backing_off: self._refresh_task = asyncio.create_task(self._refresh_in_background())
+        else: metrics.inc('xrx_currency_cache_total', result='hit')
+        return self._rates
+
+    async def get_rate(self, from_currency, to_currency) -> float:
+        rates = await self.get_table()
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        if from_currency not in rates or to_currency not in rates: raise ExchangeRateError('unsupported-code')
+        return rates[to_currency] / rates[from_currency]
+
+    async def convert(self, amount, from_currency, to_currency) -> tuple[float, float]:
+        """Mengembalikan (hasil konversi, kurs 1 unit) tanpa memanggil server selama tabel masih ada."""
+        rate = await self.get_rate(from_currency, to_currency)
+        return amount * rate, rate
+
+    async def aclose(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+
+_default_client = None
+_default_cache = None
+
+def get_client() -> ExchangeRateClient:
+    """Klien bersama untuk seluruh bot."""
+    global _default_client
+    if _default_client is None: _default_client = ExchangeRateClient(config.EXCHANGERATE_API_KEY)
+    return _default_client
+
+def get_rate_cache() -> RateTableCache:
+    """Cache tabel kurs bersama untuk seluruh bot."""
+    global _default_cache
+    if _default_cache is None: _default_cache = RateTableCache(get_client(), snapshot_path=config.EXCHANGERATE_SNAPSHOT_FILE or None)
+    return _default_cache
+
+async def shutdown():
+    global _default_client, _default_cache
+    if _default_cache is not None:
+        await _default_cache.aclose()
+        _default_cache = None
+    if _default_client is not None:
+        await _default_client.aclose()
+        _default_client = None
@@ -1,35 +1,90 @@
 # database.py
 import sqlite3
-from config import DATABASE_FILE
+import threading
+from collections import OrderedDict
+import metrics
+from config import DATABASE_FILE, SETTINGS_CACHE_SIZE
+
+# Daftar putih kolom pengaturan beserta nilai default-nya (harus sama dengan DEFAULT di tabel).
+SETTING_DEFAULTS = {'default_base_name': 'Kontak', 'group_reply_enabled': 1}
+SETTING_COLUMNS = tuple(SETTING_DEFAULTS)
+
+_SELECT_SQL = f"SELECT {', '.join(SETTING_COLUMNS)} FROM users WHERE user_id = ?"
+_INSERT_SQL = "INSERT OR IGNORE INTO users (user_id) VALUES (?)"
+_UPSERT_SQL = {
+    name: f"INSERT INTO users (user_id, {name}) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET {name} = excluded.{name}"
+    for name in SETTING_COLUMNS
+}
+
+_conn = None
+_lock = threading.RLock()
+# Cache LRU write-through: user_id -> {kolom: nilai}
+_settings_cache = OrderedDict()
+
+def get_connection():
+    """Mengembalikan koneksi SQLite tunggal yang dipakai ulang selama bot berjalan."""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False, cached_statements=128)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+    return _conn
+
+def close_database():
+    global _conn
+    with _lock:
+        if _conn is not None: _conn.close(); _conn = None
+        _settings_cache.clear()
 
 def setup_database():
     """Membuat tabel database jika belum ada."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            default_base_name TEXT DEFAULT 'Kontak',
-            group_reply_enabled INTEGER DEFAULT 1
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                default_base_name TEXT DEFAULT 'Kontak',
+                group_reply_enabled INTEGER DEFAULT 1
+            )
+        ''')
+        conn.commit()
+
+def _check_setting_name(setting_name):
+    if setting_name not in SETTING_DEFAULTS: raise ValueError(f"Pengaturan tidak dikenal: {setting_name}")
+
+def _cache_put(user_id, settings):
+    _settings_cache[user_id] = settings
+    _settings_cache.move_to_end(user_id)
+    while len(_settings_cache) > SETTINGS_CACHE_SIZE: _settings_cache.popitem(last=False)
+
+def _load_user_settings(user_id):
+    """Mengambil semua pengaturan pengguna dari cache, atau dari database jika belum ada di cache."""
+    settings = _settings_cache.get(user_id)
+    if settings is not None:
+        _settings_cache.move_to_end(user_id)
+        metrics.inc('xrx_db_cache_total', result='hit')
+        return settings
+    metrics.inc('xrx_db_cache_total', result='miss')
+    conn = get_connection()
+    with metrics.timer('xrx_db_seconds', op='select'): row = conn.execute(_SELECT_SQL, (user_id,)).fetchone()
+    if row is None:
+        # Pengguna baru: ditulis sekali, pembacaan berikutnya dilayani dari cache.
+        with metrics.timer('xrx_db_seconds', op='insert'): conn.execute(_INSERT_SQL, (user_id,)); conn.commit()
+        settings = dict(SETTING_DEFAULTS)
+    else: settings = dict(zip(SETTING_COLUMNS, row))
+    _cache_put(user_id, settings)
+    return settings
 
 def get_user_setting(user_id, setting_name):
     """Mengambil pengaturan spesifik dari database untuk seorang pengguna."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
-    cursor.execute(f"SELECT {setting_name} FROM users WHERE user_id = ?", (user_id,))
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else None
+    _check_setting_name(setting_name)
+    with _lock: return _load_user_settings(user_id)[setting_name]
 
 def set_user_setting(user_id, setting_name, value):
     """Menyimpan pengaturan spesifik ke database untuk seorang pengguna."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    cursor.execute(f"UPDATE users SET {setting_name} = ? WHERE user_id = ?", (value, user_id))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    _check_setting_name(setting_name)
+    with _lock:
+        conn = get_connection()
+        with metrics.timer('xrx_db_seconds', op='upsert'): conn.execute(_UPSERT_SQL[setting_name], (user_id, value)); conn.commit()
+        settings = _settings_cache.get(user_id)
+        if settings is not None: settings[setting_name] = value; _settings_cache.move_to_end(user_id)
@@ -0,0 +1,120 @@
+# expression_engine.py
+
+import ast
+import math
+import time
+import asyncio
+import operator
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import config
+from workers import run_blocking
+
+class ExpressionError(ValueError):
+    """Ekspresi ditolak: di luar tata bahasa, terlalu panjang/besar, atau melewati batas waktu."""
+
+# Tata bahasa yang diizinkan: angka, + - * / // % **, tanda +/- unary, kurung, dan fungsi/konstanta di bawah.
+BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+              ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: None}
+UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+# round(x, n) dengan |n| besar menghitung 10**|n| dalam satu panggilan C yang tidak bisa diinterupsi.
+MAX_ROUND_DIGITS = 20
+
+def _safe_round(number, ndigits=None):
+    if ndigits is None: return round(number)
+    if not isinstance(ndigits, int) or abs(ndigits) > MAX_ROUND_DIGITS: raise ExpressionError(f"Digit pembulatan harus bilangan bulat antara -{MAX_ROUND_DIGITS} dan {MAX_ROUND_DIGITS}.")
+    return round(number, ndigits)
+
+FUNCTIONS = {'abs': abs, 'round': _safe_round, 'sqrt': math.sqrt, 'exp': math.exp, 'log': math.log, 'log10': math.log10,
+             'sin': math.sin, 'cos': math.cos, 'tan': math.tan, 'floor': math.floor, 'ceil': math.ceil}
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+
+def _normalize(expression: str) -> str:
+    return ' '.join(expression.split())
+
+def _check_value(value):
+    if isinstance(value, complex) or not isinstance(value, (int, float)): raise ExpressionError("Hasil bukan bilangan real.")
+    if abs(value) > config.CALC_MAX_MAGNITUDE: raise ExpressionError("Hasil terlalu besar.")
+    return value
+
+def _safe_pow(base, exponent):
+    if abs(exponent) > config.CALC_MAX_EXPONENT: raise ExpressionError("Pangkat terlalu besar.")
+    # Perkiraan jumlah digit hasil sebelum benar-benar menghitung pangkat.
+    if exponent > 0 and abs(base) > 1 and exponent * math.log10(abs(base)) > math.log10(config.CALC_MAX_MAGNITUDE):
+        raise ExpressionError("Hasil terlalu besar.")
+    return base ** exponent
+
+def _check_deadline(deadline):
+    if time.monotonic() > deadline: raise ExpressionError("Waktu perhitungan habis.")
+
+def _compile_node(node):
+    """Mengubah node AST yang tervalidasi menjadi closure `f(deadline) -> angka`."""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = _check_value(node.value)
+        return lambda deadline: value
+    if isinstance(node, ast.Name) and node.id in CONSTANTS:
+        value = CONSTANTS[node.id]
+        return lambda deadline: value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPS:
+        op, operand = UNARY_OPS[type(node.op)], _compile_node(node.operand)
+        return lambda deadline: op(operand(deadline))
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+        op = BINARY_OPS[type(node.op)] or _safe_pow
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        def binary(deadline):
+            _check_deadline(deadline)
+            return _check_value(op(left(deadline), right(deadline)))
+        return binary
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+        func, args = FUNCTIONS[node.func.id], [_compile_node(arg) for arg in node.args]
+        def call(deadline):
+            _check_deadline(deadline)
+            return _check_value(func(*(arg(deadline) for arg in args)))
+        return call
+    raise ExpressionError("Ekspresi tidak valid.")
+
+@lru_cache(maxsize=config.CALC_CACHE_SIZE)
+def compile_expression(expression: str):
+    """Memvalidasi dan mengompilasi ekspresi yang sudah dinormalisasi (hasil di-memo)."""
+    try: tree = ast.parse(expression, mode='eval')
+    except (SyntaxError, ValueError, MemoryError, RecursionError): raise ExpressionError("Ekspresi tidak valid.") from None
+    return _compile_node(tree.body)
+
+# Cache LRU hasil terakhir: ekspresi -> (berhasil, nilai atau pesan error); dipakai dari thread pekerja.
+_results = OrderedDict()
+_results_lock = threading.Lock()
+stats = {'hits': 0, 'misses': 0}
+
+def evaluate_expression(expression: str):
+    """Menghitung ekspresi dengan batas panjang, besaran, dan waktu; hasil terakhir disimpan di cache."""
+    expression = _normalize(expression)
+    if len(expression) > config.CALC_MAX_LENGTH: raise ExpressionError(f"Ekspresi terlalu panjang (maks. {config.CALC_MAX_LENGTH} karakter).")
+    with _results_lock:
+        cached = _results.get(expression)
+        if cached is not None:
+            stats['hits'] += 1
+            _results.move_to_end(expression)
+    if cached is None:
+        stats['misses'] += 1
+        try:
+            program = compile_expression(expression)
+            cached = (True, program(time.monotonic() + config.CALC_TIMEOUT))
+        except ExpressionError as e: cached = (False, str(e))
+        except (ArithmeticError, ValueError, TypeError, RecursionError): cached = (False, "Ekspresi tidak dapat dihitung.")
+        with _results_lock:
+            _results[expression] = cached
+            if len(_results) > config.CALC_CACHE_SIZE: _results.popitem(last=False)
+    ok, value = cached
+    if not ok: raise ExpressionError(value)
+    return value
+
+async def evaluate_expression_async(expression: str):
+    """evaluate_expression di thread pekerja dengan batas waktu dari sisi event loop (2x CALC_TIMEOUT).
+
+    Tenggat kooperatif hanya diperiksa di antara node AST; batas ini menjaga event loop tetap jalan walaupun
+    satu operasi berjalan lebih lama dari itu (thread-nya dibiarkan selesai sendiri di latar belakang).
+    """
+    try: return await asyncio.wait_for(run_blocking(evaluate_expression, expression), config.CALC_TIMEOUT * 2)
+    except asyncio.TimeoutError: raise ExpressionError("Waktu perhitungan habis.") from None
@@ -0,0 +1,122 @@
+# external_merge.py
+
+import os
+import heapq
+import pickle
+import shutil
+import tempfile
+import itertools
+
+import config
+from contact import Contact
+from phone_normalizer import PhoneNormalizer
+
+# --- Aliran kontak di disk ---
+
+def _dump_batches(records, f, batch_size=4096):
+    """Menulis iterable apa pun ke file sebagai rangkaian batch pickle."""
+    count = 0
+    for batch in iter(lambda: list(itertools.islice(records, batch_size)), []):
+        pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+        count += len(batch)
+    return count
+
+def _load_batches(path):
+    with open(path, 'rb') as f:
+        while True:
+            try: batch = pickle.load(f)
+            except EOFError: return
+            yield from batch
+
+def write_contact_stream(contacts, path) -> int:
+    """Menyimpan Contact ke file aliran (tanpa menampung semuanya di memori). Mengembalikan jumlahnya."""
+    with open(path, 'wb') as f: return _dump_batches((c.values() for c in contacts), f)
+
+class ContactStream:
+    """Iterable Contact yang dibaca ulang dari file aliran setiap kali di-iterasi; aman di-pickle ke worker."""
+
+    def __init__(self, path, count=None):
+        self.path, self.count = path, count
+
+    def __iter__(self):
+        return (Contact(*values) for values in _load_batches(self.path))
+
+    def __len__(self):
+        if self.count is None: self.count = sum(1 for _ in _load_batches(self.path))
+        return self.count
+
+# --- Dedup terpartisi hash ---
+
+def _partition(records, work_dir, fanout, salt):
+    """Membagi record (seq, kunci, nilai) ke `fanout` file berdasarkan hash kunci."""
+    paths = [os.path.join(work_dir, f"p{salt}_{i}.bin") for i in range(fanout)]
+    files = [open(path, 'wb') for path in paths]
+    buffers = [[] for _ in range(fanout)]
+    try:
+        for record in records:
+            i = hash((salt, record[1])) % fanout
+            buffers[i].append(record)
+            if len(buffers[i]) >= 4096: pickle.dump(buffers[i], files[i], protocol=pickle.HIGHEST_PROTOCOL); buffers[i] = []
+        for buffer, f in zip(buffers, files):
+            if buffer: pickle.dump(buffer, f, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        for f in files: f.close()
+    return paths
+
+def _dedup_partition(path, work_dir, fanout, max_bytes, depth):
+    """Mengembalikan record unik (kemunculan pertama) dari satu partisi, urut menurut seq.
+
+    Partisi yang masih lebih besar dari `max_bytes` dipecah lagi dengan salt berbeda sehingga
+    memori yang dipakai tetap terbatas berapa pun ukuran input.
+    """
+    if os.path.getsize(path) > max_bytes and depth < 4:
+        sub_paths = _partition(_load_batches(path), work_dir, fanout, f"{depth + 1}_{os.path.basename(path)}")
+        os.remove(path)
+        runs = [_dedup_partition(p, work_dir, fanout, max_bytes, depth + 1) for p in sub_paths]
+        return _write_run(heapq.merge(*(_load_batches(run) for run in runs)), path)
+    seen, survivors = set(), []
+    for record in _load_batches(path):
+        if record[1] not in seen:
+            seen.add(record[1]); survivors.append(record)
+    os.remove(path)
+    return _write_run(iter(survivors), path)
+
+def _write_run(records, path):
+    run_path = f"{path}.run"
+    with open(run_path, 'wb') as f: _dump_batches(records, f)
+    return run_path
+
+def external_merge(sources, deduplicate=True, key=None, work_dir=None, stats=None):
+    """Menggabungkan beberapa sumber Contact secara streaming dengan memori terbatas.
+
+    Dengan `deduplicate`, kontak tanpa kunci dibuang dan hanya kemunculan pertama tiap kunci
+    (default: nomor telepon kanonik) yang dipertahankan, dengan urutan sesuai pertama kali terlihat.
+    """
+    if key is None:
+        phone_key = PhoneNormalizer().key
+        key = lambda contact: phone_key(contact.phone)
+    stats = stats if stats is not None else {}
+    stats.update(input=0, output=0, collapsed=0)
+    if not deduplicate:
+        for contact in itertools.chain.from_iterable(sources):
+            stats['input'] += 1; stats['output'] += 1
+            yield contact
+        return
+    work_dir = tempfile.mkdtemp(prefix='merge_', dir=work_dir)
+    try:
+        keyed = 0
+        def records():
+            nonlocal keyed
+            for seq, contact in enumerate(itertools.chain.from_iterable(sources)):
+                stats['input'] += 1
+                contact_key = key(contact)
+                if contact_key: keyed += 1; yield seq, contact_key, contact.values()
+        fanout = config.MERGE_PARTITION_FANOUT
+        paths = _partition(records(), work_dir, fanout, 0)
+        runs = [_dedup_partition(path, work_dir, fanout, config.MERGE_PARTITION_MAX_BYTES, 0) for path in paths]
+        for _, _, values in heapq.merge(*(_load_batches(run) for run in runs)):
+            stats['output'] += 1
+            yield Contact(*values)
+        stats['collapsed'] = keyed - stats['output']
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,125 @@
+# flood_limiter.py
+
+import time
+import asyncio
+import logging
+import contextlib
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Token bucket asyncio: `rate` token per detik dengan kapasitas `burst`; antrean tunggu bersifat FIFO."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'paused_until', '_lock')
+
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.updated, self.paused_until = float(burst), time.monotonic(), 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Menunggu satu token; mengembalikan lama menunggu (detik)."""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until: await asyncio.sleep(self.paused_until - now); continue
+                if self.tokens >= 1: self.tokens -= 1; break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        return time.monotonic() - started
+
+    def pause(self, seconds):
+        """Menahan bucket (mis. setelah RetryAfter) dan mengosongkan tokennya."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    @property
+    def idle(self) -> bool:
+        return not self._lock.locked() and time.monotonic() >= self.paused_until and self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+class FloodLimiter(BaseRateLimiter):
+    """Penjadwal keluaran untuk semua panggilan Bot API (dipasang lewat `ApplicationBuilder.rate_limiter`).
+
+    - bucket global untuk seluruh bot dan bucket per chat (grup memakai laju yang lebih rendah),
+    - urutan pesan ke satu chat dipertahankan: permintaan ke chat yang sama dikirim bergiliran,
+    - jumlah permintaan yang sedang berjalan ke Telegram dibatasi `max_concurrency`,
+    - RetryAfter menahan bucket chat terkait (atau bucket global) lalu permintaan diulang.
+    """
+
+    def __init__(self, global_rate=None, chat_rate=None, chat_burst=None, group_rate=None, max_concurrency=None, max_retries=None, max_idle_buckets=1000):
+        self.global_rate = global_rate or config.OUTBOUND_GLOBAL_RATE
+        self.chat_rate = chat_rate or config.OUTBOUND_CHAT_RATE
+        self.chat_burst = chat_burst or config.OUTBOUND_CHAT_BURST
+        self.group_rate = group_rate or config.OUTBOUND_GROUP_RATE
+        self.max_concurrency = max_concurrency or config.OUTBOUND_MAX_CONCURRENCY
+        self.max_retries = config.OUTBOUND_MAX_RETRIES if max_retries is None else max_retries
+        self.max_idle_buckets = max_idle_buckets
+        self._global = None
+        self._chats = {}
+        self._chat_locks = {}
+        self._semaphore = None
+        self.stats = {'requests': 0, 'retries': 0, 'wait_seconds': 0.0}
+
+    async def initialize(self) -> None:
+        # Tanpa burst global: Telegram menghitung batas global per jendela satu detik.
+        self._global = TokenBucket(self.global_rate, 1)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def shutdown(self) -> None:
+        self._chats.clear(); self._chat_locks.clear()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_idle_buckets:
+                for key in [key for key, value in self._chats.items() if value.idle]: del self._chats[key]
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = self._chats[chat_id] = TokenBucket(self.group_rate if is_group else self.chat_rate, 1 if is_group else self.chat_burst)
+        return bucket
+
+    @contextlib.asynccontextmanager
+    async def _chat_turn(self, chat_id):
+        """Menjaga urutan FIFO per chat; kunci dihapus saat tidak ada lagi yang menunggu."""
+        if chat_id is None:
+            yield
+            return
+        entry = self._chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]: yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]: self._chat_locks.pop(chat_id, None)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        """`rate_limit_args` (int) dapat menimpa jumlah maksimal pengulangan untuk satu panggilan."""
+        max_retries = self.max_retries if rate_limit_args is None else rate_limit_args
+        chat_id = data.get('chat_id')
+        with contextlib.suppress(ValueError, TypeError): chat_id = int(chat_id)
+        self.stats['requests'] += 1
+
+        async with self._chat_turn(chat_id):
+            for attempt in range(max_retries + 1):
+                waited = await self._chat_bucket(chat_id).acquire() if chat_id is not None else 0.0
+                waited += await self._global.acquire()
+                self.stats['wait_seconds'] += waited
+                metrics.observe('xrx_outbound_wait_seconds', waited, endpoint=endpoint)
+                try:
+                    async with self._semaphore: return await callback(*args, **kwargs)
+                except RetryAfter as e:
+                    if attempt == max_retries: logger.error(f"Flood limit {endpoint} masih terkena setelah {max_retries} percobaan."); raise
+                    seconds = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                    self.stats['retries'] += 1
+                    metrics.inc('xrx_outbound_retries_total', endpoint=endpoint)
+                    logger.info(f"RetryAfter {seconds:.1f} detik untuk {endpoint} (chat {chat_id}).")
+                    (self._chat_bucket(chat_id) if chat_id is not None else self._global).pause(seconds + 0.1)
@@ -0,0 +1,279 @@
+# formats.py
+
+import io
+import os
+import csv
+import gzip
+import json
+import logging
+import zipfile
+
+import config
+from contact import Contact, CONTACT_KEYS
+from output_parts import PartWriter, SpoolBudget
+from phone_normalizer import PhoneNormalizer
+from core_logic import iter_txt_contacts, open_text, track_progress
+from core_functions import iter_vcf_contacts, iter_csv_contacts, merge_contact_files
+
+logger = logging.getLogger(__name__)
+
+class ContactFormat:
+    """Satu format kontak: `reader(sumber, stats)` (path atau stream teks) menghasilkan Contact, `writer(out)` mengembalikan
+    fungsi `write(contact, name)` yang menulis satu kontak ke `out` (PartWriter)."""
+    __slots__ = ('name', 'extension', 'label', 'reader', 'writer')
+
+    def __init__(self, name, extension, label, reader=None, writer=None):
+        self.name, self.extension, self.label, self.reader, self.writer = name, extension, label, reader, writer
+
+FORMATS = {}
+# Ekstensi file -> format baca bawaan.
+EXTENSION_READERS = {}
+
+def register_format(name, extension, label, reader=None, writer=None, default_for_extension=False):
+    """Mendaftarkan plugin format; format dengan nama sama akan ditimpa."""
+    FORMATS[name] = ContactFormat(name, extension, label, reader, writer)
+    if reader is not None and default_for_extension: EXTENSION_READERS[extension] = name
+    return FORMATS[name]
+
+def get_format(name) -> ContactFormat:
+    try: return FORMATS[name]
+    except KeyError: raise ValueError(f"Format '{name}' tidak dikenal.") from None
+
+def detect_format(file_path):
+    """Menebak format baca dari ekstensi file; None jika tidak didukung (arsip: lihat is_supported)."""
+    return EXTENSION_READERS.get(os.path.splitext(file_path)[1].lower().lstrip('.'))
+
+def readable_extensions() -> tuple:
+    return tuple(f".{extension}" for extension in EXTENSION_READERS) + tuple(ARCHIVE_EXTENSIONS)
+
+def upload_suffix(file_name) -> str:
+    """Akhiran yang perlu dipertahankan saat menyimpan unggahan, mis. '.csv.gz' atau '.zip'."""
+    stem, extension = os.path.splitext(file_name.lower())
+    if extension == '.gz': return os.path.splitext(stem)[1] + extension
+    return extension
+
+def is_supported(file_name) -> bool:
+    return detect_format(file_name) is not None or os.path.splitext(file_name)[1].lower() in ARCHIVE_EXTENSIONS
+
+# --- Arsip (.gz/.zip) ---
+
+def _text_stream(binary):
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline='')
+
+class _LimitedReader(io.RawIOBase):
+    """Membaca stream biner dan melempar ValueError begitu hasil dekompresinya melewati `limit` byte."""
+
+    def __init__(self, binary, limit):
+        self.binary, self.limit, self.total = binary, limit, 0
+
+    def readable(self): return True
+
+    def readinto(self, buffer):
+        count = self.binary.readinto(buffer)
+        self.total += count
+        if self.total > self.limit: raise ValueError("Isi arsip terlalu besar setelah dekompresi.")
+        return count
+
+def _iter_gzip_members(file_path):
+    """Satu anggota: format ditebak dari nama tanpa .gz (default TXT); ukuran dekompresi dibatasi seperti .zip.
+
+    Header gzip hanya mencatat ukuran asli modulo 4 GiB (dan bisa dipalsukan), jadi batasnya dihitung saat membaca.
+    """
+    inner = os.path.splitext(file_path)[0]
+    with gzip.open(file_path, 'rb') as binary:
+        limited = io.BufferedReader(_LimitedReader(binary, config.ARCHIVE_MAX_UNCOMPRESSED_BYTES))
+        yield inner, detect_format(inner) or 'txt', _text_stream(limited)
+
+def _iter_zip_members(file_path):
+    """Anggota dengan format yang dikenali, dibaca berurutan langsung dari arsip tanpa diekstrak ke disk."""
+    with zipfile.ZipFile(file_path) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir() and detect_format(info.filename)]
+        if len(members) > config.ARCHIVE_MAX_MEMBERS: raise ValueError(f"Arsip berisi lebih dari {config.ARCHIVE_MAX_MEMBERS} file.")
+        if sum(info.file_size for info in members) > config.ARCHIVE_MAX_UNCOMPRESSED_BYTES: raise ValueError("Isi arsip terlalu besar setelah dekompresi.")
+        for info in members:
+            with archive.open(info) as binary: yield info.filename, detect_format(info.filename), _text_stream(binary)
+
+ARCHIVE_EXTENSIONS = {'.gz': _iter_gzip_members, '.zip': _iter_zip_members}
+
+def iter_sources(file_path, format_name=None):
+    """Menghasilkan (nama, format, sumber) untuk file biasa (sumber = path) atau tiap anggota arsip (sumber = stream teks)."""
+    opener = ARCHIVE_EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+    if opener is None:
+        yield file_path, format_name or detect_format(file_path), file_path
+    else: yield from opener(file_path)
+
+# --- Pembaca ---
+
+def iter_contacts(file_path, format_name=None, stats=None):
+    """Membaca file (atau semua anggota arsip .gz/.zip) dengan plugin formatnya secara streaming."""
+    stats = stats if stats is not None else {}
+    for name, source_format, source in iter_sources(file_path, format_name):
+        fmt = get_format(source_format)
+        if fmt.reader is None: raise ValueError(f"Format '{fmt.name}' tidak bisa dibaca.")
+        yield from fmt.reader(source, stats)
+
+def summarize_file(file_path, format_name=None) -> tuple:
+    """Menghitung kontak dalam file tanpa menyimpannya; mengembalikan (jumlah, kontak pertama)."""
+    count, first = 0, None
+    for contact in iter_contacts(file_path, format_name):
+        if first is None: first = contact
+        count += 1
+    return count, first
+
+def count_contacts(file_path, format_name=None) -> int:
+    return summarize_file(file_path, format_name)[0]
+
+# Naikkan setiap kali isi/arti hasil parse_file_smartly berubah: versi ini ikut jenis entri parse cache,
+# sehingga hasil dari kode lama tidak disajikan lagi (v2: dedup nomor kanonik + 'collapsed', v3: arsip & multi-format).
+PARSE_RESULT_VERSION = 3
+PARSE_CACHE_KIND = f"txt_smart.v{PARSE_RESULT_VERSION}"
+
+def parse_file_smartly(file_path) -> dict:
+    """Versi multi-format parse_txt_file_smartly: file biasa atau arsip, hasil unik per nomor kanonik.
+
+    Mengembalikan dict yang sama ({'contacts', 'invalid_lines', 'was_structured', 'collapsed'}); kontak
+    tanpa nomor valid dihitung sebagai baris tidak valid.
+    """
+    stats, contacts, seen, phone_key = {}, [], set(), PhoneNormalizer().key
+    try:
+        for contact in iter_contacts(file_path, stats=stats):
+            key = phone_key(contact.phone)
+            if not key: stats['invalid_lines'] = stats.get('invalid_lines', 0) + 1
+            elif key in seen: stats['collapsed'] = stats.get('collapsed', 0) + 1
+            else: seen.add(key); contacts.append(contact)
+    except Exception as e:
+        logger.error(f"Gagal mem-parsing file {file_path}: {e}")
+        return {'contacts': [], 'invalid_lines': 0, 'was_structured': False, 'collapsed': 0}
+    was_structured = stats.get('was_structured', False) or any(contact.name for contact in contacts[:100])
+    return {'contacts': contacts, 'invalid_lines': stats.get('invalid_lines', 0), 'was_structured': was_structured and bool(contacts), 'collapsed': stats.get('collapsed', 0)}
+
+def _read_txt(source, stats): return iter_txt_contacts(source, stats)
+def _read_csv(source, stats): return iter_csv_contacts(source)
+def _read_vcf(source, stats): return iter_vcf_contacts(source)
+
+def _read_jsonl(source, stats):
+    stats.setdefault('invalid_lines', 0)
+    with open_text(source) as f:
+        for line in f:
+            if not line.strip(): continue
+            try: record = json.loads(line)
+            except ValueError: stats['invalid_lines'] += 1; continue
+            if not isinstance(record, dict): stats['invalid_lines'] += 1; continue
+            contact = Contact.from_mapping(record)
+            if contact.name or contact.phone: yield contact
+
+# --- Penulis ---
+
+def _write_vcf(out):
+    def write(contact, name):
+        lines = ['BEGIN:VCARD\nVERSION:3.0\n']
+        if name: lines.append(f"FN:{name}\n")
+        if contact.phone: lines.append(f"TEL;TYPE=CELL:{contact.phone}\n")
+        if contact.email: lines.append(f"EMAIL:{contact.email}\n")
+        if contact.address: lines.append(f"ADR;TYPE=HOME:;;{contact.address}\n")
+        if contact.organization: lines.append(f"ORG:{contact.organization}\n")
+        if contact.job_title: lines.append(f"TITLE:{contact.job_title}\n")
+        if contact.birthday: lines.append(f"BDAY:{contact.birthday}\n")
+        if contact.notes: lines.append(f"NOTE:{contact.notes}\n")
+        lines.append('END:VCARD\n\n')
+        out.write(''.join(lines))
+    return write
+
+def _csv_writer(headers, row):
+    """Membuat plugin penulis CSV dari daftar header dan fungsi `row(contact, name) -> list`."""
+    def factory(out):
+        writer = csv.writer(out)
+        writer.writerow(headers)
+        return lambda contact, name: writer.writerow(row(contact, name))
+    return factory
+
+# Format Google CSV memerlukan header spesifik
+GOOGLE_CSV_HEADERS = [
+    'Name', 'Given Name', 'Additional Name', 'Family Name', 'Yomi Name', 'Given Name Yomi',
+    'Additional Name Yomi', 'Family Name Yomi', 'Name Prefix', 'Name Suffix', 'Initials',
+    'Nickname', 'Short Name', 'Maiden Name', 'Birthday', 'Gender', 'Location', 'Billing Information',
+    'Directory Server', 'Mileage', 'Occupation', 'Hobby', 'Sensitivity', 'Priority', 'Subject',
+    'Notes', 'Language', 'Photo', 'Group Membership', 'E-mail 1 - Type', 'E-mail 1 - Value',
+    'Phone 1 - Type', 'Phone 1 - Value', 'Address 1 - Type', 'Address 1 - Formatted',
+    'Organization 1 - Name', 'Organization 1 - Title'
+]
+_GOOGLE_INDEX = {header: i for i, header in enumerate(GOOGLE_CSV_HEADERS)}
+
+def _google_row(contact, name):
+    row = [''] * len(GOOGLE_CSV_HEADERS)
+    for header, value in (('Name', name), ('Birthday', contact.birthday), ('Notes', contact.notes),
+                          ('E-mail 1 - Type', '* Other'), ('E-mail 1 - Value', contact.email),
+                          ('Phone 1 - Type', 'Mobile'), ('Phone 1 - Value', contact.phone),
+                          ('Address 1 - Type', 'Home'), ('Address 1 - Formatted', contact.address),
+                          ('Organization 1 - Name', contact.organization), ('Organization 1 - Title', contact.job_title)):
+        row[_GOOGLE_INDEX[header]] = value
+    return row
+
+# Subset header impor Outlook; nama lengkap disimpan di First Name agar nama Indonesia tidak dipotong.
+OUTLOOK_CSV_HEADERS = ['First Name', 'Middle Name', 'Last Name', 'Company', 'Job Title', 'E-mail Address',
+                       'Mobile Phone', 'Home Street', 'Birthday', 'Notes']
+
+def _outlook_row(contact, name):
+    return [name, '', '', contact.organization, contact.job_title, contact.email, contact.phone, contact.address, contact.birthday, contact.notes]
+
+def _write_jsonl(out):
+    def write(contact, name):
+        record = {key: value for key, value in contact.items() if value}
+        if name: record['Name'] = name
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return write
+
+register_format('txt', 'txt', "TXT (deteksi otomatis)", reader=_read_txt, default_for_extension=True)
+register_format('vcf', 'vcf', "VCF (vCard)", reader=_read_vcf, writer=_write_vcf, default_for_extension=True)
+register_format('csv', 'csv', "CSV Standar", reader=_read_csv, writer=_csv_writer(list(CONTACT_KEYS), lambda contact, name: [name if key == 'Name' else contact[key] for key in CONTACT_KEYS]), default_for_extension=True)
+register_format('google_csv', 'csv', "Google CSV", reader=_read_csv, writer=_csv_writer(GOOGLE_CSV_HEADERS, _google_row))
+register_format('outlook_csv', 'csv', "Outlook CSV", reader=_read_csv, writer=_csv_writer(OUTLOOK_CSV_HEADERS, _outlook_row))
+register_format('jsonl', 'jsonl', "JSON Lines", reader=_read_jsonl, writer=_write_jsonl, default_for_extension=True)
+
+# --- Konversi ---
+
+def render(contacts, format_name, filename, spool_dir=None, contacts_per_file=None, base_name='', control=None, total=None) -> tuple[list, int]:
+    """Menulis kontak (daftar atau iterator) dengan plugin `format_name` dalam satu lintasan.
+
+    Dipecah per `contacts_per_file` menjadi `<filename>_<awal>-<akhir>.<ext>`; kontak tanpa nama diberi
+    `<base_name> <urutan>`. Semua part berbagi satu SpoolBudget, jadi total hasil di memori tidak melewati
+    OUTPUT_SPOOL_THRESHOLD_BYTES berapa pun jumlah part-nya. `control` (jobs.JobControl) menerima progres
+    dan bisa menghentikan penulisan; bagian yang sudah ditulis dibuang saat itu terjadi. Mengembalikan
+    (daftar OutputPart, jumlah).
+    """
+    fmt = get_format(format_name)
+    if fmt.writer is None: raise ValueError(f"Format '{fmt.name}' tidak bisa ditulis.")
+    if total is None and hasattr(contacts, '__len__'): total = len(contacts)
+    parts, out, write, count = [], None, None, 0
+    budget = SpoolBudget()
+
+    def close_part():
+        nonlocal out
+        part, out = out.close(), None
+        if contacts_per_file:
+            start = (len(parts)) * contacts_per_file + 1
+            part.filename = f"{filename}_{start}-{count}.{fmt.extension}"
+        parts.append(part)
+
+    try:
+        for contact in track_progress(contacts, control, total):
+            if out is not None and contacts_per_file and count % contacts_per_file == 0: close_part()
+            if out is None:
+                out = PartWriter(f"{filename}.{fmt.extension}", spool_dir=spool_dir, budget=budget)
+                write = fmt.writer(out)
+            count += 1
+            write(contact, contact.name or (f"{base_name} {count}" if base_name else ''))
+        if out is not None: close_part()
+    except BaseException:
+        if out is not None: parts.append(out.close())
+        for part in parts: part.discard()
+        raise
+    return parts, count
+
+def convert(source_path, format_name, filename, source_format=None, stats=None, **render_kwargs) -> tuple[list, int]:
+    """Konversi file-ke-file apa pun dalam satu lintasan streaming (pembaca -> penulis, tanpa daftar perantara)."""
+    return render(iter_contacts(source_path, source_format, stats), format_name, filename, **render_kwargs)
+
+def merge_files(file_paths, output_path, **kwargs):
+    """Menggabungkan file dengan format apa pun yang terdaftar (lihat core_functions.merge_contact_files)."""
+    return merge_contact_files((iter_contacts(path) for path in file_paths), output_path, **kwargs)
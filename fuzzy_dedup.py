@@ -0,0 +1,114 @@
+# fuzzy_dedup.py
+
+import re
+from difflib import SequenceMatcher
+from collections import defaultdict
+
+import config
+from contact import CONTACT_ATTRS
+from phone_normalizer import PhoneNormalizer
+
+_TOKEN_PATTERN = re.compile(r'\w{3,}')
+# Field yang diisi dari duplikat jika kontak utama masih kosong (kebijakan 'fill').
+MERGE_FILL_ATTRS = tuple(attr for attr in CONTACT_ATTRS if attr != 'phone')
+
+def _within_edits(a, b, max_edits):
+    """Jarak Levenshtein a-b <= max_edits (DP dengan batas pita, nomor telepon pendek)."""
+    if abs(len(a) - len(b)) > max_edits: return False
+    if a == b: return True
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+        if min(current) > max_edits: return False
+        previous = current
+    return previous[-1] <= max_edits
+
+def _name_key(name):
+    return ' '.join(sorted(name.lower().split()))
+
+# Digit awal nomor kanonik yang nyaris sama untuk semua kontak satu negara (kode negara + awal operator, mis. 6281).
+PHONE_PREFIX_DIGITS = 4
+PHONE_CHUNK_DIGITS = 4
+
+def _phone_chunks(digits):
+    """Dua potongan nomor pelanggan berukuran tetap: satu dihitung dari awal (setelah prefiks), satu dari akhir.
+
+    Satu salah ketik (ganti, sisip, atau hapus digit) paling banyak mengubah salah satunya selama kedua
+    potongan tidak tumpang tindih: edit di depan potongan akhir tidak menggeser potongan akhir, edit di
+    belakang potongan awal tidak menggeser potongan awal. Ukuran potongan dan panjang nomor sengaja tidak
+    bergantung satu sama lain agar sisip/hapus digit tetap jatuh di blok yang sama.
+    """
+    subscriber = digits[PHONE_PREFIX_DIGITS:] or digits
+    return ('pf', subscriber[:PHONE_CHUNK_DIGITS]), ('pl', subscriber[-PHONE_CHUNK_DIGITS:])
+
+def _block_keys(digits, name, email):
+    """Kunci blok: dua potongan nomor pelanggan (lihat `_phone_chunks`), token nama + 3 digit akhir, dan email."""
+    keys = []
+    if digits:
+        keys.extend(_phone_chunks(digits))
+        keys.extend(('nt', token, digits[-3:]) for token in set(_TOKEN_PATTERN.findall(name.lower())))
+    if email: keys.append(('em', email.lower()))
+    return keys
+
+def _merge_into(primary, duplicate, policy):
+    for attr in MERGE_FILL_ATTRS:
+        value = getattr(duplicate, attr)
+        if not value: continue
+        current = getattr(primary, attr)
+        if not current or (policy == 'longest' and len(value) > len(current)): setattr(primary, attr, value)
+
+def fuzzy_deduplicate(contacts, max_phone_edits=None, min_name_similarity=None, max_block_size=None, merge_policy='fill', stats=None):
+    """Menggabungkan kontak yang hampir sama (nama mirip, nomor beda salah ketik) tanpa perbandingan O(n²).
+
+    Kandidat pasangan hanya diambil dari blok indeks (lihat `_block_keys`); blok yang lebih besar
+    dari `max_block_size` dilewati. Pasangan dianggap duplikat jika nomor kanoniknya sama, atau
+    jika nomor berbeda paling banyak `max_phone_edits` digit dan kemiripan nama >=
+    `min_name_similarity`, atau jika email sama dan nama mirip. Kontak pertama di tiap kelompok
+    dipertahankan dan field kosongnya diisi dari duplikat (`merge_policy` 'fill' atau 'longest').
+    """
+    max_phone_edits = max_phone_edits if max_phone_edits is not None else config.FUZZY_PHONE_MAX_EDITS
+    min_name_similarity = min_name_similarity if min_name_similarity is not None else config.FUZZY_NAME_MIN_SIMILARITY
+    max_block_size = max_block_size or config.FUZZY_MAX_BLOCK_SIZE
+    stats = stats if stats is not None else {}
+    stats.update(input=len(contacts), compared=0, skipped_blocks=0, collapsed=0)
+
+    digits = [key.lstrip('+') for key in PhoneNormalizer().keys([c.phone for c in contacts])]
+    names = [_name_key(c.name) for c in contacts]
+    blocks = defaultdict(list)
+    for i, contact in enumerate(contacts):
+        for block_key in _block_keys(digits[i], contact.name, contact.email): blocks[block_key].append(i)
+
+    parent = list(range(len(contacts)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]; i = parent[i]
+        return i
+
+    def is_duplicate(i, j):
+        if digits[i] and digits[i] == digits[j]: return True
+        if not names[i] or not names[j]: return False
+        similar = names[i] == names[j] or SequenceMatcher(None, names[i], names[j]).ratio() >= min_name_similarity
+        if not similar: return False
+        if digits[i] and digits[j] and _within_edits(digits[i], digits[j], max_phone_edits): return True
+        email_i, email_j = contacts[i].email.lower(), contacts[j].email.lower()
+        return bool(email_i) and email_i == email_j
+
+    for members in blocks.values():
+        if len(members) < 2: continue
+        if len(members) > max_block_size: stats['skipped_blocks'] += 1; continue
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                i, j = members[a], members[b]
+                root_i, root_j = find(i), find(j)
+                if root_i == root_j: continue
+                stats['compared'] += 1
+                if is_duplicate(i, j): parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    result, primary_of = [], {}
+    for i, contact in enumerate(contacts):
+        root = find(i)
+        if root == i: primary_of[i] = contact; result.append(contact)
+        else: _merge_into(primary_of[root], contact, merge_policy); stats['collapsed'] += 1
+    return result
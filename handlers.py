@@ -1,22 +1,36 @@
 # handlers.py
 import os
-import re
-import requests
 import logging
+import warnings
 from datetime import datetime, timezone, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters, CallbackQueryHandler
-import numexpr as ne
+from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, TypeHandler, filters, CallbackQueryHandler
+from telegram.warnings import PTBUserWarning
 
-from config import EXCHANGERATE_API_KEY
-from core_logic import parse_txt_file_smartly, write_contact_files
+import bot_handlers
+import currency
+import formats
+import jobs
+import message_classifier
+import metrics
+import parse_cache
+import workspace
+from config import EXCHANGERATE_API_KEY, OUTPUT_ZIP_MIN_PARTS, OWNER_ID, WORKSPACE_OUTPUT_BYTES_PER_CONTACT
 from database import get_user_setting, set_user_setting
+from expression_engine import evaluate_expression_async, ExpressionError
+from jobs import JobCancelled
+from message_classifier import classify_group_message
+from output_parts import bundle_zip
+from parse_cache import hash_file
+from utils import flow_workspace
+from workspace import WorkspaceQuotaError
+from workers import run_blocking
 
 logger = logging.getLogger(__name__)
 
 # Definisi State
 AWAIT_FILE, AWAIT_BASE_NAME, AWAIT_SPLIT_CHOICE, AWAIT_EXPORT_CHOICE, AWAIT_FILENAME = range(5)
-AWAIT_NEW_DEFAULT_NAME = range(5, 6)
+AWAIT_NEW_DEFAULT_NAME = 5
 
 def get_greeting():
     wib = timezone(timedelta(hours=7)); current_hour = datetime.now(wib).hour
@@ -25,10 +39,11 @@ def get_greeting():
     if 15 <= current_hour < 18: return "Sore"
     return "Malam"
 
-def cleanup(context: ContextTypes.DEFAULT_TYPE):
+def cleanup(context: ContextTypes.DEFAULT_TYPE, workspace_path=None):
+    """Menghapus workspace alur ini (atau `workspace_path` milik pekerjaan latar belakang)."""
     chat_id = context.user_data.get('chat_id')
-    if chat_id and os.path.exists(str(chat_id)):
-        shutil.rmtree(str(chat_id)); logger.info(f"Direktori sementara untuk chat_id {chat_id} telah dihapus.")
+    workspace.get_manager().release(workspace_path or context.user_data.get('workspace'))
+    if workspace_path is None or workspace_path == context.user_data.get('workspace'): context.user_data.pop('workspace', None)
     if 'conv_persistence' in context.bot_data:
         if chat_id in context.bot_data['conv_persistence']:
             del context.bot_data['conv_persistence'][chat_id]
@@ -37,7 +52,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     get_user_setting(user_id, 'default_base_name')
     greeting = get_greeting()
-    keyboard = [[InlineKeyboardButton("🚀 Konversi Kontak TXT", callback_data='start_convert')], [InlineKeyboardButton("🧮 Kalkulator & Konverter", callback_data='calculator_menu')], [InlineKeyboardButton("⚙️ Pengaturan", callback_data='settings_menu')], [InlineKeyboardButton("📖 Panduan", callback_data='show_guide'), InlineKeyboardButton("👤 Kontak Owner", callback_data='show_owner')]]
+    keyboard = [[InlineKeyboardButton("🚀 Konversi Kontak TXT", callback_data='start_convert')], [InlineKeyboardButton("➕ Gabungkan Beberapa File", callback_data='start_merge')], [InlineKeyboardButton("🧮 Kalkulator & Konverter", callback_data='calculator_menu')], [InlineKeyboardButton("⚙️ Pengaturan", callback_data='settings_menu')], [InlineKeyboardButton("📖 Panduan", callback_data='show_guide'), InlineKeyboardButton("👤 Kontak Owner", callback_data='show_owner')]]
     text = (f"--- **XRX BOT** ---\n\n👋 Selamat **{greeting}**!\n"
             "Saya bot serbaguna. Pilih menu di bawah.")
     if update.callback_query: await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
@@ -61,8 +76,8 @@ async def show_currency_guide(update, context): query = update.callback_query; a
 
 async def calculator_handler(update, context):
     if not context.args: await update.message.reply_text("Gunakan: `/calc <ekspresi>`"); return
-    try: await update.message.reply_text(f"🔢 Hasil: `{ne.evaluate(' '.join(context.args)).item()}`", parse_mode='Markdown')
-    except Exception as e: await update.message.reply_text(f"❌ Error: Ekspresi tidak valid.\n`{e}`", parse_mode='Markdown')
+    try: await update.message.reply_text(f"🔢 Hasil: `{await evaluate_expression_async(' '.join(context.args))}`", parse_mode='Markdown')
+    except ExpressionError as e: await update.message.reply_text(f"❌ Error: Ekspresi tidak valid.\n`{e}`", parse_mode='Markdown')
 
 async def currency_converter_handler(update, context):
     if not EXCHANGERATE_API_KEY or EXCHANGERATE_API_KEY == "API_KEY_ANDA": await update.message.reply_text("Fitur ini belum aktif."); return
@@ -70,35 +85,50 @@ async def currency_converter_handler(update, context):
     amount, from_currency, to_currency = context.args[0], context.args[1].upper(), context.args[2].upper()
     try: amount_float = float(amount)
     except ValueError: await update.message.reply_text("Jumlah harus angka."); return
-    url = f"https://v6.exchangerate-api.com/v6/{EXCHANGERATE_API_KEY}/pair/{from_currency}/{to_currency}/{amount_float}"
     try:
-        data = requests.get(url).json()
-        if data.get('result') == 'success': await update.message.reply_text(f"📊 `{amount_float:,.2f} {from_currency}` = `{data.get('conversion_result'):,.2f} {to_currency}`\n_Rate: 1 {from_currency} = {data.get('conversion_rate')} {to_currency}_", parse_mode='Markdown')
-        else: await update.message.reply_text(f"Error API: {data.get('error-type', 'unknown')}")
+        result, rate = await currency.get_rate_cache().convert(amount_float, from_currency, to_currency)
+        await update.message.reply_text(f"📊 `{amount_float:,.2f} {from_currency}` = `{result:,.2f} {to_currency}`\n_Rate: 1 {from_currency} = {round(rate, 6)} {to_currency}_", parse_mode='Markdown')
+    except currency.ExchangeRateError as e: await update.message.reply_text("Data kurs sudah terlalu lama dan belum bisa diperbarui, coba lagi nanti." if str(e) == 'rates-outdated' else f"Error API: {e}")
     except Exception as e: logger.error(f"Error API mata uang: {e}"); await update.message.reply_text("Gagal menghubungi layanan nilai tukar.")
 
 async def group_message_handler(update, context):
-    if not update.message or update.message.chat.type not in ['group', 'supergroup'] or not get_user_setting(update.message.from_user.id, 'group_reply_enabled'): return
-    text = update.message.text.lower()
-    math_keyword_match = re.search(r'(?:berapa|hitung)\s*(.*?)(?:\?|$)', text)
-    expression = text if re.fullmatch(r'^[\d\s()+\-*/.]+$', text) else (math_keyword_match.group(1) if math_keyword_match else None)
+    message = update.message
+    if not message or not message.text or message.chat.type not in ['group', 'supergroup']: return
+    candidate = classify_group_message(message.text)
+    if candidate is None: return
+    if not get_user_setting(message.from_user.id, 'group_reply_enabled'): message_classifier.record('rejected_disabled'); return
+    expression, currency_args = candidate
     if expression:
-        try: await update.message.reply_text(f"Hasilnya: {ne.evaluate(expression).item()}", reply_to_message_id=update.message.message_id); return
-        except: pass
-    currency_match = re.search(r'(\d+(?:\.\d+)?)\s+([a-zA-Z]{3})\s+(?:to|ke)\s+([a-zA-Z]{3})', text)
-    if currency_match: context.args = currency_match.groups(); await currency_converter_handler(update, context); return
+        try: result = await evaluate_expression_async(expression)
+        except ExpressionError: message_classifier.record('math_failed')
+        else: message_classifier.record('math'); await message.reply_text(f"Hasilnya: {result}", reply_to_message_id=message.message_id); return
+    if currency_args: message_classifier.record('currency'); context.args = currency_args; await currency_converter_handler(update, context); return
 
-async def start_conversion_flow(update, context): query = update.callback_query; await query.answer(); await query.edit_message_text("👋 Halo! Saya XRX BOT...\nKirim file .txt Anda."); return AWAIT_FILE
+async def parse_document_cached(doc, file_path, user_id):
+    """Mem-parsing dokumen (TXT/CSV/VCF/JSONL, juga di dalam .gz/.zip); unggahan ulang file yang sama diambil dari parse cache."""
+    cache = parse_cache.get_cache()
+    result = await run_blocking(cache.get_by_file_id, doc.file_unique_id, formats.PARSE_CACHE_KIND)
+    if result is not None: logger.info(f"Parse cache hit untuk file {doc.file_unique_id}."); return result
+    file = await doc.get_file(); await file.download_to_drive(file_path)
+    content_hash = await run_blocking(hash_file, file_path)
+    result = await run_blocking(cache.get, content_hash, formats.PARSE_CACHE_KIND)
+    if result is not None: await run_blocking(cache.remember_file_id, doc.file_unique_id, content_hash); return result
+    result = await run_blocking(formats.parse_file_smartly, file_path, user_id=user_id, size_bytes=os.path.getsize(file_path))
+    metrics.inc('xrx_contacts_total', len(result['contacts']), op='parse')
+    if result['contacts']: await run_blocking(cache.put, content_hash, formats.PARSE_CACHE_KIND, result, doc.file_unique_id)
+    return result
+
+async def start_conversion_flow(update, context): query = update.callback_query; await query.answer(); await query.edit_message_text("👋 Halo! Saya XRX BOT...\nKirim file .txt Anda (boleh juga .csv/.vcf, atau dikompresi .gz/.zip)."); return AWAIT_FILE
 async def get_file(update, context):
     chat_id = update.effective_chat.id; context.user_data['chat_id'] = chat_id
-    user_dir = str(chat_id); os.makedirs(user_dir, exist_ok=True)
     doc = update.message.document
-    if not doc.file_name.lower().endswith('.txt'): await update.message.reply_text("Format tidak didukung."); return AWAIT_FILE
-    file_path = os.path.join(user_dir, doc.file_name); file = await doc.get_file(); await file.download_to_drive(file_path)
-    result = parse_txt_file_smartly(file_path)
+    if not formats.is_supported(doc.file_name): await update.message.reply_text(f"Format tidak didukung. Kirim {', '.join(formats.readable_extensions())}."); return AWAIT_FILE
+    try: reservation = workspace.get_manager().reserve(doc.file_size)
+    except WorkspaceQuotaError as e: await update.message.reply_text(str(e)); return AWAIT_FILE
+    with reservation: result = await parse_document_cached(doc, os.path.join(flow_workspace(context), doc.file_name), update.effective_user.id)
     if not result['contacts']: await update.message.reply_text("Tidak ada kontak valid."); cleanup(context); return ConversationHandler.END
     context.user_data['contacts'] = result['contacts']
-    report = f"✅ Ditemukan **{len(result['contacts'])}** kontak unik." + (f" ({result['invalid_lines']} baris diabaikan)." if result['invalid_lines'] > 0 else "")
+    report = f"✅ Ditemukan **{len(result['contacts'])}** kontak unik." + (f" ({result['invalid_lines']} baris diabaikan)." if result['invalid_lines'] > 0 else "") + (f" {result['collapsed']} nomor duplikat digabung." if result.get('collapsed') else "")
     await update.message.reply_text(report, parse_mode='Markdown')
     if not result['was_structured']: context.user_data['base_name'] = get_user_setting(chat_id, 'default_base_name'); await update.message.reply_text(f"Akan digunakan nama dasar default: `{context.user_data['base_name']}`. Anda bisa mengubahnya di /settings.\n\nLanjut ke opsi pembagian kontak?", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("Lanjut", callback_data='skip_base_name')]])); return AWAIT_BASE_NAME
     else: context.user_data['base_name'] = ''; await update.message.reply_text("Ingin membagi? Kirim **jumlah per file** atau /skip.", parse_mode='Markdown'); return AWAIT_SPLIT_CHOICE
@@ -111,25 +141,53 @@ async def get_split_choice(update, context):
         except: await update.message.reply_text("Input tidak valid. Opsi split diabaikan.")
     else: await update.message.reply_text("Oke, digabung.")
     context.user_data['split_number'] = split_number
-    await update.message.reply_text("Pilih format output:", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("Export ke VCF", callback_data='export_vcf')], [InlineKeyboardButton("Export ke CSV", callback_data='export_csv')]])); return AWAIT_EXPORT_CHOICE
-async def get_export_choice(update, context): query = update.callback_query; await query.answer(); context.user_data['export_format'] = "vcf" if query.data == 'export_vcf' else "csv"; await query.edit_message_text(f"Format .{context.user_data['export_format']} dipilih. Masukkan nama file atau /skip."); return AWAIT_FILENAME
+    keyboard = [[InlineKeyboardButton(f"Export ke {fmt.label}", callback_data=f'export_{fmt.name}')] for fmt in formats.FORMATS.values() if fmt.writer]
+    await update.message.reply_text("Pilih format output:", reply_markup=InlineKeyboardMarkup(keyboard)); return AWAIT_EXPORT_CHOICE
+async def get_export_choice(update, context):
+    query = update.callback_query; await query.answer(); fmt = formats.get_format(query.data.removeprefix('export_'))
+    context.user_data['export_format'] = fmt.name; await query.edit_message_text(f"Format {fmt.label} (.{fmt.extension}) dipilih. Masukkan nama file atau /skip."); return AWAIT_FILENAME
 async def get_filename_and_process(update, context):
     filename = "hasil_kontak"
     if update.message.text and not update.message.text.startswith('/'): filename = "".join(c for c in update.message.text if c.isalnum() or c in ('_', '-')).strip()
-    chat_id = context.user_data['chat_id']; await update.message.reply_text("⏳ Memproses file...")
-    try:
-        output_files, count = write_contact_files(contacts=context.user_data['contacts'], output_dir=str(chat_id), base_name=context.user_data.get('base_name', ''), contacts_per_file=context.user_data.get('split_number'), custom_filename=filename, export_format=context.user_data['export_format'])
-        if count > 0:
-            caption = f"✅ Berhasil! {count} kontak diproses."
-            if len(output_files) > 1: await context.bot.send_message(chat_id, f"{caption} Mengirim {len(output_files)} file...")
-            for file_path in output_files:
-                with open(file_path, 'rb') as doc_file: await context.bot.send_document(chat_id=chat_id, document=doc_file, caption=(caption if len(output_files) == 1 else None))
-        else: await context.bot.send_message(chat_id, "Gagal, tidak ada kontak valid.")
-    except Exception as e: logger.error(f"Error proses akhir: {e}"); await context.bot.send_message(chat_id, f"Gagal membuat file. Error: {e}")
-    finally:
-        await context.bot.send_message(chat_id, "Operasi selesai.", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Kembali ke Menu Utama", callback_data='back_to_main')]])); cleanup(context)
+    chat_id, user_id, contacts = context.user_data['chat_id'], update.effective_user.id, context.user_data['contacts']
+    workspace_path = context.user_data['workspace']
+    export_format, render_kwargs = context.user_data['export_format'], dict(spool_dir=workspace_path, base_name=context.user_data.get('base_name', ''), contacts_per_file=context.user_data.get('split_number'))
+    status = await update.message.reply_text("⏳ Memproses file...")
+
+    async def process(job):
+        try:
+            with workspace.get_manager().reserve(len(contacts) * WORKSPACE_OUTPUT_BYTES_PER_CONTACT):
+                parts, count = await run_blocking(formats.render, contacts, export_format, filename, control=job.control, user_id=user_id, item_count=len(contacts), **render_kwargs)
+            metrics.inc('xrx_contacts_total', count, op='write', format=export_format)
+            if count > 0:
+                caption = f"✅ Berhasil! {count} kontak diproses."
+                if OUTPUT_ZIP_MIN_PARTS and len(parts) >= OUTPUT_ZIP_MIN_PARTS: parts = [await run_blocking(bundle_zip, parts, f"{filename}.zip", spool_dir=workspace_path, user_id=user_id)]
+                if len(parts) > 1: await context.bot.send_message(chat_id, f"{caption} Mengirim {len(parts)} file...")
+                for part in parts:
+                    job.control.check()
+                    with part.open() as doc_file: await context.bot.send_document(chat_id=chat_id, document=doc_file, filename=part.filename, caption=(caption if len(parts) == 1 else None))
+            else: await context.bot.send_message(chat_id, "Gagal, tidak ada kontak valid.")
+        except JobCancelled: raise
+        except Exception as e: logger.error(f"Error proses akhir: {e}"); await context.bot.send_message(chat_id, f"Gagal membuat file. Error: {e}")
+        finally: cleanup(context, workspace_path)
+        # Tidak dikirim saat dibatalkan: JobCancelled dilempar ulang di atas dan status job sudah memberi tahu.
+        await context.bot.send_message(chat_id, "Operasi selesai.", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Kembali ke Menu Utama", callback_data='back_to_main')]]))
+
+    await jobs.get_manager().submit('convert', chat_id, user_id, process, status, item_count=len(contacts), on_cancel=lambda job: cleanup(context, workspace_path))
     return ConversationHandler.END
-async def cancel(update, context): await (update.callback_query or update).message.reply_text("Dibatalkan."); cleanup(context); await start(update, context); return ConversationHandler.END
+async def stats_command(update, context):
+    if not OWNER_ID or update.effective_user.id != OWNER_ID: return
+    await update.message.reply_text(f"📈 **Statistik XRX BOT**\n```\n{metrics.summary()[:3900]}\n```", parse_mode='Markdown')
+async def touch_workspace(update, context):
+    """Setiap update pengguna memperpanjang umur workspace alurnya agar tidak disapu janitor di tengah alur."""
+    if context.user_data: workspace.get_manager().touch(context.user_data.get('workspace'))
+async def cancel_job(update, context):
+    query = update.callback_query
+    try: job_id = int(query.data.split(':', 1)[1])
+    except ValueError: await query.answer("Pekerjaan tidak ditemukan.", show_alert=True); return
+    if jobs.get_manager().cancel(job_id=job_id): await query.answer("Membatalkan...")
+    else: await query.answer("Pekerjaan sudah selesai.", show_alert=True)
+async def cancel(update, context): jobs.get_manager().cancel(chat_id=update.effective_chat.id); await (update.callback_query or update).message.reply_text("Dibatalkan."); cleanup(context); await start(update, context); return ConversationHandler.END
 async def settings_menu(update, context):
     query = update.callback_query or update
     user_id = update.effective_user.id
@@ -148,6 +206,52 @@ async def set_new_default_name(update, context):
     await start(FakeUpdate(update), context)
     return ConversationHandler.END
 async def toggle_group_reply(update, context):
-    query = update.callback_query; user_id = update.effective_user.id; await query.answer()
+    user_id = update.effective_user.id
     new_status = 0 if get_user_setting(user_id, 'group_reply_enabled') else 1
-    set_user_setting(user_id, 'group_reply_enabled', new_status); await settings_menu(query, context)
\ No newline at end of file
+    set_user_setting(user_id, 'group_reply_enabled', new_status); await settings_menu(update, context)
+
+def register_handlers(application):
+    """Mendaftarkan semua handler: alur konversi, alur gabung file (bot_handlers), pengaturan, kalkulator, dan grup."""
+    # Alur dilacak per chat/pengguna (bukan per pesan); tombol dari pesan lama memang boleh memicu state saat ini.
+    # Filter hanya berlaku selama konstruksi di bawah, bukan untuk seluruh proses.
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="If 'per_message=False'", category=PTBUserWarning)
+        text_or_skip = (filters.TEXT & ~filters.COMMAND) | filters.Regex(r'^/skip$')
+        cancel_fallbacks = [CommandHandler('cancel', cancel)]
+        convert_conv = ConversationHandler(
+            entry_points=[CallbackQueryHandler(start_conversion_flow, pattern='^start_convert$')],
+            states={
+                AWAIT_FILE: [MessageHandler(filters.Document.ALL, get_file)],
+                AWAIT_BASE_NAME: [CallbackQueryHandler(skip_base_name, pattern='^skip_base_name$'), MessageHandler(filters.TEXT & ~filters.COMMAND, get_base_name)],
+                AWAIT_SPLIT_CHOICE: [MessageHandler(text_or_skip, get_split_choice)],
+                AWAIT_EXPORT_CHOICE: [CallbackQueryHandler(get_export_choice, pattern='^export_')],
+                AWAIT_FILENAME: [MessageHandler(text_or_skip, get_filename_and_process)],
+            },
+            fallbacks=cancel_fallbacks, name='convert', persistent=True)
+        merge_conv = ConversationHandler(
+            entry_points=[CallbackQueryHandler(bot_handlers.start_merge_flow, pattern='^start_merge$')],
+            states={
+                bot_handlers.AWAIT_FIRST_FILE: [MessageHandler(filters.Document.ALL, bot_handlers.get_first_file)],
+                bot_handlers.AWAIT_SECOND_FILE: [MessageHandler(filters.Document.ALL, bot_handlers.get_second_file), CallbackQueryHandler(bot_handlers.finish_merge_files, pattern='^merge_done$')],
+                bot_handlers.AWAIT_MERGE_OPTIONS: [CallbackQueryHandler(bot_handlers.handle_merge_options, pattern='^dedup_', block=False)],
+                bot_handlers.AWAIT_VCF_EXPORT_OPTIONS: [CallbackQueryHandler(bot_handlers.handle_export_choice, pattern='^export_'), CallbackQueryHandler(bot_handlers.handle_csv_format_choice, pattern='^csv_')],
+                bot_handlers.AWAIT_FILENAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, bot_handlers.get_filename_and_process)],
+            },
+            fallbacks=cancel_fallbacks, name='merge', persistent=True)
+        settings_conv = ConversationHandler(
+            entry_points=[CallbackQueryHandler(prompt_set_default_name, pattern='^set_default_name$')],
+            states={AWAIT_NEW_DEFAULT_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, set_new_default_name)]},
+            fallbacks=cancel_fallbacks, name='settings', persistent=True)
+    application.add_handler(TypeHandler(Update, touch_workspace), group=-1)
+    application.add_handlers([convert_conv, merge_conv, settings_conv])
+    application.add_handlers([
+        CommandHandler('start', start), CommandHandler('settings', settings_menu),
+        CommandHandler('calc', calculator_handler), CommandHandler('kurs', currency_converter_handler), CommandHandler('stats', stats_command),
+        CallbackQueryHandler(start, pattern='^back_to_main$'), CallbackQueryHandler(show_guide, pattern='^show_guide$'),
+        CallbackQueryHandler(show_owner, pattern='^show_owner$'), CallbackQueryHandler(show_calculator_menu, pattern='^calculator_menu$'),
+        CallbackQueryHandler(show_calc_guide, pattern='^show_calc_guide$'), CallbackQueryHandler(show_currency_guide, pattern='^show_currency_guide$'),
+        CallbackQueryHandler(settings_menu, pattern='^settings_menu$'), CallbackQueryHandler(toggle_group_reply, pattern='^toggle_group_reply$'),
+        CallbackQueryHandler(cancel_job, pattern='^cancel_job:'),
+        MessageHandler(filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS, group_message_handler),
+    ])
+    metrics.instrument_handlers(application)
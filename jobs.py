@@ -0,0 +1,216 @@
+# jobs.py
+
+import time
+import asyncio
+import logging
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
+
+import config
+import metrics
+from workers import use_process_pool
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Dilempar di dalam pekerjaan yang dibatalkan pengguna."""
+
+_mp_manager = None
+
+def _get_mp_manager():
+    global _mp_manager
+    if _mp_manager is None: _mp_manager = multiprocessing.get_context('spawn').Manager()
+    return _mp_manager
+
+class _LocalValue:
+    __slots__ = ('value',)
+    def __init__(self): self.value = 0.0
+
+class JobControl:
+    """Saluran progres & pembatalan yang dioper ke fungsi inti (parser/penulis/merge).
+
+    Fungsi inti memanggil `update(selesai, total)` secara berkala; pemanggilan itu melempar
+    JobCancelled jika pekerjaan dibatalkan. Dengan `shared=True` nilainya disimpan di proses
+    Manager agar tetap berfungsi dari process pool.
+    """
+
+    def __init__(self, shared=False):
+        if shared:
+            manager = _get_mp_manager()
+            self._cancel, self._progress = manager.Event(), manager.Value('d', 0.0)
+        else: self._cancel, self._progress = threading.Event(), _LocalValue()
+
+    def cancel(self): self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool: return self._cancel.is_set()
+
+    @property
+    def progress(self) -> float: return self._progress.value
+
+    def check(self):
+        if self._cancel.is_set(): raise JobCancelled()
+
+    def update(self, done, total=None):
+        self.check()
+        if total: self._progress.value = min(done / total, 1.0)
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, chat_id, user_id, body, status_message, label, control, on_cancel=None):
+        self.id = next(Job._ids)
+        self.kind, self.chat_id, self.user_id = kind, chat_id, user_id
+        self.body, self.status_message, self.label, self.control = body, status_message, label, control
+        self.on_cancel = on_cancel
+        self.status = 'queued'
+        self.error = self.result = None
+        self.finished = asyncio.Event()
+        self.queued_at, self.started_at, self.finished_at = time.monotonic(), None, None
+
+    @property
+    def cancel_markup(self):
+        return InlineKeyboardMarkup([[InlineKeyboardButton("❌ Batalkan", callback_data=f'cancel_job:{self.id}')]])
+
+    def timings(self) -> dict:
+        now = time.monotonic()
+        return {
+            'id': self.id, 'kind': self.kind, 'status': self.status,
+            'wait_seconds': round((self.started_at or self.finished_at or now) - self.queued_at, 3),
+            'run_seconds': round((self.finished_at or now) - self.started_at, 3) if self.started_at else 0.0,
+        }
+
+class JobManager:
+    """Antrean pekerjaan konversi/merge yang berjalan di latar belakang dengan progres di satu pesan status."""
+
+    def __init__(self, max_concurrent=None, progress_interval=None, history_size=100):
+        self.max_concurrent = max_concurrent or config.JOB_MAX_CONCURRENT
+        self.progress_interval = progress_interval or config.JOB_PROGRESS_INTERVAL
+        self._queue = None
+        self._runners = []
+        self._jobs = {}
+        self.history = deque(maxlen=history_size)
+
+    def _ensure_runners(self):
+        if self._queue is None: self._queue = asyncio.Queue()
+        self._runners = [task for task in self._runners if not task.done()]
+        while len(self._runners) < self.max_concurrent:
+            self._runners.append(asyncio.create_task(self._run_forever()))
+
+    async def submit(self, kind, chat_id, user_id, body, status_message, label="Memproses file", size_bytes=0, item_count=0, on_cancel=None) -> Job:
+        """Mengantrekan `body(job)` (coroutine) dan langsung kembali.
+
+        `status_message` adalah pesan yang akan diedit dengan persentase progres. Ukuran input dipakai
+        untuk memilih JobControl lokal atau lintas proses (lihat workers.use_process_pool); pemanggil wajib
+        memberi `size_bytes`/`item_count` yang sama ke run_blocking agar pool dan JobControl cocok.
+        `job.finished` diset setelah job selesai, gagal, atau dibatalkan; nilai kembali body ada di `job.result`.
+        Job yang dibatalkan selagi antre tidak pernah menjalankan body (beserta `finally`-nya); `on_cancel(job)`
+        (fungsi biasa) dipanggil sebagai gantinya untuk membereskan workspace dan sejenisnya.
+        """
+        control = JobControl(shared=use_process_pool(size_bytes, item_count))
+        job = Job(kind, chat_id, user_id, body, status_message, label, control, on_cancel)
+        self._jobs[job.id] = job
+        self._ensure_runners()
+        await self._queue.put(job)
+        await self._edit_status(job, f"⏳ {label}... (antrean ke-{self._queue.qsize()})")
+        return job
+
+    def cancel(self, job_id=None, chat_id=None) -> int:
+        """Membatalkan pekerjaan berdasarkan id atau semua pekerjaan milik satu chat."""
+        cancelled = 0
+        for job in list(self._jobs.values()):
+            if (job_id is not None and job.id == job_id) or (chat_id is not None and job.chat_id == chat_id):
+                job.control.cancel(); cancelled += 1
+        return cancelled
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def snapshot(self) -> dict:
+        return {
+            'depth': self.depth,
+            'active': [job.timings() for job in self._jobs.values()],
+            'recent': [job.timings() for job in self.history],
+        }
+
+    async def _edit_status(self, job, text, with_cancel=True):
+        try: await job.status_message.edit_text(text, reply_markup=job.cancel_markup if with_cancel else None)
+        except TelegramError as e: logger.debug(f"Gagal memperbarui status job {job.id}: {e}")
+
+    async def _report_progress(self, job):
+        last_percent = None
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            percent = int(job.control.progress * 100)
+            if percent != last_percent:
+                last_percent = percent
+                await self._edit_status(job, f"⏳ {job.label}... {percent}%")
+
+    async def _run_forever(self):
+        while True:
+            job = await self._queue.get()
+            try: await self._run(job)
+            finally: self._queue.task_done()
+
+    async def _run(self, job):
+        if job.control.cancelled:
+            job.status = 'cancelled'
+            if job.on_cancel:
+                try: job.on_cancel(job)
+                except Exception as e: logger.error(f"Pembersihan job {job.id} ({job.kind}) yang batal gagal: {e}")
+        else:
+            job.status, job.started_at = 'running', time.monotonic()
+            await self._edit_status(job, f"⏳ {job.label}... 0%")
+            reporter = asyncio.create_task(self._report_progress(job))
+            try:
+                job.result = await job.body(job)
+                job.status = 'done'
+            except JobCancelled:
+                job.status = 'cancelled'
+            except Exception as e:
+                job.status, job.error = 'failed', str(e)
+                logger.error(f"Job {job.id} ({job.kind}) gagal: {e}")
+            finally:
+                reporter.cancel()
+        job.finished_at = time.monotonic()
+        timings = job.timings()
+        metrics.observe('xrx_job_wait_seconds', timings['wait_seconds'], kind=job.kind)
+        if job.started_at: metrics.observe('xrx_job_seconds', timings['run_seconds'], kind=job.kind, status=job.status)
+        if job.status == 'cancelled': await self._edit_status(job, f"🛑 {job.label} dibatalkan.", with_cancel=False)
+        elif job.status == 'done': await self._edit_status(job, f"✅ {job.label} selesai.", with_cancel=False)
+        elif job.status == 'failed': await self._edit_status(job, f"❌ {job.label} gagal.", with_cancel=False)
+        self._jobs.pop(job.id, None)
+        self.history.append(job)
+        job.finished.set()
+
+    async def drain(self, timeout=None) -> bool:
+        """Menunggu semua job yang antre/berjalan selesai; False jika `timeout` habis lebih dulu."""
+        if self._queue is None: return True
+        try: await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError: return False
+        return True
+
+    async def shutdown(self):
+        for task in self._runners: task.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+
+_default_manager = None
+
+def get_manager() -> JobManager:
+    global _default_manager
+    if _default_manager is None: _default_manager = JobManager()
+    return _default_manager
+
+metrics.register_gauge('xrx_jobs_queued', lambda: get_manager().depth, "Job menunggu giliran")
+metrics.register_gauge('xrx_jobs_active', lambda: len(get_manager().snapshot()['active']), "Job berjalan/terdaftar")
+
+async def shutdown():
+    global _default_manager, _mp_manager
+    if _default_manager is not None: await _default_manager.shutdown(); _default_manager = None
+    if _mp_manager is not None: _mp_manager.shutdown(); _mp_manager = None
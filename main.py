@@ -1,11 +1,20 @@
 # main.py
 import logging
-from telegram.ext import Application, PicklePersistence
+from telegram.ext import Application
 
 # Impor dari file-file lokal
 import config
+import currency
 import database
+import jobs
+import metrics
+import webhook_server
+import workers
+import workspace
+from flood_limiter import FloodLimiter
 from handlers import register_handlers
+from sqlite_persistence import SQLitePersistence
+from update_processor import ChatOrderedUpdateProcessor
 
 # Konfigurasi logging ke file dan konsol
 logging.basicConfig(
@@ -18,23 +27,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def post_init(application: Application) -> None:
+    """Memulai tugas latar belakang yang butuh event loop berjalan."""
+    workspace.start_janitor()
+    await metrics.start()
+
+async def post_shutdown(application: Application) -> None:
+    """Membersihkan sumber daya bersama saat bot berhenti."""
+    await metrics.shutdown()
+    await jobs.shutdown()
+    await workspace.shutdown()
+    workers.shutdown()
+    await currency.shutdown()
+    database.close_database()
+
 def main() -> None:
     """Menjalankan XRX BOT dengan arsitektur profesional."""
     
     # Persiapan Awal
     logger.info("Memulai bot...")
     database.setup_database()
-    persistence = PicklePersistence(filepath=config.PERSISTENCE_FILE)
+    persistence = SQLitePersistence(filepath=config.PERSISTENCE_FILE)
 
     # Membangun Aplikasi
-    application = Application.builder().token(config.TELEGRAM_TOKEN).persistence(persistence).build()
+    application = Application.builder().token(config.TELEGRAM_TOKEN).persistence(persistence).concurrent_updates(ChatOrderedUpdateProcessor()).rate_limiter(FloodLimiter()).post_init(post_init).post_shutdown(post_shutdown).build()
 
     # Mendaftarkan semua handler dari file handlers.py
     register_handlers(application)
     
     # Menjalankan bot
-    logger.info("XRX BOT (Versi Profesional) siap beroperasi.")
-    application.run_polling()
+    logger.info(f"XRX BOT (Versi Profesional) siap beroperasi (mode {config.RUN_MODE}).")
+    if config.RUN_MODE == 'webhook': webhook_server.run(application)
+    else: application.run_polling()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,46 @@
+# message_classifier.py
+
+import re
+from collections import Counter
+
+import metrics
+
+# Pola dikompilasi sekali saat impor.
+DIGIT_PATTERN = re.compile(r'\d')
+MATH_ONLY_PATTERN = re.compile(r'[\d\s()+\-*/.]+')
+MATH_KEYWORD_PATTERN = re.compile(r'(?:berapa|hitung)\s*(.*?)(?:\?|$)')
+CURRENCY_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s+([a-zA-Z]{3})\s+(?:to|ke)\s+([a-zA-Z]{3})')
+
+# Jumlah pesan per tahap: 'seen', 'rejected_no_digit', 'rejected_no_pattern',
+# 'rejected_disabled', 'math', 'math_failed', 'currency'. Juga diekspor sebagai xrx_group_messages_total{stage}.
+stats = Counter()
+
+def record(stage: str):
+    stats[stage] += 1
+    metrics.inc('xrx_group_messages_total', stage=stage)
+
+def get_stats() -> dict:
+    return dict(stats)
+
+def classify_group_message(text: str):
+    """Menyaring pesan grup secara bertahap tanpa menyentuh database.
+
+    Mengembalikan None untuk obrolan biasa, atau (ekspresi, argumen_kurs) di mana salah satunya
+    boleh None. Ekspresi dicoba lebih dulu; jika gagal dievaluasi, argumen kurs dipakai.
+    """
+    record('seen')
+    # Tahap 1: tanpa angka tidak mungkin ada hitungan maupun kurs.
+    if not DIGIT_PATTERN.search(text):
+        record('rejected_no_digit')
+        return None
+    # Tahap 2: pola matematika/kurs yang sudah dikompilasi.
+    text = text.lower()
+    if MATH_ONLY_PATTERN.fullmatch(text): expression = text
+    else:
+        keyword_match = MATH_KEYWORD_PATTERN.search(text) if ('berapa' in text or 'hitung' in text) else None
+        expression = keyword_match.group(1) if keyword_match and keyword_match.group(1) else None
+    currency_match = CURRENCY_PATTERN.search(text) if ('ke' in text or 'to' in text) else None
+    if expression is None and currency_match is None:
+        record('rejected_no_pattern')
+        return None
+    return expression, (currency_match.groups() if currency_match else None)
@@ -0,0 +1,282 @@
+# metrics.py
+
+import time
+import bisect
+import asyncio
+import logging
+import functools
+import threading
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Batas atas bucket histogram (detik), mengikuti konvensi `le` Prometheus.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HELP = {
+    'xrx_handler_seconds': "Latensi handler Telegram",
+    'xrx_handler_errors_total': "Handler yang berakhir dengan exception",
+    'xrx_work_seconds': "Durasi pekerjaan berat (parse/tulis/merge) di pool pekerja",
+    'xrx_work_wait_seconds': "Waktu tunggu slot pekerja per pengguna",
+    'xrx_contacts_total': "Kontak yang diproses",
+    'xrx_job_seconds': "Durasi job latar belakang",
+    'xrx_job_wait_seconds': "Waktu antre job latar belakang",
+    'xrx_db_seconds': "Durasi panggilan SQLite pengaturan pengguna",
+    'xrx_db_cache_total': "Pembacaan pengaturan dari cache LRU",
+    'xrx_currency_upstream_seconds': "Latensi exchangerate-api",
+    'xrx_currency_upstream_errors_total': "Permintaan exchangerate-api yang gagal",
+    'xrx_currency_cache_total': "Pembacaan tabel kurs dari cache",
+    'xrx_outbound_wait_seconds': "Waktu tunggu pesan keluar di FloodLimiter",
+    'xrx_outbound_retries_total': "Pengulangan karena RetryAfter",
+    'xrx_event_loop_lag_seconds': "Keterlambatan bangun event loop",
+    'xrx_update_wait_seconds': "Waktu tunggu slot pemrosesan update",
+    'xrx_webhook_requests_total': "Permintaan webhook per status HTTP",
+    'xrx_group_messages_total': "Pesan grup per tahap penyaringan kalkulator/kurs",
+}
+
+class Histogram:
+    """Histogram bucket tetap; kuantil diperkirakan dengan interpolasi linear di dalam bucket."""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count, self.sum, self.max = 0, 0.0, 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max: self.max = value
+
+    def quantile(self, q) -> float:
+        if not self.count: return 0.0
+        rank, seen = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+class Registry:
+    """Counter & histogram berlabel (aman dari banyak thread) serta gauge yang dihitung saat dibaca."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}    # (nama, label) -> nilai
+        self.histograms = {}  # (nama, label) -> Histogram
+        self.gauges = {}      # nama -> (fungsi tanpa argumen, keterangan)
+        self.started_at = time.time()
+
+    def inc(self, name, value, labels):
+        key = (name, labels)
+        with self._lock: self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None: histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge_values(self) -> dict:
+        values = {}
+        for name, (func, _) in list(self.gauges.items()):
+            try: values[name] = float(func())
+            except Exception as e: logger.debug(f"Gauge {name} gagal dibaca: {e}")
+        return values
+
+    def reset(self):
+        with self._lock: self.counters.clear(); self.histograms.clear()
+        self.started_at = time.time()
+
+registry = Registry()
+
+def _labels(labels) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def inc(name, value=1, **labels):
+    if config.METRICS_ENABLED: registry.inc(name, value, _labels(labels))
+
+def observe(name, seconds, **labels):
+    if config.METRICS_ENABLED: registry.observe(name, seconds, _labels(labels))
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'started')
+
+    def __init__(self, name, labels): self.name, self.labels = name, labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe(self.name, time.perf_counter() - self.started, self.labels)
+
+class _NullTimer:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): pass
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name, **labels):
+    """Context manager yang mencatat durasi blok ke histogram `name` (no-op jika metrik nonaktif)."""
+    return _Timer(name, _labels(labels)) if config.METRICS_ENABLED else _NULL_TIMER
+
+def register_gauge(name, func, help_text=''):
+    """Gauge dihitung dari `func()` hanya saat /stats atau endpoint Prometheus dibaca."""
+    registry.gauges[name] = (func, help_text)
+
+# --- Instrumentasi handler ---
+
+def instrument(callback, name=None):
+    """Membungkus callback handler async agar latensi dan exception-nya tercatat."""
+    name = name or f"{callback.__module__}.{callback.__qualname__}"
+    labels = _labels({'handler': name})
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try: return await callback(update, context)
+        except Exception:
+            registry.inc('xrx_handler_errors_total', 1, labels)
+            raise
+        finally: registry.observe('xrx_handler_seconds', time.perf_counter() - started, labels)
+
+    wrapper._xrx_instrumented = True
+    return wrapper
+
+def instrument_handlers(application):
+    """Membungkus semua handler terdaftar (termasuk isi ConversationHandler); tidak melakukan apa pun jika nonaktif."""
+    if not config.METRICS_ENABLED: return
+    from telegram.ext import ConversationHandler
+    stack = [handler for handlers in application.handlers.values() for handler in handlers]
+    while stack:
+        handler = stack.pop()
+        if isinstance(handler, ConversationHandler):
+            stack.extend(handler.entry_points + handler.fallbacks)
+            for handlers in handler.states.values(): stack.extend(handlers)
+        elif not getattr(handler.callback, '_xrx_instrumented', False):
+            handler.callback = instrument(handler.callback)
+
+# --- Lag event loop & endpoint Prometheus ---
+
+async def _probe_loop_lag(interval):
+    loop = asyncio.get_running_loop()
+    labels = _labels({})
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        registry.observe('xrx_event_loop_lag_seconds', max(0.0, loop.time() - started - interval), labels)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()) -> str:
+    pairs = [f'{key}="{_escape(value)}"' for key, value in (*labels, *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def render_prometheus() -> str:
+    """Seluruh metrik dalam format teks eksposisi Prometheus 0.0.4."""
+    lines, seen = [], set()
+    def header(name, kind, help_text=None):
+        if name in seen: return
+        seen.add(name)
+        lines.append(f"# HELP {name} {help_text or HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} {kind}")
+    with registry._lock:
+        counters = sorted(registry.counters.items())
+        histograms = sorted((key, (list(h.counts), h.count, h.sum)) for key, h in registry.histograms.items())
+    for (name, labels), value in counters:
+        header(name, 'counter')
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), (counts, count, total) in histograms:
+        header(name, 'histogram')
+        cumulative = 0
+        for bound, bucket_count in zip((*DEFAULT_BUCKETS, '+Inf'), counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    for name, value in sorted(registry.gauge_values().items()):
+        header(name, 'gauge', registry.gauges[name][1])
+        lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+async def _serve_prometheus(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''): pass
+        parts = request_line.split()
+        if len(parts) > 1 and parts[1].split(b'?')[0] == b'/metrics': status, body = '200 OK', render_prometheus().encode()
+        else: status, body = '404 Not Found', b'not found\n'
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError): pass
+    finally: writer.close()
+
+_tasks = []
+_server = None
+
+async def start():
+    """Memulai probe lag event loop dan (jika METRICS_PORT diisi) endpoint Prometheus; dipanggil dari post_init."""
+    global _server
+    if not config.METRICS_ENABLED: return
+    _tasks.append(asyncio.create_task(_probe_loop_lag(config.METRICS_LOOP_LAG_INTERVAL)))
+    if config.METRICS_PORT:
+        _server = await asyncio.start_server(_serve_prometheus, config.METRICS_HOST, config.METRICS_PORT)
+        logger.info(f"Endpoint metrik Prometheus di http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+
+async def shutdown():
+    global _server
+    for task in _tasks: task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    if _server is not None:
+        _server.close(); await _server.wait_closed(); _server = None
+
+# --- Ringkasan untuk /stats ---
+
+def _ms(seconds) -> str:
+    return f"{seconds * 1000:.0f}ms" if seconds < 10 else f"{seconds:.0f}s"
+
+def _label_text(labels) -> str:
+    return ','.join(value for _, value in labels) or '-'
+
+def _hit_ratio(counters, name) -> str:
+    totals = {}
+    for (counter, labels), value in counters.items():
+        if counter == name: totals[dict(labels).get('result')] = totals.get(dict(labels).get('result'), 0) + value
+    total = sum(totals.values())
+    # 'stale' tetap dilayani dari cache (diperbarui di latar belakang), jadi hanya 'miss' yang dihitung gagal.
+    return f"{1 - totals.get('miss', 0) / total:.0%} dari {total:.0f}" if total else "-"
+
+def summary(max_rows=8) -> str:
+    """Ringkasan teks ringkas (muat dalam satu pesan Telegram) untuk perintah /stats."""
+    uptime = int(time.time() - registry.started_at)
+    lines = [f"Uptime metrik: {uptime // 3600}j {uptime % 3600 // 60}m" + ("" if config.METRICS_ENABLED else " (METRICS_ENABLED=0)")]
+    with registry._lock:
+        families = {}
+        for (name, labels), histogram in registry.histograms.items(): families.setdefault(name, []).append((labels, histogram))
+        counters = dict(registry.counters)
+    for name in sorted(families):
+        rows = sorted(families[name], key=lambda row: row[1].count, reverse=True)
+        lines.append(f"\n{HELP.get(name, name)} (n p50 p99 maks):")
+        for labels, h in rows[:max_rows]:
+            lines.append(f"  {_label_text(labels)[:34]:<34} {h.count:>6} {_ms(h.quantile(0.5)):>6} {_ms(h.quantile(0.99)):>6} {_ms(h.max):>6}")
+    counter_rows = [(name, labels, value) for (name, labels), value in sorted(counters.items()) if not name.endswith('_cache_total')]
+    if counter_rows:
+        lines.append("\nPenghitung:")
+        for name, labels, value in counter_rows[:max_rows * 2]: lines.append(f"  {name.removeprefix('xrx_')}[{_label_text(labels)}] {value:.0f}")
+    lines.append(f"\nCache pengaturan: {_hit_ratio(counters, 'xrx_db_cache_total')}, cache kurs: {_hit_ratio(counters, 'xrx_currency_cache_total')}")
+    gauges = registry.gauge_values()
+    if gauges:
+        lines.append("\nSaat ini:")
+        for name, value in sorted(gauges.items()): lines.append(f"  {registry.gauges[name][1] or name}: {value:,.0f}")
+    return '\n'.join(lines)
@@ -0,0 +1,100 @@
+# output_parts.py
+
+import io
+import os
+import zipfile
+import tempfile
+
+import config
+
+class OutputPart:
+    """Satu file hasil ekspor: disimpan di memori (`data`) atau di file spool di disk (`path`)."""
+    __slots__ = ('filename', 'data', 'path', 'size')
+
+    def __init__(self, filename, data=None, path=None, size=0):
+        self.filename, self.data, self.path, self.size = filename, data, path, size
+
+    def open(self):
+        """Membuka isi part sebagai file biner (siap untuk send_document)."""
+        return io.BytesIO(self.data) if self.data is not None else open(self.path, 'rb')
+
+    def save(self, output_path):
+        """Memindahkan/menulis isi part ke `output_path`."""
+        if self.data is not None:
+            with open(output_path, 'wb') as f: f.write(self.data)
+        else: os.replace(self.path, output_path)
+        self.data, self.path = None, output_path
+        return output_path
+
+    def discard(self):
+        if self.path and os.path.exists(self.path): os.remove(self.path)
+        self.data = self.path = None
+
+class SpoolBudget:
+    """Jumlah byte hasil yang boleh ditahan di memori, dibagi oleh semua part dalam satu render().
+
+    Tanpa batas bersama, ekspor yang dipecah menjadi ribuan part masing-masing di bawah ambang spool
+    tetap menahan seluruh hasil di RAM (dan ikut di-pickle balik dari process pool).
+    """
+    __slots__ = ('remaining',)
+
+    def __init__(self, limit=None):
+        self.remaining = limit if limit is not None else config.OUTPUT_SPOOL_THRESHOLD_BYTES
+
+class PartWriter:
+    """Objek mirip file teks yang mengumpulkan tulisan dalam batch lalu menggabungkannya sekaligus.
+
+    Isi tetap di memori selama `budget` (SpoolBudget, default sebesar `spool_threshold` byte) masih
+    cukup; setelah itu dialihkan ke file sementara di `spool_dir` dan byte-nya dikembalikan ke budget.
+    Bisa dipakai langsung sebagai target `csv.writer`.
+    """
+
+    def __init__(self, filename, spool_dir=None, spool_threshold=None, batch_size=2048, budget=None):
+        self.filename = filename
+        self.spool_dir = spool_dir
+        self.budget = budget if budget is not None else SpoolBudget(spool_threshold)
+        self.batch_size = batch_size
+        self._batch, self._chunks, self._size = [], [], 0
+        self._file, self._path = None, None
+
+    def write(self, text):
+        self._batch.append(text)
+        if len(self._batch) >= self.batch_size: self._flush()
+
+    def _flush(self):
+        if not self._batch: return
+        data = ''.join(self._batch).encode('utf-8')
+        self._batch.clear()
+        self._size += len(data)
+        if self._file is not None: self._file.write(data); return
+        self._chunks.append(data)
+        self.budget.remaining -= len(data)
+        if self.budget.remaining < 0:
+            fd, self._path = tempfile.mkstemp(suffix='.part', dir=self.spool_dir)
+            self._file = os.fdopen(fd, 'wb')
+            self._file.writelines(self._chunks)
+            self._chunks.clear()
+            self.budget.remaining += self._size
+
+    def close(self) -> OutputPart:
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+            return OutputPart(self.filename, path=self._path, size=self._size)
+        return OutputPart(self.filename, data=b''.join(self._chunks), size=self._size)
+
+def bundle_zip(parts, archive_name, spool_dir=None, spool_threshold=None) -> OutputPart:
+    """Menggabungkan beberapa part menjadi satu arsip ZIP; part asal dibuang setelah masuk arsip."""
+    spool_threshold = spool_threshold if spool_threshold is not None else config.OUTPUT_SPOOL_THRESHOLD_BYTES
+    if sum(part.size for part in parts) > spool_threshold:
+        fd, path = tempfile.mkstemp(suffix='.zip', dir=spool_dir)
+        target = os.fdopen(fd, 'wb')
+    else: path, target = None, io.BytesIO()
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for part in parts:
+            if part.data is not None: archive.writestr(part.filename, part.data)
+            else: archive.write(part.path, arcname=part.filename)
+            part.discard()
+    if path is None: return OutputPart(archive_name, data=target.getvalue(), size=len(target.getbuffer()))
+    target.close()
+    return OutputPart(archive_name, path=path, size=os.path.getsize(path))
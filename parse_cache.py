@@ -0,0 +1,130 @@
+# parse_cache.py
+
+import os
+import json
+import time
+import zlib
+import pickle
+import hashlib
+import logging
+import threading
+
+import config
+from contact import Contact, CONTACT_ATTRS
+
+logger = logging.getLogger(__name__)
+
+def hash_file(file_path, chunk_size=1 << 20) -> str:
+    """SHA-256 isi file, dibaca per potongan."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''): digest.update(chunk)
+    return digest.hexdigest()
+
+def _pack(result: dict) -> bytes:
+    """Menyimpan kontak per kolom (hanya kolom yang terisi) lalu dikompres."""
+    contacts = result['contacts']
+    columns = {attr: [getattr(c, attr) for c in contacts] for attr in CONTACT_ATTRS if any(getattr(c, attr) for c in contacts)}
+    payload = {'count': len(contacts), 'columns': columns, 'meta': {k: v for k, v in result.items() if k != 'contacts'}}
+    return zlib.compress(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+def _unpack(data: bytes) -> dict:
+    payload = pickle.loads(zlib.decompress(data))
+    names, columns = list(payload['columns']), list(payload['columns'].values())
+    contacts = []
+    for values in zip(*columns) if columns else ():
+        contact = Contact()
+        for attr, value in zip(names, values): setattr(contact, attr, value)
+        contacts.append(contact)
+    return {'contacts': contacts, **payload['meta']}
+
+class ParseCache:
+    """Cache hasil parsing di disk, dikunci `file_unique_id` Telegram dan hash isi file.
+
+    Ukuran total dibatasi `max_bytes` (entri paling lama tidak dipakai dibuang lebih dulu) dan
+    setiap entri kedaluwarsa setelah `ttl` detik.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, ttl=None):
+        self.directory = directory or config.PARSE_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else config.PARSE_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else config.PARSE_CACHE_TTL
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(self.directory, 'index.json')
+        # files: file_unique_id -> hash isi; entries: nama entri -> [ukuran, dibuat, terakhir dipakai]
+        self._files, self._entries = {}, {}
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f: index = json.load(f)
+            self._files, self._entries = index['files'], index['entries']
+        except FileNotFoundError: pass
+        except (OSError, ValueError, KeyError) as e: logger.warning(f"Indeks parse cache diabaikan: {e}")
+
+    def _save_index(self):
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump({'files': self._files, 'entries': self._entries}, f)
+        os.replace(tmp_path, self._index_path)
+
+    @staticmethod
+    def _entry_name(content_hash, kind): return f"{content_hash}.{kind}.bin"
+
+    def _remove_entry(self, name):
+        self._entries.pop(name, None)
+        try: os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError: pass
+
+    def _evict(self, now):
+        for name, (_, created, _) in list(self._entries.items()):
+            if now - created > self.ttl: self._remove_entry(name)
+        total = sum(size for size, _, _ in self._entries.values())
+        for name, (size, _, _) in sorted(self._entries.items(), key=lambda item: item[1][2]):
+            if total <= self.max_bytes: break
+            self._remove_entry(name); total -= size
+        live_hashes = {name.split('.', 1)[0] for name in self._entries}
+        self._files = {uid: h for uid, h in self._files.items() if h in live_hashes}
+
+    def get(self, content_hash, kind):
+        """Hasil parsing untuk hash isi file, atau None."""
+        name, now = self._entry_name(content_hash, kind), time.time()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None: return None
+            if now - entry[1] > self.ttl: self._remove_entry(name); return None
+            entry[2] = now
+            try:
+                with open(os.path.join(self.directory, name), 'rb') as f: data = f.read()
+            except FileNotFoundError: self._entries.pop(name, None); return None
+        return _unpack(data)
+
+    def get_by_file_id(self, file_unique_id, kind):
+        """Hasil parsing untuk file Telegram yang pernah diunggah, tanpa perlu mengunduh ulang."""
+        with self._lock: content_hash = self._files.get(file_unique_id)
+        return self.get(content_hash, kind) if content_hash else None
+
+    def put(self, content_hash, kind, result, file_unique_id=None):
+        data = _pack(result)
+        name, now = self._entry_name(content_hash, kind), time.time()
+        with self._lock:
+            if self.max_bytes and len(data) > self.max_bytes: return
+            tmp_path = os.path.join(self.directory, f"{name}.tmp")
+            with open(tmp_path, 'wb') as f: f.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+            self._entries[name] = [len(data), now, now]
+            if file_unique_id: self._files[file_unique_id] = content_hash
+            self._evict(now)
+            self._save_index()
+
+    def remember_file_id(self, file_unique_id, content_hash):
+        with self._lock:
+            self._files[file_unique_id] = content_hash
+            self._save_index()
+
+_default_cache = None
+
+def get_cache() -> ParseCache:
+    global _default_cache
+    if _default_cache is None: _default_cache = ParseCache()
+    return _default_cache
@@ -0,0 +1,62 @@
+# phone_normalizer.py
+
+import re
+
+import config
+
+_NON_DIGIT = re.compile(r'\D')
+
+class PhoneNormalizer:
+    """Mengubah nomor telepon mentah menjadi kunci kanonik gaya E.164 ('+6281234567890').
+
+    `+62 812-3456-7890`, `0812 3456 7890`, `62812.3456.7890` dan `(0812) 34567890` menghasilkan
+    kunci yang sama. Nomor tanpa kode negara dianggap nomor nasional dengan `country_code`.
+    Statistik: 'total' nomor diproses, 'invalid' (tanpa angka), dan 'collapsed' (diisi pemakai
+    yang membuang duplikat berdasarkan kunci ini).
+    """
+
+    def __init__(self, country_code=None, memo_size=100_000):
+        self.country_code = (country_code or config.DEFAULT_COUNTRY_CODE).lstrip('+')
+        self.memo_size = memo_size
+        self._memo = {}
+        self.stats = {'total': 0, 'invalid': 0, 'collapsed': 0}
+
+    def _canonical(self, raw):
+        digits = _NON_DIGIT.sub('', raw)
+        if not digits: return ''
+        if raw.lstrip().startswith('+'): return '+' + digits
+        if digits.startswith('00'): return '+' + digits[2:]
+        if digits.startswith('0'): return '+' + self.country_code + digits[1:]
+        if digits.startswith(self.country_code) and len(digits) > len(self.country_code) + 7: return '+' + digits
+        return '+' + self.country_code + digits
+
+    def key(self, raw):
+        """Kunci kanonik satu nomor; string kosong jika tidak ada angka sama sekali."""
+        self.stats['total'] += 1
+        canonical = self._memo.get(raw)
+        if canonical is None:
+            canonical = self._canonical(raw)
+            if len(self._memo) >= self.memo_size: self._memo.clear()
+            self._memo[raw] = canonical
+        if not canonical: self.stats['invalid'] += 1
+        return canonical
+
+    def keys(self, phones):
+        """Versi batch untuk satu kolom nomor sekaligus."""
+        memo, canonical_of, memo_size = self._memo, self._canonical, self.memo_size
+        result = []
+        append = result.append
+        for raw in phones:
+            canonical = memo.get(raw)
+            if canonical is None:
+                canonical = canonical_of(raw)
+                if len(memo) >= memo_size: memo.clear()
+                memo[raw] = canonical
+            append(canonical)
+        self.stats['total'] += len(result)
+        self.stats['invalid'] += result.count('')
+        return result
+
+def normalize_phone(raw, country_code=None):
+    """Bentuk fungsi sederhana dari PhoneNormalizer.key untuk satu nomor."""
+    return PhoneNormalizer(country_code, memo_size=0)._canonical(raw)
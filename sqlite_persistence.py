@@ -0,0 +1,165 @@
+# sqlite_persistence.py
+
+import json
+import pickle
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from telegram.ext import BasePersistence, PersistenceInput
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class SQLitePersistence(BasePersistence):
+    """Persistence PTB yang menyimpan user/chat/bot/conversation data per kunci di SQLite.
+
+    Hanya entri yang berubah yang ditulis ulang. Nilai list besar (mis. `contacts`,
+    `final_contacts`) disimpan sebagai blob terpisah yang dirujuk lewat handle, dan hanya ditulis
+    ulang jika objek list-nya diganti atau panjangnya berubah. List yang diubah isinya di tempat
+    tanpa mengubah panjang tidak terdeteksi; ganti dengan list baru.
+    """
+
+    def __init__(self, filepath=None, store_data: PersistenceInput = None, update_interval: float = 60, blob_min_items=None):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.filepath = filepath or config.PERSISTENCE_FILE
+        self.blob_min_items = blob_min_items if blob_min_items is not None else config.PERSISTENCE_BLOB_MIN_ITEMS
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._store_lock = asyncio.Lock()
+        self._digests = {}      # (kind, key) -> digest record terakhir yang ditulis
+        self._blob_refs = {}    # handle -> (objek, panjang) yang terakhir ditulis
+        self._owner_blobs = {}  # (kind, key) -> set handle milik entri tersebut
+
+    # --- Akses SQLite ---
+
+    def _get_conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.filepath, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS records (kind TEXT NOT NULL, key TEXT NOT NULL, data BLOB NOT NULL, PRIMARY KEY (kind, key))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS blobs (handle TEXT PRIMARY KEY, data BLOB NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    def _write(self, kind, key, record, pending_blobs, stale_handles):
+        """Dijalankan di thread: serialisasi blob besar lalu tulis semua perubahan dalam satu transaksi."""
+        blob_rows = [(handle, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for handle, value in pending_blobs.items()]
+        with self._db_lock:
+            conn = self._get_conn()
+            with conn:
+                if blob_rows: conn.executemany("INSERT OR REPLACE INTO blobs (handle, data) VALUES (?, ?)", blob_rows)
+                if stale_handles: conn.executemany("DELETE FROM blobs WHERE handle = ?", [(h,) for h in stale_handles])
+                if record is None: conn.execute("DELETE FROM records WHERE kind = ? AND key = ?", (kind, key))
+                else: conn.execute("INSERT OR REPLACE INTO records (kind, key, data) VALUES (?, ?, ?)", (kind, key, record))
+
+    def _load_kind(self, kind):
+        with self._db_lock:
+            conn = self._get_conn()
+            rows = conn.execute("SELECT key, data FROM records WHERE kind = ?", (kind,)).fetchall()
+            result = {}
+            for key, record in rows:
+                stored = pickle.loads(record)
+                data = stored['data']
+                for name, handle in stored['blobs'].items():
+                    row = conn.execute("SELECT data FROM blobs WHERE handle = ?", (handle,)).fetchone()
+                    if row is None: logger.warning(f"Blob persistence {handle} hilang, diabaikan."); continue
+                    data[name] = pickle.loads(row[0])
+                    self._blob_refs[handle] = (data[name], len(data[name]))
+                self._owner_blobs[(kind, key)] = set(stored['blobs'].values())
+                self._digests[(kind, key)] = self._digest(self._encode(kind, key, data)[0])
+                result[key] = data
+        return result
+
+    # --- Serialisasi per entri ---
+
+    @staticmethod
+    def _digest(record):
+        return hashlib.blake2b(record, digest_size=16).digest()
+
+    def _encode(self, kind, key, data):
+        """Memisahkan list besar menjadi blob; mengembalikan (record, {nama: handle}, blob yang perlu ditulis)."""
+        small, handles, pending = {}, {}, {}
+        for name, value in data.items():
+            if isinstance(value, list) and len(value) >= self.blob_min_items:
+                handle = handles[name] = f"{kind}:{key}:{name!r}"
+                ref = self._blob_refs.get(handle)
+                if ref is None or ref[0] is not value or ref[1] != len(value): pending[handle] = value
+            else: small[name] = value
+        record = pickle.dumps({'data': small, 'blobs': handles}, protocol=pickle.HIGHEST_PROTOCOL)
+        return record, handles, pending
+
+    async def _store(self, kind, key, data):
+        async with self._store_lock:
+            owner = (kind, key)
+            if data is None: record, handles, pending = None, {}, {}
+            else: record, handles, pending = self._encode(kind, key, data)
+            digest = self._digest(record) if record is not None else None
+            stale = self._owner_blobs.get(owner, set()) - set(handles.values())
+            if digest == self._digests.get(owner) and not pending and not stale: return
+            await asyncio.to_thread(self._write, kind, key, record, pending, stale)
+            for handle in stale: self._blob_refs.pop(handle, None)
+            for handle, value in pending.items(): self._blob_refs[handle] = (value, len(value))
+            if record is None:
+                self._digests.pop(owner, None); self._owner_blobs.pop(owner, None)
+            else:
+                self._digests[owner] = digest; self._owner_blobs[owner] = set(handles.values())
+
+    # --- API BasePersistence ---
+
+    async def get_user_data(self):
+        return {int(key): data for key, data in self._load_kind('user').items()}
+
+    async def get_chat_data(self):
+        return {int(key): data for key, data in self._load_kind('chat').items()}
+
+    async def get_bot_data(self):
+        return self._load_kind('bot').get('bot', {})
+
+    async def get_callback_data(self):
+        data = self._load_kind('callback').get('callback')
+        return data['value'] if data else None
+
+    async def get_conversations(self, name):
+        with self._db_lock:
+            rows = self._get_conn().execute("SELECT key, data FROM records WHERE kind = ?", (f"conv:{name}",)).fetchall()
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name, key, new_state):
+        kind, key = f"conv:{name}", json.dumps(list(key))
+        record = None if new_state is None else pickle.dumps(new_state, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = self._digest(record) if record is not None else None
+        if self._digests.get((kind, key)) == digest: return
+        await asyncio.to_thread(self._write, kind, key, record, {}, ())
+        if digest is None: self._digests.pop((kind, key), None)
+        else: self._digests[(kind, key)] = digest
+
+    async def update_user_data(self, user_id, data):
+        await self._store('user', str(user_id), data)
+
+    async def update_chat_data(self, chat_id, data):
+        await self._store('chat', str(chat_id), data)
+
+    async def update_bot_data(self, data):
+        await self._store('bot', 'bot', data)
+
+    async def update_callback_data(self, data):
+        await self._store('callback', 'callback', {'value': data})
+
+    async def drop_user_data(self, user_id):
+        await self._store('user', str(user_id), None)
+
+    async def drop_chat_data(self, chat_id):
+        await self._store('chat', str(chat_id), None)
+
+    async def refresh_user_data(self, user_id, user_data): pass
+    async def refresh_chat_data(self, chat_id, chat_data): pass
+    async def refresh_bot_data(self, bot_data): pass
+
+    async def flush(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.commit(); self._conn.close(); self._conn = None
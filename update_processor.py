@@ -0,0 +1,129 @@
+# update_processor.py
+
+import heapq
+import asyncio
+import logging
+import itertools
+import contextlib
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Prioritas update (angka kecil didahulukan saat slot penuh); unggahan file selalu paling akhir.
+PRIORITY_CALLBACK, PRIORITY_MESSAGE, PRIORITY_FILE = range(3)
+PRIORITY_NAMES = {PRIORITY_CALLBACK: 'callback', PRIORITY_MESSAGE: 'message', PRIORITY_FILE: 'file'}
+
+class PriorityGate:
+    """Semafor dengan antrean prioritas (FIFO dalam prioritas yang sama) dan batas terpisah untuk update file.
+
+    Update file hanya boleh memakai `file_limit` slot sekaligus, sehingga sisa slot selalu tersedia untuk
+    tombol dan perintah ringan walaupun banyak unggahan sedang diproses.
+    """
+
+    def __init__(self, limit, file_limit):
+        self.limit, self.file_limit = limit, min(file_limit, limit)
+        self.active = self.active_files = 0
+        self._waiters = []  # heap [prioritas, urutan, future]
+        self._order = itertools.count()
+
+    def _can_run(self, priority) -> bool:
+        return self.active < self.limit and (priority != PRIORITY_FILE or self.active_files < self.file_limit)
+
+    def _take(self, priority):
+        self.active += 1
+        if priority == PRIORITY_FILE: self.active_files += 1
+
+    def _wake(self):
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.cancelled(): heapq.heappop(self._waiters); continue
+            # Antrean terurut prioritas: jika kepala (file) belum boleh jalan, sisanya juga file.
+            if not self._can_run(priority): break
+            heapq.heappop(self._waiters)
+            self._take(priority)
+            future.set_result(None)
+
+    async def acquire(self, priority):
+        if not self._waiters and self._can_run(priority):
+            self._take(priority)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._order), future])
+        self._wake()
+        try: await future
+        except asyncio.CancelledError:
+            # Slot sudah diberikan tepat sebelum pembatalan: kembalikan.
+            if future.done() and not future.cancelled(): self.release(priority)
+            raise
+
+    def release(self, priority):
+        self.active -= 1
+        if priority == PRIORITY_FILE: self.active_files -= 1
+        self._wake()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+def classify(update) -> tuple:
+    """Mengembalikan (kunci urutan, prioritas); kunci None berarti update tidak perlu diserialkan."""
+    if not isinstance(update, Update): return None, PRIORITY_MESSAGE
+    user, chat = update.effective_user, update.effective_chat
+    # Per pengguna: user_data dan state ConversationHandler miliknya tidak pernah diubah dua update sekaligus.
+    key = ('user', user.id) if user else (('chat', chat.id) if chat else None)
+    if update.callback_query or update.inline_query: return key, PRIORITY_CALLBACK
+    message = update.effective_message
+    if message and (message.document or message.photo or message.video or message.audio): return key, PRIORITY_FILE
+    return key, PRIORITY_MESSAGE
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Memproses update dari pengguna/chat berbeda secara paralel, tetapi update milik satu pengguna berurutan.
+
+    Batas konkurensi bawaan PTB diambil sebelum `do_process_update` (sebelum update sempat menunggu
+    gilirannya), jadi di sini batas itu hanya menjadi batas update tertunda (UPDATE_MAX_PENDING). Konkurensi
+    sebenarnya dibatasi PriorityGate setelah giliran per pengguna didapat, sehingga update yang masih
+    menunggu giliran tidak memakan slot. Callback query didahulukan, unggahan file paling akhir.
+    """
+
+    def __init__(self, max_concurrent=None, max_concurrent_files=None, max_pending=None):
+        super().__init__(max_pending or config.UPDATE_MAX_PENDING)
+        self.gate = PriorityGate(max_concurrent or config.UPDATE_MAX_CONCURRENT, max_concurrent_files or config.UPDATE_MAX_CONCURRENT_FILES)
+        self._turns = {}
+        metrics.register_gauge('xrx_updates_active', lambda: self.gate.active, "Update sedang diproses")
+        metrics.register_gauge('xrx_updates_waiting', lambda: self.gate.waiting, "Update menunggu slot")
+        metrics.register_gauge('xrx_updates_pending', lambda: self.current_concurrent_updates, "Update diterima belum selesai")
+
+    @contextlib.asynccontextmanager
+    async def _turn(self, key):
+        """Kunci FIFO per pengguna/chat; dihapus saat tidak ada lagi yang menunggu (sama seperti FloodLimiter)."""
+        if key is None:
+            yield
+            return
+        entry = self._turns.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]: yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]: self._turns.pop(key, None)
+
+    async def do_process_update(self, update, coroutine):
+        key, priority = classify(update)
+        try:
+            async with self._turn(key):
+                with metrics.timer('xrx_update_wait_seconds', kind=PRIORITY_NAMES[priority]): await self.gate.acquire(priority)
+                try: await coroutine
+                finally: self.gate.release(priority)
+        except asyncio.CancelledError:
+            coroutine.close()
+            raise
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._turns.clear()
@@ -1,10 +1,11 @@
 # utils.py
 
 import os
-import shutil
 import logging
 from datetime import datetime, timezone, timedelta
 
+import workspace
+
 logger = logging.getLogger(__name__)
 
 def get_greeting():
@@ -16,10 +17,20 @@ def get_greeting():
     if 15 <= current_hour < 18: return "Sore"
     return "Malam"
 
-def cleanup(context):
-    """Membersihkan file dan direktori sementara setelah operasi selesai atau dibatalkan."""
-    chat_id = context.user_data.get('chat_id')
-    if chat_id and os.path.exists(str(chat_id)):
-        shutil.rmtree(str(chat_id))
-        logger.info(f"Direktori sementara untuk chat_id {chat_id} telah dihapus.")
-    context.user_data.clear()
\ No newline at end of file
+def flow_workspace(context) -> str:
+    """Workspace alur ini; dibuat sekali (setelah file pertama lolos validasi) dan dipakai ulang untuk file berikutnya."""
+    path = context.user_data.get('workspace')
+    if path is None or not os.path.isdir(path):
+        path = context.user_data['workspace'] = workspace.get_manager().create(context.user_data['chat_id'])
+    return path
+
+def cleanup(context, workspace_path=None):
+    """Membersihkan workspace sementara setelah operasi selesai atau dibatalkan.
+
+    `workspace_path` dipakai oleh pekerjaan latar belakang: user_data hanya dikosongkan jika masih
+    menunjuk workspace yang sama (pengguna mungkin sudah memulai alur baru).
+    """
+    current = context.user_data.get('workspace')
+    workspace.get_manager().release(workspace_path or current)
+    if workspace_path is None or workspace_path == current:
+        context.user_data.clear()
@@ -0,0 +1,148 @@
+# webhook_server.py
+
+import hmac
+import json
+import signal
+import asyncio
+import logging
+from telegram import Update
+
+import config
+import jobs
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+class WebhookServer:
+    """Server HTTP asyncio lokal yang menerima update Telegram (POST JSON) untuk satu Application.
+
+    - Header X-Telegram-Bot-Api-Secret-Token dicocokkan dengan WEBHOOK_SECRET_TOKEN (403 jika salah).
+    - Update yang diterima tapi belum selesai diproses dibatasi WEBHOOK_MAX_PENDING; di atas itu dibalas
+      503 + Retry-After sehingga Telegram (atau load balancer) mengirim ulang nanti.
+    - `drain()` berhenti menerima update, menunggu update yang sedang diproses, lalu job konversi/merge.
+    Update diserahkan ke update processor milik Application sehingga urutan per pengguna tetap terjaga.
+    """
+
+    def __init__(self, application, listen=None, port=None, path=None, secret_token=None, max_pending=None, max_body_bytes=None):
+        self.application = application
+        self.listen = listen or config.WEBHOOK_LISTEN
+        self.port = config.WEBHOOK_PORT if port is None else port
+        self.path = path or config.WEBHOOK_PATH
+        self.secret_token = config.WEBHOOK_SECRET_TOKEN if secret_token is None else secret_token
+        self.max_pending = max_pending or config.WEBHOOK_MAX_PENDING
+        self.max_body_bytes = max_body_bytes or config.WEBHOOK_MAX_BODY_BYTES
+        self.pending = 0
+        self.accepting = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._server = None
+        metrics.register_gauge('xrx_webhook_pending', lambda: self.pending, "Update webhook belum selesai")
+
+    @property
+    def address(self) -> tuple:
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve_client, self.listen, self.port)
+        self.accepting = True
+        if not self.secret_token: logger.warning("WEBHOOK_SECRET_TOKEN kosong: update webhook tidak divalidasi.")
+        host, port = self.address
+        logger.info(f"Webhook menerima update di http://{host}:{port}{self.path}")
+
+    async def drain(self, timeout=None) -> bool:
+        """Berhenti menerima update lalu menunggu update & job yang sedang berjalan (maksimal `timeout` detik)."""
+        self.accepting = False
+        if self._server is not None: self._server.close()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout if timeout is not None else config.WEBHOOK_DRAIN_TIMEOUT)
+        logger.info(f"Drain webhook: menunggu {self.pending} update dan job yang berjalan.")
+        try: await asyncio.wait_for(self._idle.wait(), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain webhook habis waktu; {self.pending} update belum selesai.")
+            return False
+        drained = await jobs.get_manager().drain(max(0.0, deadline - loop.time()))
+        if not drained: logger.warning("Drain webhook habis waktu sebelum semua job selesai.")
+        return drained
+
+    def _accept(self, update):
+        self.pending += 1
+        self._idle.clear()
+        self.application.create_task(self._process(update), update=update, name=f"webhook:{update.update_id}")
+
+    async def _process(self, update):
+        try: await self.application.update_processor.process_update(update, self.application.process_update(update))
+        finally:
+            self.pending -= 1
+            if not self.pending: self._idle.set()
+
+    def _handle(self, method, path, headers, body) -> tuple:
+        """Mengembalikan (status, badan, header tambahan) untuk satu permintaan."""
+        path = path.split('?', 1)[0]
+        if path == '/healthz': return (200, b'ok\n', {}) if self.accepting else (503, b'draining\n', {})
+        if path != self.path: return 404, b'not found\n', {}
+        if method != 'POST': return 405, b'method not allowed\n', {'Allow': 'POST'}
+        if self.secret_token and not hmac.compare_digest(headers.get('x-telegram-bot-api-secret-token', ''), self.secret_token):
+            return 403, b'forbidden\n', {}
+        if not self.accepting: return 503, b'draining\n', {'Retry-After': '5'}
+        if self.pending >= self.max_pending: return 503, b'busy\n', {'Retry-After': '1'}
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict): raise ValueError(f"badan update harus objek JSON, bukan {type(data).__name__}")
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            # de_json tidak memvalidasi bentuk field: {"message": 5} saja sudah melempar AttributeError.
+            logger.debug(f"Update webhook tidak valid: {e}")
+            return 400, b'invalid update\n', {}
+        self._accept(update)
+        return 200, b'', {}
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), config.WEBHOOK_IDLE_TIMEOUT)
+                if not request_line.strip(): break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), config.WEBHOOK_IDLE_TIMEOUT)
+                    if line in (b'\r\n', b'\n', b''): break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > self.max_body_bytes: status, body, extra = 413, b'too large\n', {}
+                else: status, body, extra = self._handle(method, path, headers, await reader.readexactly(length) if length else b'')
+                metrics.inc('xrx_webhook_requests_total', status=status)
+                keep_alive = status != 413 and self.accepting and headers.get('connection', '').lower() != 'close'
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: text/plain; charset=utf-8",
+                        f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+                await writer.drain()
+                if not keep_alive: break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError): pass
+        finally: writer.close()
+
+async def serve(application, stop_signals=(signal.SIGINT, signal.SIGTERM)):
+    """Siklus hidup mode webhook: init -> server -> (setWebhook) -> tunggu sinyal -> drain -> stop -> shutdown."""
+    loop, stop = asyncio.get_running_loop(), asyncio.Event()
+    for sig in stop_signals: loop.add_signal_handler(sig, stop.set)
+    async with application:
+        if application.post_init: await application.post_init(application)
+        await application.start()
+        server = WebhookServer(application)
+        await server.start()
+        if config.WEBHOOK_URL:
+            await application.bot.set_webhook(config.WEBHOOK_URL, secret_token=config.WEBHOOK_SECRET_TOKEN or None,
+                                              allowed_updates=Update.ALL_TYPES, max_connections=config.WEBHOOK_MAX_CONNECTIONS)
+        try: await stop.wait()
+        finally:
+            await server.drain()
+            await application.stop()
+    if application.post_shutdown: await application.post_shutdown(application)
+
+def run(application):
+    """Menjalankan bot dalam mode webhook sampai SIGINT/SIGTERM (pengganti run_polling)."""
+    asyncio.run(serve(application))
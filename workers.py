@@ -0,0 +1,73 @@
+# workers.py
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_process_pool = None
+_thread_pool = None
+# user_id -> [semaphore, jumlah pemakai aktif/menunggu]
+_user_slots = {}
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        # 'spawn' agar anak proses tidak mewarisi thread/koneksi milik event loop.
+        _process_pool = ProcessPoolExecutor(max_workers=config.WORKER_MAX_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+    return _process_pool
+
+def _get_thread_pool():
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=config.WORKER_MAX_THREADS, thread_name_prefix='xrx-worker')
+    return _thread_pool
+
+def _acquire_slot(user_id):
+    slot = _user_slots.get(user_id)
+    if slot is None: slot = _user_slots[user_id] = [asyncio.Semaphore(config.WORKER_MAX_JOBS_PER_USER), 0]
+    slot[1] += 1
+    return slot
+
+def _release_slot(user_id, slot):
+    slot[1] -= 1
+    if slot[1] == 0: _user_slots.pop(user_id, None)
+
+def use_process_pool(size_bytes: int = 0, item_count: int = 0) -> bool:
+    """Menentukan apakah pekerjaan cukup besar untuk dijalankan di process pool."""
+    return size_bytes >= config.WORKER_PROCESS_MIN_BYTES or item_count >= config.WORKER_PROCESS_MIN_ITEMS
+
+async def run_blocking(func, *args, user_id=None, size_bytes: int = 0, item_count: int = 0, **kwargs):
+    """Menjalankan fungsi sinkron yang berat di luar event loop dan menunggu hasilnya.
+
+    Pekerjaan besar masuk ke process pool, pekerjaan kecil ke thread pool. Jika `user_id`
+    diberikan, jumlah pekerjaan bersamaan milik pengguna itu dibatasi oleh WORKER_MAX_JOBS_PER_USER.
+    """
+    in_process = use_process_pool(size_bytes, item_count)
+    pool = _get_process_pool() if in_process else _get_thread_pool()
+    call = partial(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    labels = dict(task=getattr(func, '__name__', 'call'), pool='process' if in_process else 'thread')
+    if user_id is None:
+        with metrics.timer('xrx_work_seconds', **labels): return await loop.run_in_executor(pool, call)
+    slot = _acquire_slot(user_id)
+    try:
+        with metrics.timer('xrx_work_wait_seconds', **labels): await slot[0].acquire()
+        try:
+            with metrics.timer('xrx_work_seconds', **labels): return await loop.run_in_executor(pool, call)
+        finally: slot[0].release()
+    finally: _release_slot(user_id, slot)
+
+def shutdown():
+    """Menutup semua pool pekerja; dipanggil saat bot berhenti."""
+    global _process_pool, _thread_pool
+    for pool in (_process_pool, _thread_pool):
+        if pool is not None: pool.shutdown(wait=True, cancel_futures=True)
+    _process_pool = _thread_pool = None
+    logger.info("Pool pekerja telah ditutup.")
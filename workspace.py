@@ -0,0 +1,161 @@
+# workspace.py
+
+import os
+import time
+import shutil
+import asyncio
+import logging
+import tempfile
+import threading
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class WorkspaceQuotaError(Exception):
+    """Dilempar jika total ukuran workspace akan melewati WORKSPACE_MAX_BYTES."""
+
+def _tree_size(path) -> int:
+    total, stack = 0, [path]
+    while stack:
+        try: entries = os.scandir(stack.pop())
+        except OSError: continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False): stack.append(entry.path)
+                    else: total += entry.stat(follow_symlinks=False).st_size
+                except OSError: continue
+    return total
+
+class Reservation:
+    """Ruang yang dipesan lewat `WorkspaceManager.reserve`; dilepas setelah file selesai ditulis (bisa dipakai `with`)."""
+    __slots__ = ('manager', 'size')
+
+    def __init__(self, manager, size): self.manager, self.size = manager, size
+
+    def release(self):
+        if self.size: self.manager._unreserve(self.size); self.size = 0
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.release()
+
+class WorkspaceManager:
+    """Direktori kerja unik per alur/pekerjaan di bawah satu root (bisa tmpfs), dengan kuota byte & janitor TTL.
+
+    Nama direktori diawali chat_id agar mudah dilacak, tetapi selalu unik sehingga beberapa alur dari
+    chat yang sama tidak saling menimpa. Umur dihitung dari mtime direktori yang diperbarui lewat `touch`
+    (dipanggil untuk setiap update pengguna, lihat handlers.touch_workspace).
+    """
+
+    def __init__(self, root=None, max_bytes=None, ttl=None):
+        self.root = root or default_root()
+        self.max_bytes = config.WORKSPACE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = ttl or config.WORKSPACE_TTL
+        self._lock = threading.Lock()
+        self._reserved = 0  # byte yang sudah dipesan tapi belum (selesai) ditulis ke disk
+        self.last_usage = 0  # ukuran root pada sweep janitor terakhir (untuk metrik, tanpa menelusuri ulang)
+        # Perubahan sejak sweep terakhir: pesanan yang sudah dilepas (dianggap sudah tertulis) dan workspace yang dihapus.
+        self._written = self._freed = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, owner) -> str:
+        path = tempfile.mkdtemp(prefix=f"{owner}_", dir=self.root)
+        logger.info(f"Workspace {path} dibuat untuk {owner}.")
+        return path
+
+    def touch(self, path):
+        """Menandai workspace masih dipakai agar tidak disapu janitor."""
+        if path and os.path.isdir(path): os.utime(path)
+
+    def usage(self) -> int:
+        return _tree_size(self.root)
+
+    def estimated_usage(self) -> int:
+        """Perkiraan isi root tanpa menelusuri disk: sweep terakhir + pesanan yang selesai - workspace yang dihapus.
+
+        Pesanan dihitung penuh walau file yang ditulis lebih kecil (atau gagal), jadi perkiraan cenderung
+        berlebih; sweep janitor berikutnya mengoreksinya.
+        """
+        return max(0, self.last_usage + self._written - self._freed)
+
+    def count(self) -> int:
+        with os.scandir(self.root) as entries: return sum(1 for entry in entries if entry.is_dir(follow_symlinks=False))
+
+    def reserve(self, size_bytes) -> Reservation:
+        """Memesan ruang `size_bytes` (mis. sebelum mengunduh atau menulis hasil); melempar WorkspaceQuotaError.
+
+        Pesanan yang belum dilepas ikut dihitung, sehingga dua unggahan bersamaan tidak sama-sama lolos.
+        Isi disk diambil dari `estimated_usage` (tanpa I/O) karena dipanggil langsung dari handler async.
+        """
+        size_bytes = size_bytes or 0
+        with self._lock:
+            if self.max_bytes and self.estimated_usage() + self._reserved + size_bytes > self.max_bytes:
+                raise WorkspaceQuotaError("Ruang kerja server sedang penuh, coba lagi nanti.")
+            self._reserved += size_bytes
+        return Reservation(self, size_bytes)
+
+    def _unreserve(self, size_bytes):
+        with self._lock: self._reserved -= size_bytes; self._written += size_bytes
+
+    def release(self, path):
+        """Menghapus satu workspace; path di luar root diabaikan."""
+        if not path or os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.root): return
+        size = _tree_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        with self._lock: self._freed += size
+        logger.info(f"Workspace {path} telah dihapus.")
+
+    def sweep(self) -> int:
+        """Menghapus workspace yang tidak disentuh lebih lama dari TTL lalu mencatat `last_usage`; mengembalikan jumlah yang dihapus."""
+        removed, cutoff = 0, time.time() - self.ttl
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                try: expired = entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff
+                except OSError: continue
+                if expired: self.release(entry.path); removed += 1
+        with self._lock: written, freed = self._written, self._freed
+        usage = self.usage()
+        # Perubahan selama penelusuran tetap dibawa ke periode berikutnya.
+        with self._lock: self.last_usage, self._written, self._freed = usage, self._written - written, self._freed - freed
+        return removed
+
+    async def run_janitor(self, interval=None):
+        interval = interval or config.WORKSPACE_JANITOR_INTERVAL
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.sweep)
+                if removed: logger.info(f"Janitor menghapus {removed} workspace kedaluwarsa.")
+            except Exception as e: logger.error(f"Janitor workspace gagal: {e}")
+            await asyncio.sleep(interval)
+
+def default_root() -> str:
+    """WORKSPACE_ROOT jika diisi; jika WORKSPACE_USE_TMPFS aktif dan /dev/shm ada, root di tmpfs."""
+    if config.WORKSPACE_ROOT: return config.WORKSPACE_ROOT
+    if config.WORKSPACE_USE_TMPFS and os.path.isdir('/dev/shm'): return os.path.join('/dev/shm', 'xrx_workspaces')
+    return os.path.abspath('workspaces')
+
+_default_manager = None
+_janitor_task = None
+
+def get_manager() -> WorkspaceManager:
+    global _default_manager
+    if _default_manager is None: _default_manager = WorkspaceManager()
+    return _default_manager
+
+def start_janitor():
+    """Menjalankan janitor di event loop yang sedang berjalan (dipanggil dari post_init)."""
+    global _janitor_task
+    if _janitor_task is None or _janitor_task.done(): _janitor_task = asyncio.create_task(get_manager().run_janitor())
+
+metrics.register_gauge('xrx_workspaces', lambda: get_manager().count(), "Workspace sementara")
+# Dari sweep janitor terakhir (thread pekerja): /stats dan scrape Prometheus tidak menelusuri root di event loop.
+metrics.register_gauge('xrx_workspace_bytes', lambda: get_manager().last_usage, "Ukuran total workspace pada sweep janitor terakhir (byte)")
+
+async def shutdown():
+    global _janitor_task
+    if _janitor_task is not None:
+        _janitor_task.cancel()
+        await asyncio.gather(_janitor_task, return_exceptions=True)
+        _janitor_task = None